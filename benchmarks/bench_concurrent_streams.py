@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Concurrent SSE stream capacity benchmark
+
+Opens N chat streams at once against a running Django server and reports how
+many completed, time to first token and total wall time. Run it against the
+same app served two ways to compare:
+
+    python benchmarks/fake_ollama.py --tokens 50 --token-delay-ms 20 &
+
+    # before: WSGI dev server, one thread pinned per stream
+    python manage.py runserver 127.0.0.1:9000
+    # after: ASGI, streams served on the event loop
+    uvicorn quantum_goose_project.asgi:application --port 9000
+
+    python benchmarks/bench_concurrent_streams.py --concurrency 10 50 100 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def one_stream(client: httpx.AsyncClient, url: str, index: int) -> dict:
+    """Run a single chat stream and time it"""
+    started = time.perf_counter()
+    first_token = None
+    tokens = 0
+    try:
+        async with client.stream('POST', url, json={
+            'message': f'benchmark stream {index}',
+            'stream': True,
+            'session_id': f'bench-{index}',
+        }) as response:
+            async for line in response.aiter_lines():
+                if line.startswith('event: token'):
+                    tokens += 1
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                elif line.startswith('event: error'):
+                    return {'ok': False, 'error': 'sse error event'}
+        return {
+            'ok': response.status_code == 200 and tokens > 0,
+            'ttft': first_token,
+            'total': time.perf_counter() - started,
+            'tokens': tokens,
+        }
+    except httpx.HTTPError as e:
+        return {'ok': False, 'error': repr(e)}
+
+
+async def run_level(url: str, concurrency: int, timeout: float) -> dict:
+    """Open ``concurrency`` streams at once"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one_stream(client, url, i) for i in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    ok = [r for r in results if r['ok']]
+    ttfts = sorted(r['ttft'] for r in ok if r.get('ttft') is not None)
+    return {
+        'concurrency': concurrency,
+        'completed': len(ok),
+        'failed': len(results) - len(ok),
+        'wall_s': round(wall, 2),
+        'ttft_p50_ms': round(statistics.median(ttfts) * 1000, 1) if ttfts else None,
+        'ttft_max_ms': round(ttfts[-1] * 1000, 1) if ttfts else None,
+        'streams_per_s': round(len(ok) / wall, 2) if wall else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:9000/quantum-goose-app/api/llm/chat/')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50, 100])
+    parser.add_argument('--timeout', type=float, default=120.0)
+    args = parser.parse_args()
+
+    print(f"{'streams':>8} {'ok':>6} {'failed':>7} {'wall s':>8} {'ttft p50':>10} {'ttft max':>10} {'streams/s':>10}")
+    for concurrency in args.concurrency:
+        r = asyncio.run(run_level(args.url, concurrency, args.timeout))
+        print(f"{r['concurrency']:>8} {r['completed']:>6} {r['failed']:>7} {r['wall_s']:>8} "
+              f"{r['ttft_p50_ms']!s:>10} {r['ttft_max_ms']!s:>10} {r['streams_per_s']!s:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Chat message persistence benchmark
+
+Writes the same messages to a scratch SQLite database two ways and reports
+throughput and whether each session's total_messages counter matches the
+rows written:
+
+    per-message  MemoryManager.add_message: session get_or_create, INSERT
+                 and counter UPDATE for every message
+    write-behind MessageWriter: queued, then one bulk INSERT plus one F()
+                 counter UPDATE per session for each batch
+
+    python benchmarks/bench_message_writes.py --messages 2000 --threads 1 4 --sessions 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quantum_goose_project.settings')
+
+
+def setup_django(db_path: str) -> None:
+    """Point Django at a scratch database and create the tables"""
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db_path
+    # Concurrent writers wait for SQLite's lock instead of failing at once
+    settings.DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 30
+
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def run_threads(threads: int, messages: int, work) -> float:
+    """Split ``messages`` writes over ``threads`` workers; returns wall time"""
+    per_thread = messages // threads
+
+    def worker(index: int) -> None:
+        from django.db import connection
+        try:
+            for i in range(per_thread):
+                work(index, i)
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def check_counters(prefix: str) -> tuple:
+    """(rows written, sessions whose total_messages does not match their rows)"""
+    from django.db.models import Count
+    from quantum_goose_app.models import ConversationSession
+
+    sessions = ConversationSession.objects.filter(session_id__startswith=prefix).annotate(rows=Count('messages'))
+    rows = sum(session.rows for session in sessions)
+    mismatched = sum(1 for session in sessions if session.rows != session.total_messages)
+    return rows, mismatched
+
+
+def bench_per_message(threads: int, messages: int, sessions: int, run: str) -> dict:
+    from quantum_goose_app.memory_manager import MemoryManager
+
+    prefix = f'{run}-direct-{threads}-'
+
+    def work(thread: int, i: int) -> None:
+        MemoryManager('bench').add_message(
+            role='user' if i % 2 == 0 else 'assistant',
+            content=f'message {i} from thread {thread}',
+            session_id=f'{prefix}{(thread + i) % sessions}'
+        )
+
+    elapsed = run_threads(threads, messages, work)
+    rows, mismatched = check_counters(prefix)
+    return {'elapsed': elapsed, 'rows': rows, 'mismatched': mismatched}
+
+
+def bench_write_behind(threads: int, messages: int, sessions: int, run: str, batch_size: int) -> dict:
+    from quantum_goose_app.history_writer import MessageWriter
+
+    prefix = f'{run}-batched-{threads}-'
+    writer = MessageWriter(flush_interval=0.05, batch_size=batch_size)
+
+    def work(thread: int, i: int) -> None:
+        writer.enqueue(
+            'bench',
+            f'{prefix}{(thread + i) % sessions}',
+            role='user' if i % 2 == 0 else 'assistant',
+            content=f'message {i} from thread {thread}'
+        )
+
+    started = time.perf_counter()
+    enqueue_elapsed = run_threads(threads, messages, work)
+    writer.close()
+    elapsed = time.perf_counter() - started
+    rows, mismatched = check_counters(prefix)
+    return {
+        'elapsed': elapsed,
+        'enqueue_elapsed': enqueue_elapsed,
+        'rows': rows,
+        'mismatched': mismatched,
+        'batches': writer.stats()['batches'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--sessions', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--db', default=None, help='SQLite file to use (default: a temporary file)')
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='bench-messages-'), 'bench.sqlite3')
+    setup_django(db_path)
+    run = str(int(time.time()))
+    print(f"SQLite database: {db_path}")
+    print(f"{'path':<14}{'threads':>8}{'messages':>10}{'seconds':>10}{'msg/s':>10}{'rows':>8}{'bad counters':>14}")
+
+    for threads in args.threads:
+        messages = args.messages // threads * threads
+        direct = bench_per_message(threads, messages, args.sessions, run)
+        batched = bench_write_behind(threads, messages, args.sessions, run, args.batch_size)
+        for name, result in (('per-message', direct), ('write-behind', batched)):
+            print(f"{name:<14}{threads:>8}{messages:>10}{result['elapsed']:>10.2f}"
+                  f"{messages / result['elapsed']:>10.0f}{result['rows']:>8}{result['mismatched']:>14}")
+        print(f"  write-behind request-path cost: {batched['enqueue_elapsed'] * 1e6 / messages:.1f} us/message, "
+              f"{batched['batches']} batches; speed-up {direct['elapsed'] / batched['elapsed']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Ollama runtime options benchmark
+
+Sends the same mix of chats straight to an Ollama server with different
+runner options and reports model loads, prompt-eval and eval tokens/sec and
+requests/sec for each:
+
+    default    sampling options only; Ollama picks threads, batch and context
+    max-ctx    num_ctx at the model's full context length
+    exact-ctx  hardware options, num_ctx sized to every prompt on its own
+    hardware   RuntimeOptionsPlanner: num_thread/num_batch/num_gpu from the
+               hardware snapshot, num_ctx sized to the prompts and only grown
+
+--threads adds a hardware variant per num_thread value, to find where token
+generation stops scaling on a CPU-only node. Prompts alternate between short
+chats and a long one every --long-every requests, so the effect of num_ctx
+changes (each one reloads the model) shows up in the load column.
+
+The thread and batch effect needs a real CPU-only Ollama node:
+
+    python benchmarks/bench_runtime_options.py --model llama3:8b --context-tokens 8192 --threads 4 8 16
+
+The fake server has no real compute, but with a load time it shows the
+reloads exact-ctx causes and the planner avoids:
+
+    python benchmarks/fake_ollama.py --load-ms 2000 &
+    python benchmarks/bench_runtime_options.py --requests 24 --concurrency 2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quantum_goose_project.settings')
+
+VARIANTS = ('default', 'max-ctx', 'exact-ctx', 'hardware')
+SAMPLING = {'temperature': 0.7, 'top_p': 0.9}
+# A load this long (seconds) means the request (re)loaded the model
+RELOAD_THRESHOLD = 0.5
+
+
+def setup_django(args) -> None:
+    from django.conf import settings
+    if args.context_tokens:
+        limits = dict(getattr(settings, 'LLM_MODEL_CONTEXT_TOKENS', {}))
+        limits[args.model.split(':', 1)[0]] = args.context_tokens
+        settings.LLM_MODEL_CONTEXT_TOKENS = limits
+
+    import django
+    django.setup()
+
+
+def make_prompts(args) -> List[List[Dict]]:
+    """Short chats with a long, document-sized one every ``long_every`` requests"""
+    short = 'Summarise the benefits of keeping a model resident in memory in two sentences.'
+    long = ' '.join(['The quick brown fox jumps over the lazy dog.'] * args.long_sentences)
+    prompts = []
+    for i in range(args.requests):
+        text = long if args.long_every and i % args.long_every == args.long_every - 1 else short
+        prompts.append([{'role': 'user', 'content': f'{i}: {text}'}])
+    return prompts
+
+
+def variants(args) -> Dict[str, object]:
+    """Variant name -> function(messages) returning the request options"""
+    from quantum_goose_app.context_window import context_tokens_for_model, count_tokens
+    from quantum_goose_app.runtime_options import RuntimeOptionsPlanner
+
+    def prompt_tokens(messages):
+        return sum(count_tokens(m['content']) for m in messages)
+
+    def planned(planner, threads=None):
+        def options(messages):
+            runtime = planner.options_for(args.model, None, prompt_tokens(messages), args.num_predict)
+            if threads:
+                runtime['num_thread'] = threads
+            return runtime
+        return options
+
+    max_ctx = context_tokens_for_model(args.model)
+    choices = {
+        'default': lambda messages: {},
+        'max-ctx': lambda messages: {'num_ctx': max_ctx},
+        'exact-ctx': planned(RuntimeOptionsPlanner(min_ctx=args.min_ctx, shrink_after=0)),
+        'hardware': planned(RuntimeOptionsPlanner(min_ctx=args.min_ctx)),
+    }
+    result = {name: choices[name] for name in args.variant}
+    for threads in args.threads:
+        result[f'hardware-t{threads}'] = planned(RuntimeOptionsPlanner(min_ctx=args.min_ctx), threads)
+    return result
+
+
+async def run_variant(name: str, plan, prompts: List[List[Dict]], args) -> Dict:
+    """Send every prompt with ``concurrency`` clients; returns the totals"""
+    totals = {'requests': 0, 'errors': 0, 'reloads': 0, 'load_s': 0.0,
+              'prompt_eval_count': 0, 'prompt_eval_s': 0.0, 'eval_count': 0, 'eval_s': 0.0}
+    queue: asyncio.Queue = asyncio.Queue()
+    for messages in prompts:
+        queue.put_nowait(messages)
+
+    async with httpx.AsyncClient(base_url=args.ollama_url, timeout=args.timeout) as client:
+        async def worker() -> None:
+            while not queue.empty():
+                messages = queue.get_nowait()
+                payload = {
+                    'model': args.model,
+                    'messages': messages,
+                    'stream': False,
+                    'options': {**plan(messages), **SAMPLING, 'num_predict': args.num_predict},
+                }
+                totals['requests'] += 1
+                try:
+                    response = await client.post('/api/chat', json=payload)
+                    response.raise_for_status()
+                    data = response.json()
+                except httpx.HTTPError as e:
+                    totals['errors'] += 1
+                    print(f"{name}: {type(e).__name__}: {e}")
+                    continue
+                load = data.get('load_duration', 0) / 1e9
+                totals['reloads'] += load >= RELOAD_THRESHOLD
+                totals['load_s'] += load
+                totals['prompt_eval_count'] += data.get('prompt_eval_count', 0)
+                totals['prompt_eval_s'] += data.get('prompt_eval_duration', 0) / 1e9
+                totals['eval_count'] += data.get('eval_count', 0)
+                totals['eval_s'] += data.get('eval_duration', 0) / 1e9
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        totals['wall_s'] = time.perf_counter() - started
+    return totals
+
+
+def print_row(name: str, t: Dict) -> None:
+    ok = t['requests'] - t['errors']
+    prefill = t['prompt_eval_count'] / t['prompt_eval_s'] if t['prompt_eval_s'] else 0.0
+    decode = t['eval_count'] / t['eval_s'] if t['eval_s'] else 0.0
+    print(f"{name:<14}{t['requests']:>6}{t['errors']:>6}{t['reloads']:>8}{t['load_s'] * 1000:>10.0f}"
+          f"{prefill:>12.1f}{decode:>10.1f}{ok / t['wall_s']:>8.2f}{t['wall_s']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ollama-url', default='http://127.0.0.1:11434')
+    parser.add_argument('--model', default='llama2')
+    parser.add_argument('--variant', nargs='+', choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument('--threads', type=int, nargs='*', default=[], help='also run the planner with these num_thread values')
+    parser.add_argument('--requests', type=int, default=40, help='chats per variant')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--num-predict', type=int, default=128)
+    parser.add_argument('--long-every', type=int, default=8, help='every Nth prompt is long (0: never)')
+    parser.add_argument('--long-sentences', type=int, default=600, help='sentences in the long prompt')
+    parser.add_argument('--context-tokens', type=int, default=0, help="the model's context length (default: the app setting)")
+    parser.add_argument('--min-ctx', type=int, default=2048, help='smallest num_ctx the planner uses')
+    parser.add_argument('--timeout', type=float, default=600.0)
+    args = parser.parse_args()
+
+    setup_django(args)
+    from quantum_goose_app.runtime_options import RuntimeOptionsPlanner
+    print(f"Hardware options: {RuntimeOptionsPlanner.hardware_options()}")
+
+    prompts = make_prompts(args)
+    print(f"{'variant':<14}{'reqs':>6}{'errs':>6}{'reloads':>8}{'load ms':>10}"
+          f"{'prefill t/s':>12}{'eval t/s':>10}{'req/s':>8}{'wall s':>8}")
+    for name, plan in variants(args).items():
+        print_row(name, asyncio.run(run_variant(name, plan, prompts, args)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Fake Ollama server for local benchmarks
+Streams canned NDJSON chat responses at a configurable token rate, no GPU needed.
+Models are unloaded after their keep_alive expires, and the next request pays
+--load-ms before its first token, like a real cold load. Chat prompts that
+share a prefix with a recent prompt for the same model only pay prefill for
+the new suffix, like Ollama's KV-cache reuse.
+
+Endpoints: /api/tags, /api/show, /api/pull, /api/delete, /api/chat,
+/api/generate and /api/embeddings.
+
+Usage:
+    python benchmarks/fake_ollama.py --port 11434 --tokens 50 --token-delay-ms 20 --load-ms 2000
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODELS = [
+    {'name': 'llama2:latest', 'size': 3826793677, 'digest': 'fake-llama2', 'details': {'family': 'llama'}},
+    {'name': 'phi:latest', 'size': 1602463378, 'digest': 'fake-phi', 'details': {'family': 'phi2'}},
+]
+
+DEFAULT_KEEP_ALIVE = 300.0
+
+EMBEDDING_DIMENSIONS = 64
+
+
+def find_model(name: str):
+    """Installed model by full name or base name"""
+    for model in MODELS:
+        if name in (model['name'], model['name'].split(':', 1)[0]):
+            return model
+    return None
+
+
+def fake_embedding(text: str) -> list:
+    """Deterministic unit vector; texts sharing words get similar vectors"""
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    for word in re.findall(r'\w+', text.lower()):
+        digest = hashlib.md5(word.encode()).digest()
+        vector[digest[0] % EMBEDDING_DIMENSIONS] += 1.0 if digest[1] % 2 else -1.0
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+def parse_keep_alive(value) -> float:
+    """Seconds from an Ollama keep_alive value (number of seconds or '5m'-style duration)"""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE
+    if isinstance(value, (int, float)):
+        return float(value)
+    seconds = 0.0
+    for amount, unit in re.findall(r'([\d.]+)([hms]?)', str(value)):
+        seconds += float(amount) * {'h': 3600, 'm': 60}.get(unit, 1)
+    return seconds
+
+
+# Options that configure the runner; like Ollama, a change reloads the model
+RUNNER_OPTIONS = ('num_ctx', 'num_batch', 'num_gpu', 'num_thread')
+
+
+class ModelResidency:
+    """Which models are loaded, with which runner options, and until when"""
+
+    def __init__(self, load_seconds: float):
+        self.load_seconds = load_seconds
+        self._expires = {}
+        self._runner = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, model: str, keep_alive, options=None) -> float:
+        """Load ``model`` if needed; returns the load time paid in seconds"""
+        model = model.split(':', 1)[0]
+        runner = tuple((options or {}).get(key) for key in RUNNER_OPTIONS)
+        now = time.time()
+        with self._lock:
+            loaded = self._expires.get(model, 0) > now and self._runner.get(model) == runner
+            self._expires[model] = now + parse_keep_alive(keep_alive)
+            self._runner[model] = runner
+        if loaded:
+            return 0.0
+        time.sleep(self.load_seconds)
+        return self.load_seconds
+
+
+class PromptCache:
+    """Recent prompts per model, standing in for Ollama's per-slot KV cache"""
+
+    def __init__(self, slots: int = 4):
+        self.slots = slots
+        self._prompts = {}
+        self._lock = threading.Lock()
+
+    def evaluate(self, model: str, messages) -> tuple:
+        """Return (prompt tokens, tokens that missed the cache) for a chat prompt"""
+        prompt = ''.join(f"{m.get('role', '')}\n{m.get('content', '')}\n" for m in messages)
+        with self._lock:
+            recent = self._prompts.setdefault(model, [])
+            shared = 0
+            for cached in recent:
+                common = 0
+                for a, b in zip(cached, prompt):
+                    if a != b:
+                        break
+                    common += 1
+                shared = max(shared, common)
+            recent.insert(0, prompt)
+            del recent[self.slots:]
+        return len(prompt) // 4, (len(prompt) - shared) // 4
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Minimal subset of the Ollama HTTP API"""
+    protocol_version = 'HTTP/1.1'
+    config = None
+    residency = None
+    prompt_cache = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, payload):
+        line = json.dumps(payload).encode() + b'\n'
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self._send_json({'models': MODELS})
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        body = self._read_json()
+        if self.path == '/api/chat':
+            self._chat(body)
+        elif self.path == '/api/generate':
+            self._generate(body)
+        elif self.path == '/api/show':
+            self._show(body)
+        elif self.path == '/api/pull':
+            self._pull(body)
+        elif self.path == '/api/embeddings':
+            self._embeddings(body)
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_DELETE(self):
+        body = self._read_json()
+        if self.path == '/api/delete':
+            model = find_model(body.get('name') or body.get('model') or '')
+            if model is None:
+                self._send_json({'error': 'model not found'}, status=404)
+                return
+            MODELS.remove(model)
+            self._send_json({})
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def _show(self, body):
+        model = find_model(body.get('name') or body.get('model') or '')
+        if model is None:
+            self._send_json({'error': 'model not found'}, status=404)
+            return
+        family = model['details'].get('family', 'llama')
+        self._send_json({
+            'modelfile': f"FROM {model['name']}",
+            'parameters': 'num_ctx 4096',
+            'template': '{{ .Prompt }}',
+            'details': {**model['details'], 'format': 'gguf', 'quantization_level': 'Q4_0'},
+            'model_info': {f'{family}.context_length': 4096},
+        })
+
+    def _pull(self, body):
+        name = body.get('name') or body.get('model') or ''
+        if not name:
+            self._send_json({'error': 'model is required'}, status=400)
+            return
+        steps = ['pulling manifest', 'downloading', 'verifying sha256 digest', 'writing manifest', 'success']
+        if not body.get('stream', True):
+            time.sleep(self.config.pull_ms / 1000)
+            self._add_model(name)
+            self._send_json({'status': 'success'})
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for step in steps:
+            time.sleep(self.config.pull_ms / 1000 / len(steps))
+            self._send_chunk({'status': step})
+        self._add_model(name)
+        self.wfile.write(b'0\r\n\r\n')
+
+    @staticmethod
+    def _add_model(name: str):
+        if find_model(name) is None:
+            full_name = name if ':' in name else f'{name}:latest'
+            MODELS.append({'name': full_name, 'size': 3826793677, 'digest': f'fake-{full_name}',
+                           'details': {'family': name.split(':', 1)[0]}})
+
+    def _embeddings(self, body):
+        time.sleep(self.config.embed_ms / 1000)
+        self._send_json({'embedding': fake_embedding(body.get('prompt', ''))})
+
+    def _generate(self, body):
+        # An empty prompt only loads the model; otherwise a canned completion
+        config = self.config
+        model = body.get('model', 'llama2:latest')
+        load_seconds = self.residency.acquire(model, body.get('keep_alive'), body.get('options'))
+        if not body.get('prompt'):
+            self._send_json({
+                'model': model,
+                'response': '',
+                'done': True,
+                'done_reason': 'load',
+                'load_duration': int(load_seconds * 1e9),
+            })
+            return
+        stats = {
+            'load_duration': int(load_seconds * 1e9),
+            'eval_count': config.tokens,
+            'eval_duration': int(config.tokens * config.token_delay_ms * 1e6),
+        }
+        if not body.get('stream', True):
+            time.sleep(config.ttft_ms / 1000 + config.tokens * config.token_delay_ms / 1000)
+            self._send_json({'model': model, 'response': ' '.join(['token'] * config.tokens), 'done': True, **stats})
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        time.sleep(config.ttft_ms / 1000)
+        for i in range(config.tokens):
+            if i:
+                time.sleep(config.token_delay_ms / 1000)
+            self._send_chunk({'model': model, 'response': f'token{i} ', 'done': False})
+        self._send_chunk({'model': model, 'response': '', 'done': True, **stats})
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _chat(self, body):
+        config = self.config
+        model = body.get('model', 'llama2:latest')
+        started = time.perf_counter()
+        if model.split(':', 1)[0] in config.fail_model:
+            self._send_json({'error': f'model {model} failed to load'}, status=500)
+            return
+        if config.error_rate and random.random() < config.error_rate:
+            self._send_json({'error': 'injected failure'}, status=500)
+            return
+        load_seconds = self.residency.acquire(model, body.get('keep_alive'), body.get('options'))
+        _, prompt_eval_count = self.prompt_cache.evaluate(model, body.get('messages', []))
+        prefill_seconds = prompt_eval_count * config.prefill_us_per_token / 1e6
+
+        if not body.get('stream', True):
+            time.sleep(prefill_seconds + config.ttft_ms / 1000 + config.tokens * config.token_delay_ms / 1000)
+            self._send_json({
+                'model': model,
+                'message': {'role': 'assistant', 'content': ' '.join(['token'] * config.tokens)},
+                'done': True,
+                'load_duration': int(load_seconds * 1e9),
+                'prompt_eval_count': prompt_eval_count,
+                'prompt_eval_duration': int(prefill_seconds * 1e9),
+                'eval_count': config.tokens,
+                'eval_duration': int(config.tokens * config.token_delay_ms * 1e6),
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            time.sleep(prefill_seconds + config.ttft_ms / 1000)
+            for i in range(config.tokens):
+                if i:
+                    time.sleep(config.token_delay_ms / 1000)
+                self._send_chunk({'model': model, 'message': {'role': 'assistant', 'content': f'token{i} '}, 'done': False})
+            elapsed_ns = int((time.perf_counter() - started) * 1e9)
+            self._send_chunk({
+                'model': model,
+                'message': {'role': 'assistant', 'content': ''},
+                'done': True,
+                'total_duration': elapsed_ns,
+                'load_duration': int(load_seconds * 1e9),
+                'prompt_eval_count': prompt_eval_count,
+                'prompt_eval_duration': int(prefill_seconds * 1e9),
+                'eval_count': config.tokens,
+                'eval_duration': int(config.tokens * config.token_delay_ms * 1e6),
+            })
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            print(f"Chat for {model} closed by the client after {i + 1} of {config.tokens} tokens", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--tokens', type=int, default=50, help='tokens per response')
+    parser.add_argument('--token-delay-ms', type=float, default=20.0, help='delay between tokens')
+    parser.add_argument('--ttft-ms', type=float, default=100.0, help='delay before the first token')
+    parser.add_argument('--load-ms', type=float, default=0.0, help='model load time, paid when cold or when the runner options change')
+    parser.add_argument('--prefill-us-per-token', type=float, default=200.0, help='prompt evaluation cost per uncached token')
+    parser.add_argument('--fail-model', action='append', default=[], help='answer chats for this model with 500')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of chats answered with 500')
+    parser.add_argument('--pull-ms', type=float, default=500.0, help='time a model pull takes')
+    parser.add_argument('--embed-ms', type=float, default=5.0, help='time an embedding takes')
+    config = parser.parse_args()
+
+    FakeOllamaHandler.config = config
+    FakeOllamaHandler.residency = ModelResidency(config.load_ms / 1000)
+    FakeOllamaHandler.prompt_cache = PromptCache()
+    server = ThreadingHTTPServer((config.host, config.port), FakeOllamaHandler)
+    server.daemon_threads = True
+    print(f"Fake Ollama listening on http://{config.host}:{config.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
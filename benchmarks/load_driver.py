@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+End-to-end load driver
+
+Runs closed-loop clients against the Django app for each scenario and
+concurrency level, then reports requests/sec, latency and time-to-first-token
+percentiles and error rates:
+
+    llm-chat     POST /quantum-goose-app/api/llm/chat/ (one session per client)
+    simple-chat  POST /quantum-goose-app/api/chat/
+    memory       store / get / search / list on /quantum-goose-app/api/memory/
+
+Chats are sent with cache disabled so every request reaches the model. With
+--spawn the fake Ollama server and the app (uvicorn, scratch database) are
+started and stopped by the driver, so everything runs on one box offline:
+
+    python benchmarks/load_driver.py --spawn --scenario llm-chat memory --concurrency 1 8 32 --duration 20
+
+Against servers that are already running:
+
+    python benchmarks/fake_ollama.py --tokens 50 --token-delay-ms 20 &
+    uvicorn quantum_goose_project.asgi:application --port 9000 &
+    python benchmarks/load_driver.py --base-url http://127.0.0.1:9000
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = '/quantum-goose-app'
+SCENARIOS = ('llm-chat', 'simple-chat', 'memory')
+
+
+class Result:
+    """Outcome of one request"""
+
+    def __init__(self, latency: float, error: Optional[str] = None, ttft: Optional[float] = None):
+        self.latency = latency
+        self.error = error
+        self.ttft = ttft
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(max(math.ceil(pct / 100 * len(ordered)), 1), len(ordered)) - 1]
+
+
+# ============================================================================
+# SCENARIOS
+# ============================================================================
+
+async def chat(client: httpx.AsyncClient, path: str, payload: Dict, stream: bool) -> Result:
+    """One chat request; a streamed one is timed to its first token frame"""
+    started = time.perf_counter()
+    if not stream:
+        response = await client.post(path, json={**payload, 'stream': False})
+        error = None if response.status_code == 200 else f'http {response.status_code}'
+        return Result(time.perf_counter() - started, error)
+
+    ttft = None
+    error = None
+    async with client.stream('POST', path, json={**payload, 'stream': True}) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return Result(time.perf_counter() - started, f'http {response.status_code}')
+        async for line in response.aiter_lines():
+            if line.startswith('event: token') and ttft is None:
+                ttft = time.perf_counter() - started
+            elif line.startswith('event: error'):
+                error = 'sse error'
+    if error is None and ttft is None:
+        error = 'no tokens'
+    return Result(time.perf_counter() - started, error, ttft)
+
+
+async def llm_chat(client: httpx.AsyncClient, worker: int, i: int, args) -> Result:
+    return await chat(client, f'{APP}/api/llm/chat/', {
+        'message': f'load test message {worker}-{i}',
+        'session_id': f'load-{worker}',
+        'user_identifier': 'load-driver',
+        'cache': False,
+    }, args.stream)
+
+
+async def simple_chat(client: httpx.AsyncClient, worker: int, i: int, args) -> Result:
+    return await chat(client, f'{APP}/api/chat/', {
+        'message': f'load test message {worker}-{i}',
+        'cache': False,
+    }, args.stream)
+
+
+async def memory(client: httpx.AsyncClient, worker: int, i: int, args) -> Result:
+    """Cycle through store, get, search and list for this client's user"""
+    user = f'load-{worker}'
+    key = f'fact-{i // 4}'
+    started = time.perf_counter()
+    step = i % 4
+    if step == 0:
+        response = await client.post(f'{APP}/api/memory/store/', json={
+            'user_identifier': user, 'key': key, 'value': f'value {i}', 'importance': 5,
+        })
+    elif step == 1:
+        response = await client.get(f'{APP}/api/memory/get/', params={'user_identifier': user, 'key': key})
+    elif step == 2:
+        response = await client.post(f'{APP}/api/memory/search/', json={'user_identifier': user, 'query': 'value'})
+    else:
+        response = await client.get(f'{APP}/api/memory/list/', params={'user_identifier': user})
+    error = None if response.status_code == 200 else f'http {response.status_code}'
+    return Result(time.perf_counter() - started, error)
+
+
+SCENARIO_FUNCTIONS = {'llm-chat': llm_chat, 'simple-chat': simple_chat, 'memory': memory}
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+async def run_level(scenario: str, concurrency: int, args) -> Dict:
+    """``concurrency`` clients each send requests back to back until the time is up"""
+    run = SCENARIO_FUNCTIONS[scenario]
+    results: List[Result] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        started = time.perf_counter()
+        deadline = started + args.duration
+
+        async def worker(index: int) -> None:
+            i = 0
+            while time.perf_counter() < deadline and (not args.requests or i < args.requests):
+                request_started = time.perf_counter()
+                try:
+                    results.append(await run(client, index, i, args))
+                except httpx.HTTPError as e:
+                    results.append(Result(time.perf_counter() - request_started, type(e).__name__))
+                i += 1
+
+        await asyncio.gather(*(worker(index) for index in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    ok = [r for r in results if r.error is None]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if r.error:
+            errors[r.error] = errors.get(r.error, 0) + 1
+    latencies = [r.latency * 1000 for r in ok]
+    ttfts = [r.ttft * 1000 for r in ok if r.ttft is not None]
+    return {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'requests': len(results),
+        'ok': len(ok),
+        'error_rate': round(1 - len(ok) / len(results), 4) if results else 0.0,
+        'errors': errors,
+        'wall_s': round(wall, 2),
+        'rps': round(len(ok) / wall, 2) if wall else 0.0,
+        'latency_ms': {f'p{p}': _round(percentile(latencies, p)) for p in (50, 95, 99)},
+        'ttft_ms': {f'p{p}': _round(percentile(ttfts, p)) for p in (50, 95, 99)},
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+
+def print_row(r: Dict) -> None:
+    lat, ttft = r['latency_ms'], r['ttft_ms']
+    errors = ', '.join(f'{name}: {count}' for name, count in sorted(r['errors'].items())) or '-'
+    print(f"{r['scenario']:<12}{r['concurrency']:>6}{r['requests']:>8}{r['rps']:>9}"
+          f"{lat['p50']!s:>9}{lat['p95']!s:>9}{lat['p99']!s:>9}"
+          f"{ttft['p50']!s:>9}{ttft['p95']!s:>9}{ttft['p99']!s:>9}"
+          f"{r['error_rate'] * 100:>8.1f}%  {errors}")
+
+
+# ============================================================================
+# SPAWNED SERVERS
+# ============================================================================
+
+def wait_for(url: str, timeout: float = 30.0) -> None:
+    """Poll ``url`` until it answers"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=2)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f'{url} did not come up within {timeout:.0f}s')
+
+
+def spawn(args) -> List[subprocess.Popen]:
+    """Start the fake Ollama server and the app on a scratch database"""
+    env = {
+        **os.environ,
+        'PYTHONPATH': ROOT,
+        'DJANGO_SETTINGS_MODULE': 'benchmarks.load_settings',
+        'LOAD_TEST_DB': args.db or os.path.join(tempfile.mkdtemp(prefix='load-test-'), 'load.sqlite3'),
+        'LOAD_TEST_OLLAMA_URL': f'http://127.0.0.1:{args.fake_port}',
+    }
+    quiet = {'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL} if not args.verbose else {}
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'], cwd=ROOT, env=env, check=True)
+
+    fake = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, 'benchmarks', 'fake_ollama.py'),
+        '--port', str(args.fake_port),
+        '--tokens', str(args.tokens),
+        '--token-delay-ms', str(args.token_delay_ms),
+        '--ttft-ms', str(args.ttft_ms),
+        '--error-rate', str(args.fake_error_rate),
+    ], **quiet)
+    port = httpx.URL(args.base_url).port or 80
+    app = subprocess.Popen([
+        sys.executable, '-m', 'uvicorn', 'quantum_goose_project.asgi:application',
+        '--port', str(port), '--workers', str(args.workers), '--log-level', 'warning',
+    ], cwd=ROOT, env=env, **quiet)
+    processes = [fake, app]
+    try:
+        wait_for(f'http://127.0.0.1:{args.fake_port}/api/tags')
+        wait_for(f'{args.base_url}{APP}/api/llm/health/')
+    except Exception:
+        stop(processes)
+        raise
+    print(f"Spawned fake Ollama on :{args.fake_port} and the app on {args.base_url} "
+          f"({args.workers} worker(s), database {env['LOAD_TEST_DB']})")
+    return processes
+
+
+def stop(processes: List[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:9000')
+    parser.add_argument('--scenario', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per scenario and level')
+    parser.add_argument('--requests', type=int, default=0, help='stop each client after this many requests')
+    parser.add_argument('--no-stream', dest='stream', action='store_false', help='ask for complete chat responses')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--json', help='also write the results to this file')
+    spawned = parser.add_argument_group('spawned servers (--spawn)')
+    spawned.add_argument('--spawn', action='store_true', help='start the fake Ollama server and the app')
+    spawned.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    spawned.add_argument('--fake-port', type=int, default=11434)
+    spawned.add_argument('--tokens', type=int, default=50)
+    spawned.add_argument('--token-delay-ms', type=float, default=20.0)
+    spawned.add_argument('--ttft-ms', type=float, default=100.0)
+    spawned.add_argument('--fake-error-rate', type=float, default=0.0)
+    spawned.add_argument('--db', help='SQLite file for the app (default: a temporary file)')
+    spawned.add_argument('--verbose', action='store_true', help='show the spawned servers\' output')
+    args = parser.parse_args()
+
+    processes = spawn(args) if args.spawn else []
+    results = []
+    try:
+        print(f"{'scenario':<12}{'conc':>6}{'reqs':>8}{'req/s':>9}"
+              f"{'lat p50':>9}{'lat p95':>9}{'lat p99':>9}{'ttft p50':>9}{'ttft p95':>9}{'ttft p99':>9}{'errors':>9}")
+        for scenario in args.scenario:
+            for concurrency in args.concurrency:
+                result = asyncio.run(run_level(scenario, concurrency, args))
+                results.append(result)
+                print_row(result)
+    finally:
+        stop(processes)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+"""
+Django settings for load tests
+The project settings with a scratch SQLite database, DEBUG off (no query
+log) and Ollama pointed at the fake server. Used by load_driver.py --spawn.
+"""
+import os
+
+from quantum_goose_project.settings import *  # noqa: F401,F403
+from quantum_goose_project.settings import DATABASES
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+DATABASES = {
+    **DATABASES,
+    'default': {
+        **DATABASES['default'],
+        'NAME': os.environ.get('LOAD_TEST_DB', '/tmp/quantum-goose-load.sqlite3'),
+        # Concurrent writers wait for SQLite's lock instead of failing at once
+        'OPTIONS': {'timeout': 30},
+    },
+}
+
+LLM_OLLAMA_BASE_URL = os.environ.get('LOAD_TEST_OLLAMA_URL', 'http://127.0.0.1:11434')
+LLM_OLLAMA_HOSTS = [LLM_OLLAMA_BASE_URL]
@@ -20,7 +20,8 @@ export class LLMService {
         body: JSON.stringify({
           message: message,
           stream: true,
-          intelligence_level: 'super'
+          intelligence_level: 'super',
+          full_response: false
         })
       });
 
@@ -31,6 +32,7 @@ export class LLMService {
       const reader = response.body.getReader();
       const decoder = new TextDecoder();
       let buffer = '';
+      let fullResponse = '';
 
       while (true) {
         const { value, done } = await reader.read();
@@ -52,9 +54,10 @@ export class LLMService {
               const data = JSON.parse(line.substring(5).trim());
               
               if (data.token) {
+                fullResponse += data.token;
                 onToken(data.token);
-              } else if (data.full_response) {
-                onComplete(data.full_response);
+              } else if (data.status === 'completed') {
+                onComplete(data.full_response ?? fullResponse);
               } else if (data.error) {
                 onError(data.error);
               }
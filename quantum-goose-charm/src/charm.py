@@ -4,8 +4,10 @@ Quantum Goose Juju Charm
 Main charm implementation using the Juju Operator Framework
 """
 
+import http.client
 import logging
 import os
+import socket
 import subprocess
 import time
 from pathlib import Path
@@ -26,6 +28,23 @@ from src.handlers.upgrade_charm import UpgradeCharmHandler
 
 logger = logging.getLogger(__name__)
 
+# Gunicorn's bind address (see layers/django.py) and the latency histogram it exports
+APP_SOCKET = "/opt/quantum-goose/run/quantum-goose.sock"
+LATENCY_METRIC = "django_http_request_duration_seconds"
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP over a Unix domain socket"""
+
+    def __init__(self, path: str, host: str = "localhost", timeout: float = 5):
+        super().__init__(host, timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
 
 class QuantumGooseCharm(CharmBase):
     """Main quantum goose charm implementation"""
@@ -41,7 +60,9 @@ class QuantumGooseCharm(CharmBase):
             configured=False,
             started=False,
             database_configured=False,
-            relations_configured=False
+            relations_configured=False,
+            latency_sum=0.0,
+            latency_count=0
         )
         
         # Initialize handlers
@@ -471,14 +492,44 @@ class QuantumGooseCharm(CharmBase):
         except Exception:
             return 0
     
+    def _scrape_latency(self) -> tuple:
+        """Total request seconds and request count from the app's /metrics"""
+        hosts = [h.strip() for h in self.config["django-allowed-hosts"].split(",") if h.strip()]
+        host = hosts[0] if hosts and hosts[0] != "*" else "localhost"
+        conn = _UnixHTTPConnection(APP_SOCKET, host)
+        try:
+            conn.request("GET", "/metrics")
+            response = conn.getresponse()
+            body = response.read().decode()
+            if response.status != 200:
+                raise RuntimeError(f"/metrics returned {response.status}")
+        finally:
+            conn.close()
+
+        total, count = 0.0, 0
+        for line in body.splitlines():
+            name, _, value = line.rpartition(" ")
+            if name.startswith(f"{LATENCY_METRIC}_sum"):
+                total += float(value)
+            elif name.startswith(f"{LATENCY_METRIC}_count"):
+                count += int(float(value))
+        return total, count
+
     def _get_average_response_time(self) -> float:
-        """Get average response time"""
+        """Average response time (ms) since the previous status check"""
         try:
-            # This would measure actual response time
-            # For now, return a placeholder
-            return 250.0
-        except Exception:
+            total, count = self._scrape_latency()
+        except Exception as e:
+            logger.warning(f"Could not read response times from /metrics: {e}")
             return 0.0
+
+        previous_total, previous_count = self._stored.latency_sum, self._stored.latency_count
+        self._stored.latency_sum, self._stored.latency_count = total, count
+        if count > previous_count and total >= previous_total:
+            # Requests served since the last check
+            return round((total - previous_total) / (count - previous_count) * 1000, 1)
+        # Nothing new (or the app restarted and its counters reset): use the totals
+        return round(total / count * 1000, 1) if count else 0.0
     
     def _stop_services(self):
         """Stop all services"""
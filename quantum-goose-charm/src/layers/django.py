@@ -288,6 +288,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'quantum_goose_app.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.middleware.gzip.GZipMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -378,10 +379,15 @@ GRAPH_MODELS = {{
 LLM_PROVIDER = '{config["llm_provider"]}'
 LLM_API_KEY = '{config["llm_api_key"]}'
 LLM_BASE_URL = '{config["llm_base_url"]}'
+LLM_OLLAMA_HOSTS = {[url.strip() for url in config["llm_base_url"].split(',') if url.strip()]}
+LLM_OLLAMA_BASE_URL = LLM_OLLAMA_HOSTS[0]
 LLM_MODEL = '{config["llm_model"]}'
 MEMORY_LIMIT = '{config["memory_limit"]}'
 MAX_WORKERS = {config["max_workers"]}
 
+# Gunicorn workers share their Prometheus metrics through this directory
+LLM_METRICS_DIR = os.environ.get('LLM_METRICS_DIR')
+
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://127.0.0.1:6379/2'
 CELERY_RESULT_BACKEND = 'redis://127.0.0.1:6379/3'
@@ -554,6 +560,7 @@ RuntimeDirectory=quantum-goose
 RuntimeDirectoryMode=755
 WorkingDirectory={self.app_dir}
 Environment=DJANGO_SETTINGS_MODULE=quantum_goose_project.settings
+Environment=LLM_METRICS_DIR=/run/quantum-goose/metrics
 EnvironmentFile={base_layer.config_dir}/django/environment
 
 ExecStart={self.venv_path}/bin/gunicorn \\
@@ -567,7 +574,7 @@ ExecStart={self.venv_path}/bin/gunicorn \\
     --preload \\
     --log-level info \\
     --log-file {base_layer.log_dir}/gunicorn.log \\
-    quantum_goose_project.wsgi:application
+    quantum_goose_project.asgi:application
 
 ExecReload=/bin/kill -s HUP $MAINPID
 KillMode=mixed
@@ -3,16 +3,30 @@ API Views for LLM HAZoom Integration
 WebSocket and HTTP endpoints for real-time AI chat
 """
 import json
+import time
 import asyncio
-from django.http import JsonResponse, StreamingHttpResponse
+import threading
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from asgiref.sync import async_to_sync, sync_to_async
 
 from django.urls import reverse
 
+from .history_writer import get_message_writer
+from .inflight import get_coalescer
+from .model_router import get_model_router
+from .model_warmup import get_model_warmup
+from .ollama_pool import get_ollama_pool
 from .llm_backend import LLMBackend, IntelligenceLevel, LLMBackendManager
-from .system_info import SystemInfoScraper
+from .metrics import get_metrics
+from .response_cache import get_response_cache
+from .scheduler import SchedulerRejected, get_scheduler, rejection_response
+from .semantic_cache import get_semantic_cache
+from .sse import chat_event_stream, event_stream_response, get_stream_stats, ndjson_line, ndjson_response
+from .system_info import get_system_snapshot
+from .telemetry import get_telemetry
 
 try:
     from .memory_intelligence import MemoryIntelligence
@@ -55,9 +69,42 @@ def _resolve_backend(request, payload: dict | None = None):
     return backend, user_identifier, session_id
 
 
+def _wants_refresh(request) -> bool:
+    """Whether the caller asked to bypass the cached system snapshot"""
+    return request.GET.get('refresh', '').lower() in ('1', 'true', 'yes')
+
+
+def _extract_memories(backend: LLMBackend, user_message: str, user_identifier: str) -> None:
+    """Store any memories worth keeping from a user message"""
+    if not (MEMORY_INTELLIGENCE_AVAILABLE and MemoryIntelligence is not None and
+            hasattr(backend, 'memory_manager') and backend.memory_manager):
+        return
+    try:
+        extracted_memories = MemoryIntelligence.extract_memories_from_text(
+            user_message,
+            user_identifier
+        )
+        if not extracted_memories:
+            return
+
+        existing_keys = [str(m.key) for m in backend.memory_manager.get_all_memories()]
+
+        for memory in extracted_memories:
+            should_store, _ = MemoryIntelligence.should_store_memory(memory, existing_keys)
+            if should_store:
+                backend.store_memory(
+                    key=memory['key'],
+                    value=memory['value'],
+                    memory_type=memory['memory_type'],
+                    importance=memory['importance']
+                )
+    except Exception as e:
+        print(f"Memory extraction error: {e}")
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
-def chat_message(request):
+async def chat_message(request):
     """
     Handle chat message from frontend
     Returns streaming or complete response
@@ -68,10 +115,13 @@ def chat_message(request):
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
 
     try:
-        backend, user_identifier, session_id = _resolve_backend(request, data)
+        backend, user_identifier, session_id = await sync_to_async(_resolve_backend)(request, data)
 
         user_message = data.get('message', '')
         stream = data.get('stream', True)
+        options = data.get('options') if isinstance(data.get('options'), dict) else None
+        use_cache = data.get('cache')
+        include_full_response = data.get('full_response')
         intelligence_level = data.get('intelligence_level', backend.intelligence_level.value)
 
         if not user_message:
@@ -79,41 +129,41 @@ def chat_message(request):
 
         try:
             level = IntelligenceLevel(intelligence_level.lower())
-            backend.set_intelligence_level(level)
+            await sync_to_async(backend.set_intelligence_level)(level)
         except ValueError:
             pass  # Keep current
 
-        backend.add_to_history('user', user_message, metadata={'session_id': session_id})
-
-        if (MEMORY_INTELLIGENCE_AVAILABLE and MemoryIntelligence is not None and 
-            hasattr(backend, 'memory_manager') and backend.memory_manager):
+        # A cache hit is served at once; only a miss needs a generation slot
+        cached = await backend.cached_response(user_message, options, use_cache, stream=stream)
+        ticket = None
+        if cached is None:
+            # Admission control: fail fast with 429/503 instead of piling up on Ollama
             try:
-                extracted_memories = MemoryIntelligence.extract_memories_from_text(
-                    user_message,
-                    user_identifier
-                )
+                ticket = await backend.acquire_slot()
+            except SchedulerRejected as e:
+                return rejection_response(e)
 
-                existing_keys = [str(m.key) for m in backend.memory_manager.get_all_memories()]
+        backend.add_to_history('user', user_message, metadata={'session_id': session_id})
 
-                for memory in extracted_memories:
-                    should_store, _ = MemoryIntelligence.should_store_memory(memory, existing_keys)
-                    if should_store:
-                        backend.store_memory(
-                            key=memory['key'],
-                            value=memory['value'],
-                            memory_type=memory['memory_type'],
-                            importance=memory['importance']
-                        )
-            except Exception as e:
-                print(f"Memory extraction error: {e}")
+        await sync_to_async(_extract_memories)(backend, user_message, user_identifier)
 
         if stream:
-            return StreamingHttpResponse(
-                streaming_response_generator(backend, user_message, session_id),
-                content_type='text/event-stream'
+            return event_stream_response(
+                request,
+                streaming_response_generator(
+                    backend, user_message, session_id, options, use_cache, ticket, include_full_response
+                )
             )
 
-        response_text = async_to_sync(backend.generate_response)(user_message)
+        if cached is not None:
+            response_text = cached
+        else:
+            try:
+                response_text = await backend.generate_response(
+                    user_message, options=options, use_cache=use_cache, ticket=ticket
+                )
+            finally:
+                ticket.release()
         backend.add_to_history('assistant', response_text, metadata={'session_id': session_id})
 
         return JsonResponse({
@@ -121,59 +171,187 @@ def chat_message(request):
             'session_id': session_id,
             'user_identifier': user_identifier,
             'intelligence_level': backend.intelligence_level.value,
+            'model': backend.last_model,
+            'prompt_tokens': backend.last_prompt_tokens,
+            **backend.last_prefill,
+            'queue_wait_ms': ticket.queue_wait_ms if ticket else 0.0,
+            'timings': backend.last_timings,
             'system_stats': backend.get_system_stats()
         })
 
+    except SchedulerRejected as e:
+        # A failover model's queue had no slot for this request
+        return rejection_response(e)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
-def streaming_response_generator(backend: LLMBackend, user_message: str, session_id: str):
+def streaming_response_generator(
+    backend: LLMBackend,
+    user_message: str,
+    session_id: str,
+    options: dict | None = None,
+    use_cache: bool | None = None,
+    ticket=None,
+    include_full_response: bool | None = None
+):
     """Generate streaming SSE response"""
-    import asyncio
-    
-    try:
-        # Send initial event
-        yield f"event: start\ndata: {json.dumps({'status': 'started', 'session_id': session_id})}\n\n"
-        
-        response_parts = []
-        
-        # Run async generator in event loop
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
+    return chat_event_stream(
+        backend, user_message, options, use_cache, ticket,
+        session_id=session_id, include_full_response=include_full_response
+    )
+
+
+def _batch_backend(user_identifier: str, item: dict) -> LLMBackend:
+    """Stateless backend for one batch item, with its model or level applied"""
+    backend = LLMBackend(user_identifier)
+    level = item.get('intelligence_level')
+    if level:
+        backend.set_intelligence_level(IntelligenceLevel(level.lower()))
+    model = item.get('model')
+    if model and not backend.set_model(model):
+        raise ValueError(f"Model {model} is not available")
+    return backend
+
+
+async def _run_batch_item(
+    index: int,
+    item,
+    user_identifier: str,
+    semaphore: asyncio.Semaphore,
+    options: dict | None,
+    use_cache: bool | None
+) -> dict:
+    """Run one batch prompt; errors are reported in the result, never raised"""
+    if isinstance(item, str):
+        item = {'message': item}
+    result = {'index': index}
+    if 'id' in item:
+        result['id'] = item['id']
+
+    async with semaphore:
+        started = time.perf_counter()
         try:
-            async_gen = backend.generate_response_streaming(user_message)
-            while True:
+            message = item.get('message') or item.get('prompt')
+            if not message:
+                raise ValueError('No message provided')
+            item_options = item.get('options') if isinstance(item.get('options'), dict) else options
+            backend = await sync_to_async(_batch_backend)(user_identifier, item)
+            item_cache = item.get('cache', use_cache)
+            response_text = await backend.cached_response(message, item_options, item_cache, stream=False)
+            ticket = None
+            if response_text is None:
+                ticket = await backend.acquire_slot()
                 try:
-                    chunk = loop.run_until_complete(async_gen.__anext__())
-                    response_parts.append(chunk)
-                    yield f"event: token\ndata: {json.dumps({'token': chunk, 'session_id': session_id})}\n\n"
-                except StopAsyncIteration:
-                    break
-        finally:
-            loop.close()
-        
-        # Complete response
-        full_response = ''.join(response_parts)
-        backend.add_to_history('assistant', full_response, metadata={'session_id': session_id})
-        
-        # Send completion event
-        yield f"event: end\ndata: {json.dumps({'status': 'completed', 'full_response': full_response, 'session_id': session_id})}\n\n"
-    
+                    response_text = await backend.generate_response(
+                        message, options=item_options, use_cache=item_cache, ticket=ticket
+                    )
+                finally:
+                    ticket.release()
+            result.update({
+                'status': 'ok',
+                'response': response_text,
+                'model': backend.last_model,
+                'intelligence_level': backend.intelligence_level.value,
+                'prompt_tokens': backend.last_prompt_tokens,
+                'queue_wait_ms': ticket.queue_wait_ms if ticket else 0.0,
+                'timings': backend.last_timings,
+            })
+        except SchedulerRejected as e:
+            result.update({'status': 'error', 'error': str(e), 'retry_after': e.retry_after})
+        except Exception as e:
+            result.update({'status': 'error', 'error': str(e)})
+        result['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+async def batch_results_generator(
+    prompts: list,
+    user_identifier: str,
+    parallelism: int,
+    options: dict | None = None,
+    use_cache: bool | None = None
+):
+    """NDJSON lines, one per prompt in completion order, then a summary line"""
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(parallelism)
+    tasks = [
+        asyncio.ensure_future(_run_batch_item(index, item, user_identifier, semaphore, options, use_cache))
+        for index, item in enumerate(prompts)
+    ]
+    errors = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if result['status'] != 'ok':
+                errors += 1
+            yield ndjson_line(result)
+        yield ndjson_line({
+            'status': 'done',
+            'count': len(prompts),
+            'errors': errors,
+            'parallelism': parallelism,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        })
+    finally:
+        # Client went away: stop the prompts that have not finished
+        for task in tasks:
+            task.cancel()
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def chat_batch(request):
+    """
+    Run many independent prompts concurrently
+    Body: {"prompts": ["...", {"message": "...", "model": "...",
+    "intelligence_level": "nano", "id": ...}], "parallelism": 4}.
+    Streams NDJSON results in completion order; one failing prompt does not
+    abort the rest. Prompts do not read or write any session history.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    try:
+        prompts = data.get('prompts')
+        max_items = getattr(settings, 'LLM_BATCH_MAX_ITEMS', 100)
+        if not isinstance(prompts, list) or not prompts:
+            return JsonResponse({'error': 'No prompts provided'}, status=400)
+        if len(prompts) > max_items:
+            return JsonResponse({'error': f'At most {max_items} prompts per batch'}, status=400)
+        if not all(isinstance(item, (str, dict)) for item in prompts):
+            return JsonResponse({'error': 'Each prompt must be a string or an object'}, status=400)
+
+        max_parallelism = getattr(settings, 'LLM_BATCH_PARALLELISM', 4)
+        try:
+            parallelism = int(data.get('parallelism') or max_parallelism)
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'Invalid parallelism'}, status=400)
+        parallelism = max(1, min(parallelism, max_parallelism))
+
+        user_identifier = data.get('user_identifier') or DEFAULT_USER_IDENTIFIER
+        options = data.get('options') if isinstance(data.get('options'), dict) else None
+        return ndjson_response(
+            request,
+            batch_results_generator(prompts, user_identifier, parallelism, options, data.get('cache'))
+        )
+
     except Exception as e:
-        yield f"event: error\ndata: {json.dumps({'error': str(e), 'session_id': session_id})}\n\n"
+        return JsonResponse({'error': str(e)}, status=500)
 
 
 @csrf_exempt
 @require_http_methods(["GET"])
 def system_info(request):
-    """Get complete system information"""
+    """Get complete system information (pass ?refresh=1 to force a re-scrape)"""
     try:
-        info = SystemInfoScraper.get_full_system_info()
+        snapshot = get_system_snapshot(force_refresh=_wants_refresh(request))
         return JsonResponse({
-            'system_info': info,
-            'optimization': SystemInfoScraper.get_optimization_recommendations(),
+            'system_info': snapshot.info,
+            'optimization': snapshot.optimization,
+            'captured_at': snapshot.captured_at,
             'status': 'healthy'
         })
     except Exception as e:
@@ -186,14 +364,19 @@ def acceleration_info(request):
     """Get AI acceleration information"""
     try:
         backend, user_identifier, session_id = _resolve_backend(request)
-        acceleration = SystemInfoScraper.detect_ai_acceleration()
-        optimization = SystemInfoScraper.get_optimization_recommendations()
+        snapshot = get_system_snapshot(force_refresh=_wants_refresh(request))
         
         return JsonResponse({
-            'acceleration': acceleration,
-            'optimization': optimization,
+            'acceleration': snapshot.info['ai_acceleration'],
+            'optimization': snapshot.optimization,
+            'captured_at': snapshot.captured_at,
             'current_backend': backend.optimization['inference_backend'],
-            'intelligence_level': backend.intelligence_level.value
+            'intelligence_level': backend.intelligence_level.value,
+            'runtime_options': {
+                **backend.runtime_options.stats(),
+                'hardware': backend.runtime_options.hardware_options(snapshot),
+                'last_request': backend.last_runtime_options,
+            }
         })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -241,6 +424,114 @@ def clear_history(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["GET"])
+def conversation_history(request):
+    """
+    Page through a session's persisted history, newest page first
+    Pass the ``timestamp`` of the oldest message received as ``?before=``
+    to fetch the page before it.
+    """
+    try:
+        backend, user_identifier, session_id = _resolve_backend(request)
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+        before = request.GET.get('before')
+        page = backend.history_page(limit, before=float(before) if before else None)
+        return JsonResponse({
+            'session_id': session_id,
+            'messages': [
+                {
+                    'role': msg.role,
+                    'content': msg.content,
+                    'timestamp': msg.timestamp,
+                    'metadata': msg.metadata,
+                }
+                for msg in page
+            ],
+            'has_more': len(page) == limit,
+        })
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit or before'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def stream_stats(request):
+    """Completed vs cancelled chat streams and tokens saved by cancelling"""
+    try:
+        return JsonResponse({
+            **get_stream_stats().stats(),
+            'upstream_cancelled': get_coalescer().stats()['cancelled'],
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def generation_telemetry(request):
+    """TTFT, total latency, tokens/sec, prompt-eval, load and queue-wait percentiles per model and level"""
+    try:
+        return JsonResponse(get_telemetry().stats(
+            model=request.GET.get('model') or None,
+            level=request.GET.get('level') or None
+        ))
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def prompt_profiles(request):
+    """
+    System prompt profiles: the levels using each, its estimated size in
+    tokens for this session, and measured prompt evaluation per generation
+    """
+    try:
+        backend, user_identifier, session_id = _resolve_backend(request)
+        costs = backend.prompt_profile_costs()
+        profiles = backend.prompt_profiles.stats()
+        for name, profile in profiles.items():
+            profile['system_tokens'] = costs[name]
+        return JsonResponse({
+            'intelligence_level': backend.intelligence_level.value,
+            'active': backend.prompt_profile,
+            'profiles': profiles,
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+def metrics(request):
+    """
+    Prometheus scrape endpoint, summed over all worker processes
+    Served to LLM_METRICS_ALLOWED_IPS, and to clients on the local socket
+    (no address) that were not forwarded by a proxy.
+    """
+    remote = request.META.get('REMOTE_ADDR')
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR') or request.META.get('HTTP_X_REAL_IP')
+    allowed = getattr(settings, 'LLM_METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    if remote not in allowed and (remote or forwarded):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    try:
+        return HttpResponse(get_metrics().render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def history_writer_stats(request):
+    """Write-behind queue depth and Message write counters"""
+    try:
+        return JsonResponse(get_message_writer().stats())
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def chat_stats(request):
@@ -258,13 +549,105 @@ def chat_stats(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["GET"])
+def backend_stats(request):
+    """Get session registry statistics (live backends, evictions, memory)"""
+    try:
+        return JsonResponse({
+            'status': 'success',
+            'managers': LLMBackendManager.all_stats()
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "DELETE"])
+def response_cache_stats(request):
+    """Get response cache and coalescing statistics, or clear the caches with DELETE"""
+    try:
+        cache = get_response_cache()
+        semantic = get_semantic_cache()
+        if request.method == 'DELETE':
+            cache.clear()
+            semantic.clear()
+        return JsonResponse({
+            'status': 'success',
+            'response_cache': cache.stats(),
+            'semantic_cache': semantic.stats(),
+            'coalescing': get_coalescer().stats()
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def scheduler_stats(request):
+    """Get per-model concurrency, queue depth and admission statistics"""
+    try:
+        return JsonResponse({
+            'status': 'success',
+            'scheduler': get_scheduler().stats()
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def warmup_stats(request):
+    """Get model warm-up and cold/warm TTFT statistics, or re-warm now with POST"""
+    try:
+        warmup = get_model_warmup()
+        if request.method == 'POST':
+            thread = threading.Thread(target=warmup.warm_all, name='model-warmup-manual')
+            thread.daemon = True
+            thread.start()
+        return JsonResponse({
+            'status': 'started' if request.method == 'POST' else 'success',
+            'warmup': warmup.stats()
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def routing_stats(request):
+    """Get the per-level model routing table and live model latency/health"""
+    try:
+        router = get_model_router()
+        return JsonResponse({
+            'status': 'success',
+            'routing': router.routing_table(),
+            'router': router.stats()
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def host_pool_stats(request):
+    """Get per-host health, probe latency and in-flight load of the Ollama pool"""
+    try:
+        return JsonResponse({
+            'status': 'success',
+            'pool': get_ollama_pool().stats()
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def health_check_llm(request):
     """Health check for LLM backend"""
     try:
         backend, user_identifier, session_id = _resolve_backend(request)
-        system_info = SystemInfoScraper.get_full_system_info()
+        system_info = get_system_snapshot().info
         
         return JsonResponse({
             'status': 'healthy',
@@ -442,7 +825,8 @@ def ollama_status(request):
         status = {
             'ollama_available': backend.ollama_available,
             'current_model': backend.ollama_model,
-            'base_url': backend.ollama_base_url
+            'base_url': backend.ollama_base_url,
+            'catalog': backend.catalog.stats()
         }
         
         if backend.ollama_available:
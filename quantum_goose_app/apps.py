@@ -1,6 +1,39 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+
+
+def _count_queries(sender, connection, **kwargs):
+    """Count every query run on a new database connection"""
+    from .metrics import get_metrics
+
+    queries = get_metrics().counter('django_db_queries_total', 'Database queries executed', ('database',))
+
+    def counted(execute, sql, params, many, context):
+        queries.inc(database=connection.alias)
+        return execute(sql, params, many, context)
+
+    counted.counts_queries = True
+    # connection_created fires again on every reconnect of the same wrapper
+    if not any(getattr(wrapper, 'counts_queries', False) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(counted)
+
+
+def _start_warmup(sender, **kwargs):
+    """
+    Start model warm-up in the process serving requests
+    Not at import time: a thread started before gunicorn --preload forks is
+    not running in the workers. start() is a pid check once running.
+    """
+    from .model_warmup import get_model_warmup
+
+    get_model_warmup().start()
 
 
 class QuantumGooseAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quantum_goose_app'
+
+    def ready(self):
+        connection_created.connect(_count_queries, dispatch_uid='quantum_goose_app.count_queries')
+        request_started.connect(_start_warmup, dispatch_uid='quantum_goose_app.start_warmup')
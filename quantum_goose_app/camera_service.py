@@ -1,6 +1,7 @@
 """Camera streaming utilities for quantum_goose_app."""
 import time
 import logging
+import threading
 from contextlib import contextmanager
 
 try:
@@ -10,6 +11,10 @@ except ImportError:  # pragma: no cover
 
 logger = logging.getLogger(__name__)
 
+# Clients currently being sent the MJPEG stream
+_subscribers = 0
+_subscribers_lock = threading.Lock()
+
 
 class CameraUnavailableError(RuntimeError):
     """Raised when the camera cannot be accessed."""
@@ -64,8 +69,25 @@ def open_camera(device_index: int = 0):
         capture.release()
 
 
+def subscriber_count() -> int:
+    """Number of clients currently streaming from the camera."""
+    return _subscribers
+
+
 def frame_generator(device_index: int = 0):
     """Generate MJPEG frames from camera."""
+    global _subscribers
+    with _subscribers_lock:
+        _subscribers += 1
+    try:
+        yield from _camera_frames(device_index)
+    finally:
+        with _subscribers_lock:
+            _subscribers -= 1
+
+
+def _camera_frames(device_index: int = 0):
+    """Read, timestamp and encode frames, reopening the camera on failure."""
     retry_count = 0
     max_retries = 3
     
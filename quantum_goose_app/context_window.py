@@ -0,0 +1,222 @@
+"""
+Token-budgeted context window assembly
+Fills a per-model prompt budget with conversation history, newest first
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from django.conf import settings
+
+# Chat templates add a few tokens of role/turn markup per message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Context lengths used when a model is not listed in LLM_MODEL_CONTEXT_TOKENS
+DEFAULT_CONTEXT_TOKENS = {
+    'default': 4096,
+    'phi': 2048,
+    'llama2': 4096,
+}
+
+
+def count_tokens(text: str) -> int:
+    """
+    Approximate token count of a piece of text
+    Llama-family tokenizers average roughly four characters per token on
+    English prose; this errs slightly high so budgets are not overrun.
+    """
+    if not text:
+        return 0
+    return (len(text) + 3) // 4
+
+
+def context_tokens_for_model(model: str) -> int:
+    """Context length configured for a model, matched on its base name"""
+    limits = getattr(settings, 'LLM_MODEL_CONTEXT_TOKENS', DEFAULT_CONTEXT_TOKENS)
+    if model in limits:
+        return limits[model]
+    base_name = model.split(':', 1)[0]
+    return limits.get(base_name, limits.get('default', DEFAULT_CONTEXT_TOKENS['default']))
+
+
+@dataclass
+class ContextResult:
+    """Messages ready to send plus accounting for what was kept"""
+    messages: List[Dict]
+    prompt_tokens: int
+    budget: int
+    history_included: int = 0
+    history_dropped: int = 0
+    truncated: bool = False
+    summarized: bool = False
+    message_tokens: List[int] = field(default_factory=list)
+    window_start: int = 0
+
+
+class ContextWindow:
+    """
+    Assembles system prompt, history and the new user message within a budget
+
+    The system prompt and the new message are always kept. History is added
+    from the newest message backwards until the budget runs out; the first
+    message that does not fit is truncated when enough room is left, and the
+    remaining older messages are collapsed into a short extractive summary.
+
+    Passing the previous turn's ``start`` keeps the window anchored there
+    while the history after it still fits, so consecutive turns share a
+    byte-identical prefix that Ollama can serve from its KV cache. When it
+    no longer fits the start jumps forward far enough to free
+    ``hysteresis`` of the budget, rather than sliding by one message a turn.
+    """
+
+    def __init__(
+        self,
+        context_tokens: int,
+        reserve_output_tokens: int,
+        summary_tokens: int = 128,
+        min_truncated_tokens: int = 48,
+        hysteresis: float = 0.25
+    ):
+        self.context_tokens = context_tokens
+        # Never let the output reservation starve the prompt entirely
+        self.reserve_output_tokens = min(reserve_output_tokens, context_tokens // 2)
+        self.summary_tokens = summary_tokens
+        self.min_truncated_tokens = min_truncated_tokens
+        self.hysteresis = hysteresis
+
+    @classmethod
+    def for_model(cls, model: str, options: Optional[Dict] = None) -> 'ContextWindow':
+        """Window sized for a model and its output budget"""
+        num_predict = (options or {}).get('num_predict', 1000)
+        return cls(
+            context_tokens_for_model(model),
+            num_predict,
+            hysteresis=getattr(settings, 'LLM_CONTEXT_WINDOW_HYSTERESIS', 0.25)
+        )
+
+    @property
+    def budget(self) -> int:
+        """Tokens available for the prompt"""
+        return self.context_tokens - self.reserve_output_tokens
+
+    @staticmethod
+    def _message_tokens(msg) -> int:
+        return (getattr(msg, 'token_count', 0) or count_tokens(msg.content)) + MESSAGE_OVERHEAD_TOKENS
+
+    def _sticky_start(self, history: Sequence, start: int, remaining: int) -> Optional[int]:
+        """
+        Window start to use given the previous one, or None if even the
+        newest message does not fit and truncation has to take over
+        """
+        start = min(max(start, 0), len(history))
+        costs = [self._message_tokens(msg) for msg in history]
+        total = sum(costs[start:])
+        if total <= remaining - (self.summary_tokens if start else 0):
+            return start
+        target = remaining - self.summary_tokens - int(self.budget * self.hysteresis)
+        while start < len(history) and total > target:
+            total -= costs[start]
+            start += 1
+        if history and start == len(history):
+            return None
+        return start
+
+    def build(
+        self,
+        system_prompt: str,
+        history: Sequence,
+        user_message: str,
+        start: Optional[int] = None
+    ) -> ContextResult:
+        """
+        Assemble the message list for one generation
+        ``start`` is the previous turn's ``window_start`` for a sticky window.
+        """
+        history = list(history)
+        # The views record the user turn before generating; don't send it twice
+        if history and history[-1].role == 'user' and history[-1].content == user_message:
+            history = history[:-1]
+
+        system_tokens = count_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+        user_tokens = count_tokens(user_message) + MESSAGE_OVERHEAD_TOKENS
+        remaining = self.budget - system_tokens - user_tokens
+
+        kept: List[Dict] = []
+        kept_tokens: List[int] = []
+        truncated = False
+        index = len(history) - 1
+        sticky = self._sticky_start(history, start, remaining) if start is not None else None
+        if sticky is not None:
+            for msg in reversed(history[sticky:]):
+                kept.append({'role': msg.role, 'content': msg.content})
+                kept_tokens.append(self._message_tokens(msg))
+                remaining -= kept_tokens[-1]
+            index = sticky - 1
+        while sticky is None and index >= 0:
+            msg = history[index]
+            tokens = self._message_tokens(msg)
+            if tokens > remaining:
+                room = remaining - self.summary_tokens - MESSAGE_OVERHEAD_TOKENS
+                if room >= self.min_truncated_tokens:
+                    content = self._truncate(msg.content, room)
+                    kept.append({'role': msg.role, 'content': content})
+                    kept_tokens.append(count_tokens(content) + MESSAGE_OVERHEAD_TOKENS)
+                    remaining -= kept_tokens[-1]
+                    truncated = True
+                    index -= 1
+                break
+            kept.append({'role': msg.role, 'content': msg.content})
+            kept_tokens.append(tokens)
+            remaining -= tokens
+            index -= 1
+
+        dropped = history[:index + 1]
+        kept.reverse()
+        kept_tokens.reverse()
+
+        system_content = system_prompt
+        summarized = False
+        if dropped:
+            # A sticky window reserved the full summary budget; a fixed size keeps the summary stable
+            summary_budget = self.summary_tokens if sticky is not None else min(self.summary_tokens, max(remaining, 0))
+            summary = self._summarize(dropped, summary_budget)
+            if summary:
+                system_content = f"{system_prompt}\n\n{summary}"
+                system_tokens = count_tokens(system_content) + MESSAGE_OVERHEAD_TOKENS
+                summarized = True
+
+        messages = [{'role': 'system', 'content': system_content}, *kept, {'role': 'user', 'content': user_message}]
+        return ContextResult(
+            messages=messages,
+            prompt_tokens=system_tokens + sum(kept_tokens) + user_tokens,
+            budget=self.budget,
+            history_included=len(kept),
+            history_dropped=len(dropped),
+            truncated=truncated,
+            summarized=summarized,
+            message_tokens=[system_tokens, *kept_tokens, user_tokens],
+            window_start=index + 1,
+        )
+
+    @staticmethod
+    def _truncate(content: str, tokens: int) -> str:
+        """Keep the opening of a message within ``tokens``"""
+        return content[:max(tokens * 4 - 3, 0)].rstrip() + ' …'
+
+    @staticmethod
+    def _summarize(dropped: Sequence, tokens: int) -> str:
+        """Extractive one-line-per-turn digest of messages that did not fit"""
+        if tokens <= 0:
+            return ''
+        header = f"Summary of {len(dropped)} earlier messages:"
+        lines = [header]
+        used = count_tokens(header)
+        # Most recent dropped turns are the most relevant
+        for msg in reversed(dropped):
+            first_line = msg.content.strip().split('\n', 1)[0]
+            line = f"- {msg.role}: {first_line[:120]}"
+            cost = count_tokens(line)
+            if used + cost > tokens:
+                break
+            lines.insert(1, line)
+            used += cost
+        return '\n'.join(lines) if len(lines) > 1 else ''
@@ -0,0 +1,219 @@
+"""
+Write-behind persistence of chat history
+Chat turns are queued in memory and written to the Message table in
+batches by a background thread, so the request path never waits on the
+database
+"""
+import atexit
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+@dataclass
+class PendingMessage:
+    """A chat turn waiting to be written"""
+    user_identifier: str
+    session_id: str
+    role: str
+    content: str
+    metadata: Optional[Dict] = None
+    token_count: Optional[int] = None
+    # Send time (epoch seconds), written as the Message timestamp
+    timestamp: Optional[float] = None
+    seq: int = 0
+    attempts: int = 0
+    queued_at: float = field(default_factory=time.time)
+
+
+class MessageWriter:
+    """
+    Background writer for the Message table
+
+    Queued messages are written every ``flush_interval`` seconds, or as
+    soon as ``batch_size`` are waiting, as one transaction: a bulk INSERT
+    plus one atomic counter UPDATE per session. A failed batch is retried
+    on the next pass and dropped after ``max_attempts``. ``flush()`` blocks
+    until everything queued before the call has been handled, and
+    ``close()`` (registered with atexit) drains the queue on shutdown.
+    """
+
+    def __init__(self, flush_interval: float = 0.5, batch_size: int = 100, max_attempts: int = 3):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._queue: 'deque[PendingMessage]' = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+        self._seq = 0
+        self._done_seq = 0
+        self._stats = {'queued': 0, 'written': 0, 'batches': 0, 'discarded': 0, 'dropped': 0, 'errors': 0}
+
+    def enqueue(
+        self,
+        user_identifier: str,
+        session_id: str,
+        role: str,
+        content: str,
+        metadata: Optional[Dict] = None,
+        token_count: Optional[int] = None,
+        timestamp: Optional[float] = None
+    ) -> None:
+        """Queue one message for writing; never touches the database"""
+        self.start()
+        with self._cond:
+            self._seq += 1
+            self._queue.append(PendingMessage(
+                user_identifier, session_id, role, content, metadata, token_count,
+                timestamp=timestamp if timestamp is not None else time.time(), seq=self._seq
+            ))
+            self._stats['queued'] += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def pending(self, user_identifier: Optional[str] = None, session_id: Optional[str] = None) -> int:
+        """Messages not written yet, optionally for one session"""
+        with self._cond:
+            if session_id is None:
+                return len(self._queue)
+            return sum(
+                1 for item in self._queue
+                if item.session_id == session_id and item.user_identifier == user_identifier
+            )
+
+    def discard(self, user_identifier: str, session_id: str) -> int:
+        """Drop a session's unwritten messages (its history was cleared)"""
+        with self._cond:
+            kept = deque(
+                item for item in self._queue
+                if not (item.session_id == session_id and item.user_identifier == user_identifier)
+            )
+            dropped = len(self._queue) - len(kept)
+            self._queue = kept
+            self._stats['discarded'] += dropped
+            self._advance()
+            return dropped
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is written; False on timeout"""
+        with self._cond:
+            target = self._seq
+            if self._done_seq >= target:
+                return True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._done_seq >= target, timeout)
+
+    def start(self) -> None:
+        """Start the writer thread if it is not already running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._closing or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._run, name='message-writer', daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the writer thread and write whatever is still queued"""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        # Whatever the thread left behind (or everything, if it never ran)
+        while self._write_next():
+            pass
+
+    def _advance(self) -> None:
+        """Mark everything before the oldest queued message done; caller holds the lock"""
+        self._done_seq = self._queue[0].seq - 1 if self._queue else self._seq
+        self._cond.notify_all()
+
+    def _run(self) -> None:
+        """Writer loop"""
+        while True:
+            with self._cond:
+                if self._closing:
+                    return
+                if len(self._queue) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+            while self._write_next():
+                pass
+
+    def _write_next(self) -> bool:
+        """Write the next batch; returns whether the queue may hold more"""
+        with self._cond:
+            batch = [self._queue[i] for i in range(min(len(self._queue), self.batch_size))]
+        if not batch:
+            return False
+        written = self._write(batch)
+        with self._cond:
+            # discard() may have removed some of the batch meanwhile
+            batch_ids = {id(item) for item in batch}
+            if written:
+                self._queue = deque(item for item in self._queue if id(item) not in batch_ids)
+                self._stats['written'] += len(batch)
+                self._stats['batches'] += 1
+            else:
+                for item in batch:
+                    item.attempts += 1
+                failed = [item for item in batch if item.attempts >= self.max_attempts]
+                if failed:
+                    failed_ids = {id(item) for item in failed}
+                    self._queue = deque(item for item in self._queue if id(item) not in failed_ids)
+                    self._stats['dropped'] += len(failed)
+                    print(f"Dropping {len(failed)} unwritable messages")
+            self._advance()
+        # On failure wait for the next pass instead of spinning
+        return bool(written) and len(batch) == self.batch_size
+
+    def _write(self, batch) -> int:
+        """Write a batch in one transaction; returns how many were written (all or none)"""
+        from .memory_manager import MemoryManager
+
+        try:
+            return MemoryManager.bulk_add_messages(batch)
+        except Exception as e:
+            with self._cond:
+                self._stats['errors'] += 1
+            print(f"Message write failed: {e}")
+            return 0
+        finally:
+            close_old_connections()
+
+    def stats(self) -> Dict:
+        """Queue depth and write counters"""
+        with self._cond:
+            oldest = self._queue[0].queued_at if self._queue else None
+            return {
+                **self._stats,
+                'pending': len(self._queue),
+                'oldest_pending_s': round(time.time() - oldest, 3) if oldest else 0.0,
+                'flush_interval': self.flush_interval,
+            }
+
+
+_writer: Optional[MessageWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_message_writer() -> MessageWriter:
+    """Return the process-wide message writer"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = MessageWriter(
+                    flush_interval=getattr(settings, 'LLM_HISTORY_FLUSH_INTERVAL', 0.5),
+                    batch_size=getattr(settings, 'LLM_HISTORY_BATCH_SIZE', 100),
+                )
+                # Durability on clean shutdown: write out everything still queued
+                atexit.register(_writer.close)
+    return _writer
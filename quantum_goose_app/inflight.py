@@ -0,0 +1,185 @@
+"""
+Single-flight coalescing of identical in-flight generations
+Later identical requests subscribe to the first request's token stream
+"""
+import asyncio
+import concurrent.futures
+import threading
+from contextlib import aclosing
+from typing import AsyncGenerator, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .ollama_client import OllamaClient, OllamaError, get_ollama_client
+
+_Subscriber = Tuple[asyncio.AbstractEventLoop, asyncio.Queue]
+
+
+class _Broadcast:
+    """Token fan-out for one running generation"""
+
+    def __init__(self):
+        self.tokens: List[str] = []
+        self.subscribers: List[_Subscriber] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.future: Optional[concurrent.futures.Future] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _deliver(subscriber: _Subscriber, item: Tuple) -> None:
+        loop, queue = subscriber
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            pass  # subscriber's loop already closed
+
+    def subscribe(self, subscriber: _Subscriber) -> None:
+        """Attach a subscriber, replaying the tokens produced so far"""
+        with self._lock:
+            _, queue = subscriber
+            for token in self.tokens:
+                queue.put_nowait(('token', token))
+            if self.done:
+                queue.put_nowait(('error', self.error) if self.error else ('done', None))
+            else:
+                self.subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber: _Subscriber) -> int:
+        """Detach a subscriber; returns how many remain"""
+        with self._lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+            return len(self.subscribers)
+
+    def publish(self, token: str) -> None:
+        with self._lock:
+            self.tokens.append(token)
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            self._deliver(subscriber, ('token', token))
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.done = True
+            self.error = error
+            subscribers = list(self.subscribers)
+            self.subscribers.clear()
+        for subscriber in subscribers:
+            self._deliver(subscriber, ('error', error) if error else ('done', None))
+
+
+class GenerationCoalescer:
+    """
+    Runs each distinct generation once and fans its tokens out to every
+    identical request that arrives while it is still running
+
+    The generation itself runs on the Ollama client's engine loop, so it is
+    not tied to the request that started it: if that client goes away the
+    remaining subscribers keep receiving tokens. When the last subscriber
+    leaves, the generation is cancelled.
+    """
+
+    def __init__(self, client: OllamaClient, enabled: bool = True):
+        self.client = client
+        self.enabled = enabled
+        self._inflight: Dict[str, _Broadcast] = {}
+        self._lock = threading.Lock()
+        self._stats = {'leaders': 0, 'coalesced': 0, 'cancelled': 0}
+
+    async def stream(
+        self,
+        key: str,
+        factory: Callable[[], AsyncGenerator[str, None]],
+        on_follow: Optional[Callable[[], None]] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Yield the tokens of the generation identified by ``key``
+        ``on_follow`` is called when the request joins a generation that is
+        already running instead of starting its own.
+        """
+        if not self.enabled:
+            async with aclosing(factory()) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+            return
+
+        subscriber: _Subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            broadcast = self._inflight.get(key)
+            if broadcast is None:
+                broadcast = _Broadcast()
+                self._inflight[key] = broadcast
+                self._stats['leaders'] += 1
+                broadcast.subscribe(subscriber)
+                broadcast.future = self.client.submit(self._produce(key, broadcast, factory))
+            else:
+                self._stats['coalesced'] += 1
+                broadcast.subscribe(subscriber)
+                if on_follow is not None:
+                    on_follow()
+
+        _, queue = subscriber
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == 'token':
+                    yield value
+                elif kind == 'error':
+                    raise value
+                else:
+                    return
+        finally:
+            if broadcast.unsubscribe(subscriber) == 0 and not broadcast.done:
+                with self._lock:
+                    self._stats['cancelled'] += 1
+                broadcast.future.cancel()
+
+    async def _produce(
+        self,
+        key: str,
+        broadcast: _Broadcast,
+        factory: Callable[[], AsyncGenerator[str, None]]
+    ) -> None:
+        """Drive the generation on the engine loop"""
+        try:
+            async with aclosing(factory()) as chunks:
+                async for chunk in chunks:
+                    broadcast.publish(chunk)
+        except asyncio.CancelledError:
+            broadcast.finish(OllamaError("Generation cancelled"))
+            raise
+        except Exception as e:
+            broadcast.finish(e)
+        else:
+            broadcast.finish()
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is broadcast:
+                    del self._inflight[key]
+
+    def stats(self) -> Dict:
+        """Leader/follower counters"""
+        with self._lock:
+            return {
+                **self._stats,
+                'enabled': self.enabled,
+                'inflight': len(self._inflight),
+            }
+
+
+_coalescer: Optional[GenerationCoalescer] = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer() -> GenerationCoalescer:
+    """Return the process-wide generation coalescer"""
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = GenerationCoalescer(
+                    get_ollama_client(),
+                    enabled=getattr(settings, 'LLM_COALESCE_GENERATIONS', True),
+                )
+    return _coalescer
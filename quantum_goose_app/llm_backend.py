@@ -3,23 +3,45 @@ LLM HAZoom Backend - Super Intelligence Integration
 Automated nano-chat with real AI model integration and acceleration
 """
 import os
+import sys
 import json
+import time
 import asyncio
-import requests
+import weakref
 import subprocess
+from collections import OrderedDict
 from typing import AsyncGenerator, Dict, List, Optional, Tuple
 import threading
+from contextlib import aclosing
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
 from dataclasses import dataclass
 from enum import Enum
 
-from .system_info import SystemInfoScraper
+from .context_window import ContextWindow, count_tokens
+from .history_writer import get_message_writer
+from .inflight import get_coalescer
+from .model_catalog import get_model_catalog
+from .model_router import get_model_router
+from .model_warmup import get_model_warmup
+from .ollama_client import OllamaError, get_ollama_client
+from .ollama_pool import get_ollama_pool
+from .prompt_profiles import get_prompt_profiles
+from .response_cache import ResponseCache, get_response_cache
+from .runtime_options import get_runtime_options
+from .scheduler import Ticket, get_scheduler
+from .semantic_cache import context_scope, get_semantic_cache
+from .system_info import get_system_snapshot
+from .telemetry import get_telemetry
 
 try:
-    from .memory_manager import MemoryManager
+    from .memory_manager import MemoryManager, get_context_version
     MEMORY_AVAILABLE = True
 except ImportError:
     MEMORY_AVAILABLE = False
     MemoryManager = None
+    get_context_version = None
 
 
 class IntelligenceLevel(Enum):
@@ -30,6 +52,26 @@ class IntelligenceLevel(Enum):
     QUANTUM = "quantum"  # Consciousness-level processing
 
 
+# Ollama model per intelligence level
+LEVEL_MODELS = {
+    IntelligenceLevel.NANO: "phi",
+    IntelligenceLevel.STANDARD: "llama2",
+    IntelligenceLevel.SUPER: "llama2",
+    IntelligenceLevel.QUANTUM: "llama2",
+}
+
+# Default sampling options for streaming and complete generations
+STREAM_OPTIONS = {"temperature": 0.7, "top_p": 0.9, "num_predict": 2000}
+COMPLETION_OPTIONS = {"temperature": 0.7, "top_p": 0.9, "num_predict": 1000}
+
+# Sampling options callers may override per request
+ALLOWED_OPTIONS = {"temperature", "top_p", "top_k", "num_predict", "seed", "repeat_penalty", "stop"}
+
+def _is_host_error(error: BaseException) -> bool:
+    """Transport failures (no HTTP status) point at the host, not the model"""
+    return isinstance(error, OllamaError) and error.status_code is None
+
+
 @dataclass
 class ChatMessage:
     """Chat message structure"""
@@ -37,6 +79,7 @@ class ChatMessage:
     content: str
     timestamp: float
     metadata: Optional[Dict] = None
+    token_count: int = 0
 
 
 class LLMBackend:
@@ -47,32 +90,84 @@ class LLMBackend:
     """
     
     def __init__(self, user_identifier: str = 'anonymous', session_id: Optional[str] = None):
-        self.system_info = SystemInfoScraper.get_full_system_info()
-        self.optimization = SystemInfoScraper.get_optimization_recommendations()
         self.conversation_history: List[ChatMessage] = []
         self.intelligence_level = IntelligenceLevel.SUPER
         
         # Ollama integration
-        self.ollama_base_url = "http://localhost:11434"
-        self.ollama_available = self._check_ollama_availability()
+        self.ollama = get_ollama_client()
+        self.pool = get_ollama_pool()
+        self.catalog = get_model_catalog()
+        self.response_cache = get_response_cache()
+        self.semantic_cache = get_semantic_cache()
+        self.coalescer = get_coalescer()
+        self.scheduler = get_scheduler()
+        self.warmup = get_model_warmup()
+        self.router = get_model_router()
+        self.telemetry = get_telemetry()
+        self.runtime_options = get_runtime_options()
+        self.prompt_profiles = get_prompt_profiles()
+        self.first_token_timeout = getattr(settings, 'LLM_ROUTER_FIRST_TOKEN_TIMEOUT', 60.0)
         self.ollama_model = "not_set" # temporary value
         self.ollama_model = self._select_best_available_model()
+        self.model_pinned = False  # set_model() overrides routing
+        self.last_model = None
         
         # Memory management
         self.user_identifier = user_identifier
         self.session_id = session_id
         self.memory_manager = None
+        self.last_used = time.time()
+        self.writer = get_message_writer()
+        # Leading messages of conversation_history already handed to the writer
+        self._persisted_count = 0
+        self.has_older_history = False
+        self.last_prompt_tokens = 0
+        # Sticky context window: timestamp of the oldest history message sent in full
+        self._window_start_ts: Optional[float] = None
+        self.last_prefill: Dict = {}
+        self._prefill_stats = {'generations': 0, 'prompt_tokens': 0, 'prompt_eval_count': 0, 'prompt_eval_ms': 0.0}
+        # Timings of the last generation this backend ran, and its scheduler wait
+        self.last_timings: Dict = {}
+        self._queue_wait = 0.0
+        # Hardware/context options sent with the last Ollama request
+        self.last_runtime_options: Dict = {}
+        # Cache lookup done by cached_response, for the generation that follows
+        self._lookup: Optional[Tuple[Tuple, Tuple]] = None
         
         # Initialize with system awareness
-        self.system_context = self._build_system_context()
+        self.memory_context_ttl = getattr(settings, 'LLM_PROMPT_MEMORY_TTL', 300.0)
+        self._prompt_segments: Dict[str, Tuple[Tuple, str]] = {}
+        self._prompt_stats = {'hits': 0, 'rebuilds': 0}
+        self._assembled: Optional[Tuple[Tuple, str]] = None
+        # Prompt profile and size of system_context, and of the last prompt sent
+        self.prompt_profile = 'full'
+        self.system_tokens = 0
+        self._sent_profile: Optional[Tuple[str, int]] = None
+        self.refresh_system_context()
     
+    @property
+    def system_info(self) -> Dict:
+        """Hardware info from the shared process-wide snapshot"""
+        return get_system_snapshot().info
+
+    @property
+    def optimization(self) -> Dict:
+        """Optimization recommendations from the shared process-wide snapshot"""
+        return get_system_snapshot().optimization
+
+    @property
+    def ollama_base_url(self) -> str:
+        """Ollama host used for model listing and management"""
+        return self.pool.primary_url()
+
+    @property
+    def ollama_available(self) -> bool:
+        """Whether Ollama answered its last (cached) model listing"""
+        return self._check_ollama_availability()
+
     def _check_ollama_availability(self) -> bool:
         """Check if Ollama is available and running"""
-        try:
-            response = requests.get(f"{self.ollama_base_url}/api/tags", timeout=5)
-            return response.status_code == 200
-        except:
-            return False
+        return self.catalog.is_available(self.ollama_base_url)
 
     def _select_best_available_model(self) -> str:
         """Select the best available model based on size and recency"""
@@ -107,20 +202,18 @@ class LLMBackend:
             return []
         
         try:
-            response = requests.get(f"{self.ollama_base_url}/api/tags", timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                models = []
-                for model in data.get('models', []):
-                    models.append({
-                        'name': model.get('name', ''),
-                        'size': model.get('size', 0),
-                        'digest': model.get('digest', ''),
-                        'modified_at': model.get('modified_at', ''),
-                        'details': model.get('details', {}),
-                        'is_current': model.get('name', '') == self.ollama_model
-                    })
-                return models
+            data = self.catalog.tags(self.ollama_base_url)
+            models = []
+            for model in data.get('models', []):
+                models.append({
+                    'name': model.get('name', ''),
+                    'size': model.get('size', 0),
+                    'digest': model.get('digest', ''),
+                    'modified_at': model.get('modified_at', ''),
+                    'details': model.get('details', {}),
+                    'is_current': model.get('name', '') == self.ollama_model
+                })
+            return models
         except Exception as e:
             print(f"Error fetching models: {e}")
         
@@ -139,6 +232,7 @@ class LLMBackend:
             return False
         
         self.ollama_model = model_name
+        self.model_pinned = True
         return True
     
     def pull_model(self, model_name: str) -> bool:
@@ -146,32 +240,31 @@ class LLMBackend:
         if not self.ollama_available:
             return False
         
-        try:
-            response = requests.post(
-                f"{self.ollama_base_url}/api/pull",
-                json={"name": model_name},
-                timeout=300  # 5 minutes timeout for large models
-            )
-            return response.status_code == 200
-        except Exception as e:
-            print(f"Error pulling model {model_name}: {e}")
-            return False
+        # Every node in the pool should be able to serve the model
+        pulled = False
+        for base_url in self.pool.urls:
+            try:
+                self.ollama.run_sync(self.ollama.pull(model_name, base_url))
+                self.catalog.invalidate(base_url, model_name)
+                pulled = True
+            except Exception as e:
+                print(f"Error pulling model {model_name} on {base_url}: {e}")
+        return pulled
     
     def delete_model(self, model_name: str) -> bool:
         """Delete a model from Ollama"""
         if not self.ollama_available:
             return False
         
-        try:
-            response = requests.delete(
-                f"{self.ollama_base_url}/api/delete",
-                json={"name": model_name},
-                timeout=30
-            )
-            return response.status_code == 200
-        except Exception as e:
-            print(f"Error deleting model {model_name}: {e}")
-            return False
+        deleted = False
+        for base_url in self.pool.urls:
+            try:
+                self.ollama.run_sync(self.ollama.delete(model_name, base_url))
+                self.catalog.invalidate(base_url, model_name)
+                deleted = True
+            except Exception as e:
+                print(f"Error deleting model {model_name} on {base_url}: {e}")
+        return deleted
     
     def get_model_info(self, model_name: str) -> Optional[Dict]:
         """Get detailed information about a specific model"""
@@ -179,92 +272,226 @@ class LLMBackend:
             return None
         
         try:
-            response = requests.post(
-                f"{self.ollama_base_url}/api/show",
-                json={"name": model_name},
-                timeout=10
-            )
-            if response.status_code == 200:
-                return response.json()
+            return self.catalog.show(model_name, self.ollama_base_url)
         except Exception as e:
             print(f"Error getting model info for {model_name}: {e}")
         
         return None
     
-    def _build_system_context(self) -> str:
-        """Build system context for AI awareness with memory"""
-        cpu_info = self.system_info['cpu']
-        gpu_info = self.system_info['gpu']
-        mem_info = self.system_info['memory']
-
-        # Get current model info
-        model_info = ""
-        if self.ollama_available:
-            try:
-                models = self.get_available_models()
-                current_model_data = next((m for m in models if m['name'] == self.ollama_model), None)
-                if current_model_data:
-                    size_gb = round(current_model_data.get('size', 0) / (1024**3), 2)
-                    model_info = f"""
- CURRENT AI MODEL:
- - Model: {self.ollama_model}
- - Size: {size_gb} GB
- - Status: Active and optimized"""
-            except:
-                pass
+    def _segment(self, name: str, key: Tuple, build) -> str:
+        """Return a cached system-prompt segment, rebuilding it only when its key changed"""
+        cached = self._prompt_segments.get(name)
+        if cached is not None and cached[0] == key:
+            self._prompt_stats['hits'] += 1
+            return cached[1]
+        text = build()
+        self._prompt_segments[name] = (key, text)
+        self._prompt_stats['rebuilds'] += 1
+        return text
 
-        context = f"""You are HAZoom, a super-intelligent AI assistant running on:
+    @staticmethod
+    def _hardware_key(snapshot) -> Tuple:
+        cpu_info = snapshot.info['cpu']
+        return (
+            cpu_info['processor'],
+            cpu_info['cores_physical'],
+            cpu_info['cores_logical'],
+            tuple(g['name'] for g in snapshot.info['gpu']['gpus']),
+            snapshot.info['memory']['total_gb'],
+            snapshot.optimization['inference_backend'],
+            snapshot.optimization.get('recommended_framework'),
+        )
 
+    def _hardware_segment(self, snapshot) -> str:
+        cpu_info = snapshot.info['cpu']
+        gpu_info = snapshot.info['gpu']
+        mem_info = snapshot.info['memory']
+        optimization = snapshot.optimization
+        return f"""
  SYSTEM SPECIFICATIONS:
  - CPU: {cpu_info['processor']} ({cpu_info['cores_physical']} physical cores, {cpu_info['cores_logical']} logical cores)
  - GPU: {', '.join(g['name'] for g in gpu_info['gpus']) if gpu_info['gpus'] else 'No dedicated GPU detected'}
  - Memory: {mem_info['total_gb']} GB RAM ({mem_info['available_gb']} GB available)
- - Acceleration: {self.optimization['inference_backend'].upper()}
- - Recommended Backend: {self.optimization.get('recommended_framework', 'CPU')}{model_info}
+ - Acceleration: {optimization['inference_backend'].upper()}
+ - Recommended Backend: {optimization.get('recommended_framework', 'CPU')}"""
+
+    def _settings_segment(self, snapshot) -> str:
+        return f"""
 
  OPTIMIZATION SETTINGS:
- - Batch Size: {self.optimization['batch_size']}
- - Thread Count: {self.optimization['thread_count']}
+ - Batch Size: {snapshot.optimization['batch_size']}
+ - Thread Count: {snapshot.optimization['thread_count']}
  - Intelligence Level: {self.intelligence_level.value.upper()}
+"""
 
- You have super intelligence capabilities and can help with any task. You are aware of the system
- you're running on and can optimize your responses accordingly. You aim for peace and optimization.
+    def _model_segment(self) -> str:
+        if not self.ollama_available:
+            return ""
+        try:
+            models = self.get_available_models()
+            current_model_data = next((m for m in models if m['name'] == self.ollama_model), None)
+            if current_model_data:
+                size_gb = round(current_model_data.get('size', 0) / (1024**3), 2)
+                return f"""
+ CURRENT AI MODEL:
+ - Model: {self.ollama_model}
+ - Size: {size_gb} GB
+ - Status: Active and optimized"""
+        except Exception:
+            pass
+        return ""
 
- MEMORY CAPABILITIES:
- You have access to persistent memory! You can remember:
- - User preferences and settings
- - Important facts and context from previous conversations
- - Knowledge base of technical information
- - Conversation history across sessions
+    def _memory_segment(self) -> str:
+        memory_context = self.memory_manager.build_llm_context(
+            self.session_id,
+            include_memories=True,
+            include_knowledge=False,
+            include_recent_history=False
+        )
+        return f"\n{memory_context}" if memory_context else ""
 
- When users mention something important, you can store it for future reference.
- """
-        
-        # Add memory context if available
-        if MEMORY_AVAILABLE and self.memory_manager and self.session_id:
-            memory_context = self.memory_manager.build_llm_context(
-                self.session_id,
-                include_memories=True,
-                include_knowledge=False,
-                include_recent_history=False
+    def _render_profile(self, profile: Dict) -> Tuple[Tuple, str]:
+        """
+        System prompt for ``profile``, with the parts it was assembled from
+
+        Segments are built from the cached pieces below, each rebuilt only
+        when its input changes: the hardware snapshot is re-scraped, the
+        intelligence level or active model changes, the model catalog
+        changes, or the user's memories or preferences are written. Sections
+        the profile leaves out are never built.
+        """
+        sections = profile['sections']
+        snapshot = get_system_snapshot()
+        texts = {'intro': profile['intro'], 'capabilities': profile['capabilities']}
+        if 'hardware' in sections:
+            # Keyed on the hardware itself, not on each re-scrape: a prompt that
+            # changes with free RAM would defeat Ollama's prefix cache every minute
+            texts['hardware'] = self._segment(
+                'hardware', self._hardware_key(snapshot), lambda: self._hardware_segment(snapshot)
             )
-            if memory_context:
-                context += f"\n{memory_context}"
-        
-        return context
-    
+        if 'model' in sections:
+            texts['model'] = self._segment('model', (self.ollama_model, self.catalog.version), self._model_segment)
+        if 'settings' in sections:
+            texts['settings'] = self._segment(
+                'settings',
+                (snapshot.optimization['batch_size'], snapshot.optimization['thread_count'], self.intelligence_level),
+                lambda: self._settings_segment(snapshot)
+            )
+        if 'memory' in sections and MEMORY_AVAILABLE and self.memory_manager and self.session_id:
+            # Writes in another worker process are picked up after the TTL
+            window = int(time.time() // self.memory_context_ttl) if self.memory_context_ttl else 0
+            texts['memory'] = self._segment(
+                'memory',
+                (self.user_identifier, self.session_id, get_context_version(self.user_identifier), window),
+                self._memory_segment
+            )
+        parts = tuple(texts.get(section, '') for section in sections)
+        return parts, ''.join(parts)
+
+    def _build_system_context(self) -> str:
+        """
+        Build system context for AI awareness with memory
+
+        Uses the prompt profile of the current intelligence level. With
+        nothing changed this does no HTTP or database work.
+        """
+        name, profile = self.prompt_profiles.for_level(self.intelligence_level.value)
+        parts, text = self._render_profile(profile)
+        parts = (name,) + parts
+        if self._assembled is None or self._assembled[0] != parts:
+            self._assembled = (parts, text)
+            self.system_tokens = count_tokens(text)
+        self.prompt_profile = name
+        return self._assembled[1]
+
+    def prompt_profile_costs(self) -> Dict[str, int]:
+        """Estimated system prompt tokens of every profile for this session"""
+        return {
+            name: count_tokens(self._render_profile(profile)[1])
+            for name, profile in self.prompt_profiles.profiles.items()
+        }
+
+    def refresh_system_context(self) -> str:
+        """Bring ``system_context`` up to date; cheap when nothing changed"""
+        self.system_context = self._build_system_context()
+        return self.system_context
+
     def set_intelligence_level(self, level: IntelligenceLevel):
         """Set the intelligence routing level"""
         self.intelligence_level = level
-        self.system_context = self._build_system_context()
+        self.refresh_system_context()
     
     def initialize_memory(self, session_id: str):
         """Initialize memory manager for this session"""
         if MEMORY_AVAILABLE and MemoryManager is not None:
             self.memory_manager = MemoryManager(self.user_identifier)
             self.session_id = session_id
-            self.memory_manager.get_or_create_session(session_id)
-            self.system_context = self._build_system_context()
+            self.restore_history()
+            self.refresh_system_context()
+    
+    def history_page(self, limit: int, before: Optional[float] = None) -> List[ChatMessage]:
+        """
+        Persisted messages of this session (oldest first), newest ``limit``
+        before the ``before`` timestamp; waits for this session's queued writes
+        """
+        if not (MEMORY_AVAILABLE and self.memory_manager and self.session_id):
+            return []
+        if self.writer.pending(self.user_identifier, self.session_id):
+            self.writer.flush(timeout=5.0)
+        before_dt = datetime.fromtimestamp(before, tz=dt_timezone.utc) if before is not None else None
+        page = [
+            ChatMessage(
+                role=message.role,
+                content=message.content,
+                timestamp=message.timestamp.timestamp(),
+                metadata=message.metadata,
+                token_count=message.token_count or count_tokens(message.content)
+            )
+            for message in self.memory_manager.get_latest_history(self.session_id, limit=limit, before=before_dt)
+        ]
+        return page
+    
+    def restore_history(self, limit: Optional[int] = None):
+        """
+        Reload the latest persisted window of this session into memory
+        A new session costs one lookup; an existing one a single query on
+        the (session, timestamp) index. Older turns stay in the database
+        until load_older_history asks for them.
+        """
+        if not (MEMORY_AVAILABLE and self.memory_manager and self.session_id):
+            return
+        limit = limit or getattr(settings, 'LLM_HISTORY_RESTORE_LIMIT', 20)
+        restored = self.history_page(limit)
+        self.has_older_history = len(restored) == limit
+        self.conversation_history = restored + self.conversation_history[self._persisted_count:]
+        self._persisted_count = len(restored)
+    
+    def load_older_history(self, limit: int = 20) -> List[ChatMessage]:
+        """Prepend the page of persisted messages before the oldest one loaded"""
+        if not (MEMORY_AVAILABLE and self.memory_manager and self.session_id) or not self.has_older_history:
+            return []
+        oldest = self.conversation_history[0].timestamp if self.conversation_history else None
+        page = self.history_page(limit, before=oldest)
+        self.has_older_history = len(page) == limit
+        self.conversation_history = page + self.conversation_history
+        self._persisted_count += len(page)
+        return page
+    
+    def persist_history(self):
+        """Hand messages not yet stored to the write-behind Message writer"""
+        if not (MEMORY_AVAILABLE and self.memory_manager and self.session_id):
+            return
+        for msg in self.conversation_history[self._persisted_count:]:
+            self.writer.enqueue(
+                self.user_identifier,
+                self.session_id,
+                role=msg.role,
+                content=msg.content,
+                metadata=msg.metadata,
+                token_count=msg.token_count,
+                timestamp=msg.timestamp
+            )
+            self._persisted_count += 1
     
     def store_memory(self, key: str, value: str, memory_type: str = 'fact', importance: int = 5):
         """Store a memory"""
@@ -289,98 +516,377 @@ class LLMBackend:
             return self.memory_manager.search_memories(query, limit=limit)
         return []
     
+    async def cached_response(
+        self,
+        user_message: str,
+        options: Optional[Dict] = None,
+        use_cache: Optional[bool] = None,
+        stream: bool = True
+    ) -> Optional[str]:
+        """
+        Cached reply to a request, looked up before it waits for a slot
+        The views call this ahead of acquire_slot so a cache hit is never
+        queued or rejected. On a miss the generation that follows reuses
+        this lookup instead of embedding the prompt again.
+        """
+        defaults = STREAM_OPTIONS if stream else COMPLETION_OPTIONS
+        prepared = await self._prepare(user_message, defaults, options, use_cache)
+        self._lookup = ((prepared[4], use_cache), prepared)
+        return prepared[3]
+    
+    async def _prepare(
+        self,
+        user_message: str,
+        defaults: Dict,
+        options: Optional[Dict],
+        use_cache: Optional[bool],
+        system_prompt: Optional[str] = None
+    ) -> Tuple[List[str], List[Dict], Dict, Optional[str], str, Dict]:
+        """
+        Candidates, messages, options and cache lookup for one generation
+        Returns (candidates, messages, options, cached, flight key, cache
+        handle); a lookup cached_response made for the same request is used
+        once instead of looking up again.
+        """
+        candidates = await self._candidate_models()
+        model = candidates[0]
+        self.last_model = model
+        options = self._request_options(defaults, options)
+        messages = self._build_messages(user_message, model, options, system_prompt)
+        flight_key = ResponseCache.make_key(model, messages, options)
+        lookup, self._lookup = self._lookup, None
+        if lookup is not None and lookup[0] == (flight_key, use_cache):
+            return lookup[1]
+        cached, cache_handle = await self._cache_lookup(model, messages, options, use_cache, flight_key)
+        return candidates, messages, options, cached, flight_key, cache_handle
+    
+    async def acquire_slot(self) -> Ticket:
+        """
+        Wait for a generation slot on the model this request will use
+        Raises SchedulerRejected when the model's queue is full or the wait
+        times out.
+        """
+        model = (await self._candidate_models())[0]
+        return await self.scheduler.acquire(model, self.intelligence_level.value)
+    
     async def generate_response_streaming(
         self, 
         user_message: str,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        options: Optional[Dict] = None,
+        use_cache: Optional[bool] = None,
+        ticket: Optional[Ticket] = None
     ) -> AsyncGenerator[str, None]:
         """
         Generate streaming response from LLM
         Integrated with Ollama for local AI inference
+        A scheduler ``ticket`` is given back early when no new generation runs.
         """
-        # Build messages
-        messages = []
-        
-        # System prompt
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        else:
-            messages.append({"role": "system", "content": self.system_context})
+        self._queue_wait = ticket.queue_wait if ticket else 0.0
+        # Replay an identical (or equivalent) earlier generation if allowed
+        candidates, messages, options, cached, flight_key, cache_handle = await self._prepare(
+            user_message, STREAM_OPTIONS, options, use_cache, system_prompt
+        )
+        if cached is not None:
+            if ticket:
+                ticket.release()
+            yield cached
+            return
         
-        # Add conversation history (last 10 messages for context)
-        for msg in self.conversation_history[-10:]:
-            messages.append({"role": msg.role, "content": msg.content})
+        # Generate response using the intelligent routing, sharing the
+        # generation with any identical request already in flight. The
+        # generation itself fills the caches, once, for every subscriber.
+        # aclosing: a client that goes away unsubscribes (and cancels the
+        # upstream generation) right away rather than when this is collected
+        async with aclosing(self.coalescer.stream(
+            flight_key,
+            lambda: self._generate_intelligent_response(messages, candidates, options, cache_handle, ticket),
+            on_follow=ticket.release if ticket else None
+        )) as chunks:
+            async for chunk in chunks:
+                yield chunk
+    
+    async def _cache_lookup(
+        self,
+        model: str,
+        messages: List[Dict],
+        options: Dict,
+        use_cache: Optional[bool],
+        key: str
+    ) -> Tuple[Optional[str], Dict]:
+        """
+        Check the exact-match cache under ``key``, then the semantic cache
+        Returns the cached response, or a handle for _cache_store on a miss
+        """
+        handle = {}
+        if self.response_cache.should_cache(options, use_cache):
+            handle['key'] = key
+            cached = self.response_cache.get(handle['key'])
+            if cached is not None:
+                return cached, {}
         
-        # Add current user message
-        messages.append({"role": "user", "content": user_message})
+        standalone = not any(m['role'] == 'assistant' for m in messages)
+        if self.semantic_cache.enabled and use_cache is not False and standalone:
+            prompt = messages[-1]['content']
+            level = self.intelligence_level.value
+            system = messages[0]['content'] if messages[0]['role'] == 'system' else ''
+            scope = context_scope(self.user_identifier, system)
+            cached, vector = await self.semantic_cache.lookup(model, level, scope, prompt)
+            if cached is not None:
+                return cached, {}
+            handle['semantic'] = (level, scope, prompt, vector)
         
-        # Generate response using the intelligent routing
-        async for chunk in self._generate_intelligent_response(messages):
-            yield chunk
+        return None, handle
     
-
+    def _cache_store(self, model: str, handle: Dict, response: str):
+        """
+        Store a fresh response in the caches that missed
+        Only called for a reply from the primary model the lookup was keyed
+        on; a failover model's reply would be served as the primary's.
+        """
+        if 'key' in handle:
+            self.response_cache.set(handle['key'], response)
+        if 'semantic' in handle:
+            level, scope, prompt, vector = handle['semantic']
+            self.semantic_cache.store(model, level, scope, prompt, response, vector)
+    
+    def _build_messages(
+        self,
+        user_message: str,
+        model: str,
+        options: Dict,
+        system_prompt: Optional[str] = None
+    ) -> List[Dict]:
+        """Fit system prompt, history and the new message into the model's context"""
+        window = ContextWindow.for_model(model, options)
+        history = self.conversation_history
+        start = 0
+        if self._window_start_ts is not None:
+            start = next((i for i, msg in enumerate(history) if msg.timestamp >= self._window_start_ts), len(history))
+        context = window.build(system_prompt or self.system_context, history, user_message, start=start)
+        # A caller-supplied system prompt is not a profile's
+        self._sent_profile = None if system_prompt else (self.prompt_profile, self.system_tokens)
+        if context.window_start < len(history):
+            self._window_start_ts = history[context.window_start].timestamp
+        self.last_prompt_tokens = context.prompt_tokens
+        self.last_prefill = {}
+        self.last_timings = {}
+        return context.messages
+    
+    @staticmethod
+    def _request_options(defaults: Dict, overrides: Optional[Dict]) -> Dict:
+        """Merge per-request sampling overrides onto the defaults"""
+        options = dict(defaults)
+        for key, value in (overrides or {}).items():
+            if key in ALLOWED_OPTIONS and value is not None:
+                options[key] = value
+        return options
+    
+    async def _candidate_models(self) -> List[str]:
+        """
+        Models to try for the current intelligence level, best first
+        A catalog miss is awaited, so a down or refreshing Ollama does not
+        stall the event loop.
+        """
+        pinned = self.ollama_model if self.model_pinned else None
+        candidates = await self.router.acandidates(self.intelligence_level.value, pinned, self.ollama_base_url)
+        return candidates or [LEVEL_MODELS.get(self.intelligence_level, self.ollama_model)]
     
     async def _generate_intelligent_response(
         self,
-        messages: List[Dict]
+        messages: List[Dict],
+        candidates: List[str],
+        options: Dict,
+        cache_handle: Optional[Dict] = None,
+        ticket: Optional[Ticket] = None
     ) -> AsyncGenerator[str, None]:
         """
         Generate intelligent response based on intelligence level
         and route to the appropriate LLM provider.
+        Fails over to the next candidate model if one errors or times out
+        before its first token, moving ``ticket`` to that model's queue
+        first. A complete reply from the first candidate is stored under
+        ``cache_handle``.
         """
-        # Route to appropriate provider based on intelligence level
-        if self.intelligence_level == IntelligenceLevel.NANO:
-            async for chunk in self._generate_ollama_response(messages, model="phi"):
-                yield chunk
-        
-        elif self.intelligence_level == IntelligenceLevel.STANDARD:
-            async for chunk in self._generate_ollama_response(messages, model="llama2"):
-                yield chunk
-        
-        elif self.intelligence_level == IntelligenceLevel.SUPER:
-            async for chunk in self._generate_ollama_response(messages, model="llama2"):
-                yield chunk
-        
-        elif self.intelligence_level == IntelligenceLevel.QUANTUM:
-            async for chunk in self._generate_ollama_response(messages, model="llama2"):
-                yield chunk
+        for index, model in enumerate(candidates):
+            if index and ticket:
+                await self._switch_slot(ticket, model)
+            stream = self._generate_ollama_response(messages, model, options)
+            try:
+                first = await asyncio.wait_for(stream.__anext__(), self.first_token_timeout)
+            except StopAsyncIteration:
+                self.last_model = model
+                return
+            except Exception as e:
+                await stream.aclose()
+                self.router.record_failure(model, e)
+                if index == len(candidates) - 1:
+                    raise
+                self.router.record_failover()
+                print(f"Model {model} failed ({e!r}), failing over to {candidates[index + 1]}")
+                continue
+            
+            self.last_model = model
+            response_parts = [first]
+            try:
+                yield first
+                async for chunk in stream:
+                    response_parts.append(chunk)
+                    yield chunk
+            except Exception as e:
+                # Tokens already went out; a mid-stream failure can't be retried
+                self.router.record_failure(model, e)
+                raise
+            finally:
+                await stream.aclose()
+            if index == 0 and cache_handle:
+                self._cache_store(model, cache_handle, ''.join(response_parts))
+            return
+    
+    async def _switch_slot(self, ticket: Ticket, model: str) -> None:
+        """Hold a slot on the failover ``model`` instead of the failed one"""
+        await ticket.switch(model, self.intelligence_level.value)
+        self._queue_wait = ticket.queue_wait
+    
+    @property
+    def _pool_key(self) -> str:
+        """Sticky-routing key: keeps a session on the host holding its KV cache"""
+        return f"{self.user_identifier}:{self.session_id}"
+    
+    def _retry_on_another_host(self, error: BaseException, tried: List[str]) -> bool:
+        """Whether a failed request should be retried on a different pool host"""
+        if not _is_host_error(error) or len(tried) >= len(self.pool.urls):
+            return False
+        print(f"Ollama host {tried[-1]} failed ({error!r}), retrying on another host")
+        return True
+    
+    async def _chat_on_pool(self, payload: Dict) -> Dict:
+        """Non-streaming chat on the least-loaded host, retrying unreachable hosts"""
+        tried = []
+        while True:
+            lease = self.pool.lease(self._pool_key, exclude=tried)
+            try:
+                return await self.ollama.chat(payload, lease.url)
+            except Exception as e:
+                tried.append(lease.url)
+                lease.release(e if _is_host_error(e) else None)
+                if not self._retry_on_another_host(e, tried):
+                    raise
+            finally:
+                lease.release()
+    
+    def _record_generation(self, model: str, ttft: float, total: float, final: Dict) -> None:
+        """
+        Record a finished generation's timings
+        Ollama's final frame reports load, prompt-eval and eval durations in
+        nanoseconds. They feed warm-up tracking, the router and telemetry,
+        and are kept in last_timings for the reply's Message metadata.
+        ``total`` runs from the Ollama request to its final frame.
+        """
+        load = final.get('load_duration', 0) / 1e9
+        eval_count = final.get('eval_count', 0)
+        eval_seconds = final.get('eval_duration', 0) / 1e9
+        tokens_per_sec = eval_count / eval_seconds if eval_seconds else None
+        self.warmup.record(model, ttft, load)
+        # Rank models on steady-state latency, not on a one-off cold load
+        self.router.record_success(model, max(ttft - load, 0.0), tokens_per_sec)
+        self._record_prefill(final)
+        self.last_timings = {
+            'model': model,
+            'level': self.intelligence_level.value,
+            'ttft_ms': round(ttft * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            'tokens_per_sec': round(tokens_per_sec, 1) if tokens_per_sec else None,
+            'eval_count': eval_count,
+            'prompt_eval_count': final.get('prompt_eval_count', 0),
+            'prompt_eval_ms': round(final.get('prompt_eval_duration', 0) / 1e6, 1),
+            'load_ms': round(load * 1000, 1),
+            'queue_wait_ms': round(self._queue_wait * 1000, 1),
+        }
+        if self._sent_profile:
+            profile, system_tokens = self._sent_profile
+            self.last_timings['prompt_profile'] = profile
+            self.last_timings['system_tokens'] = system_tokens
+            self.prompt_profiles.record(profile, system_tokens, final)
+        self.telemetry.record(self.last_timings)
 
-    async def _generate_ollama_response(self, messages: List[Dict], model: str) -> AsyncGenerator[str, None]:
+    def _record_prefill(self, final: Dict) -> None:
+        """
+        Keep Ollama's prompt evaluation stats for the last generation
+        prompt_eval_count only covers tokens that were not served from the
+        KV cache, so comparing it with prompt_tokens shows prefix reuse.
+        """
+        if 'prompt_eval_count' not in final:
+            return
+        prompt_eval_ms = round(final.get('prompt_eval_duration', 0) / 1e6, 1)
+        self.last_prefill = {
+            'prompt_eval_count': final['prompt_eval_count'],
+            'prompt_eval_ms': prompt_eval_ms,
+        }
+        self._prefill_stats['generations'] += 1
+        self._prefill_stats['prompt_tokens'] += self.last_prompt_tokens
+        self._prefill_stats['prompt_eval_count'] += final['prompt_eval_count']
+        self._prefill_stats['prompt_eval_ms'] += prompt_eval_ms
+
+    def _chat_payload(self, model: str, messages: List[Dict], options: Dict) -> Dict:
+        """
+        Ollama chat payload with the runtime options for this host and prompt
+        Runtime options only change how the model runs, so they are merged
+        here rather than into the options used for cache and coalescing keys.
+        """
+        runtime = self.runtime_options.options_for(
+            model,
+            self.intelligence_level.value,
+            self.last_prompt_tokens,
+            options.get('num_predict') or 0
+        )
+        self.last_runtime_options = runtime
+        return {
+            "model": model,
+            "messages": messages,
+            "options": {**runtime, **options},
+            "keep_alive": self.warmup.keep_alive
+        }
+
+    async def _generate_ollama_response(
+        self,
+        messages: List[Dict],
+        model: str,
+        options: Dict
+    ) -> AsyncGenerator[str, None]:
         """Generate streaming response using Ollama API"""
         try:
             # Prepare the request payload for Ollama
-            payload = {
-                "model": model,
-                "messages": messages,
-                "stream": True,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "num_predict": 2000
-                }
-            }
+            payload = self._chat_payload(model, messages, options)
             
-            # Make streaming request to Ollama
-            response = requests.post(
-                f"{self.ollama_base_url}/api/chat",
-                json=payload,
-                stream=True,
-                timeout=60
-            )
-            
-            if response.status_code == 200:
-                for line in response.iter_lines():
-                    if line:
-                        try:
-                            data = json.loads(line.decode('utf-8'))
-                            if 'message' in data and 'content' in data['message']:
-                                content = data['message']['content']
-                                if content:
-                                    yield content
-                        except json.JSONDecodeError:
-                            continue
-            else:
-                raise Exception(f"Ollama API error: {response.status_code}")
+            tried = []
+            while True:
+                lease = self.pool.lease(self._pool_key, exclude=tried)
+                started = time.time()
+                ttft = None
+                received = False
+                try:
+                    async with aclosing(self.ollama.stream_chat(payload, lease.url)) as frames:
+                        async for data in frames:
+                            received = True
+                            content = data.get('message', {}).get('content')
+                            if content:
+                                if ttft is None:
+                                    ttft = time.time() - started
+                                yield content
+                            if data.get('done'):
+                                # Final frame reports load time and eval speed
+                                elapsed = time.time() - started
+                                self._record_generation(model, ttft or elapsed, elapsed, data)
+                except Exception as e:
+                    tried.append(lease.url)
+                    lease.release(e if _is_host_error(e) else None)
+                    if received or not self._retry_on_another_host(e, tried):
+                        raise
+                    continue
+                finally:
+                    lease.release()
+                return
                 
         except Exception as e:
             print(f"Ollama streaming error: {e}")
@@ -395,85 +901,122 @@ class LLMBackend:
         yield "Anthropic Claude integration is not configured. Please set your API key."
 
     
-    async def generate_response(self, user_message: str) -> str:
-        """Generate complete response (non-streaming)"""
-        if self.ollama_available:
-            try:
-                return self._generate_ollama_response_sync(user_message)
-            except Exception as e:
-                print(f"Ollama sync response failed: {e}, falling back to simulation")
+    async def generate_response(
+        self,
+        user_message: str,
+        options: Optional[Dict] = None,
+        use_cache: Optional[bool] = None,
+        ticket: Optional[Ticket] = None
+    ) -> str:
+        """
+        Generate complete response (non-streaming)
+        A failed completion is raised rather than generated a second time
+        outside the scheduler. Only when the catalog cannot reach Ollama is
+        the streaming path tried, under the same ``ticket``.
+        """
+        if await self.catalog.ais_available(self.ollama_base_url):
+            return await self._generate_ollama_completion(user_message, options, use_cache, ticket)
         
-        # Fallback to simulation
-        import asyncio
-        loop = None
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            response_parts = []
-            async_gen = self.generate_response_streaming(user_message)
-            while True:
-                try:
-                    chunk = loop.run_until_complete(async_gen.__anext__())
-                    response_parts.append(chunk)
-                except StopAsyncIteration:
-                    break
-            return ''.join(response_parts)
-        finally:
-            if loop:
-                loop.close()
-    
-    def _generate_ollama_response_sync(self, user_message: str) -> str:
-        """Generate synchronous response using Ollama"""
+        response_parts = []
+        async for chunk in self.generate_response_streaming(
+            user_message, options=options, use_cache=use_cache, ticket=ticket
+        ):
+            response_parts.append(chunk)
+        return ''.join(response_parts)
+    
+    async def _generate_ollama_completion(
+        self,
+        user_message: str,
+        options: Optional[Dict] = None,
+        use_cache: Optional[bool] = None,
+        ticket: Optional[Ticket] = None
+    ) -> str:
+        """Generate a complete (non-streaming) response using Ollama"""
         try:
-            # Build messages
-            messages = [
-                {"role": "system", "content": self.system_context},
-                *[{"role": msg.role, "content": msg.content} for msg in self.conversation_history[-5:]],
-                {"role": "user", "content": user_message}
-            ]
-            
-            payload = {
-                "model": self.ollama_model,
-                "messages": messages,
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "num_predict": 1000
-                }
-            }
-            
-            response = requests.post(
-                f"{self.ollama_base_url}/api/chat",
-                json=payload,
-                timeout=30
+            self._queue_wait = ticket.queue_wait if ticket else 0.0
+            candidates, messages, options, cached, flight_key, cache_handle = await self._prepare(
+                user_message, COMPLETION_OPTIONS, options, use_cache
             )
+            if cached is not None:
+                if ticket:
+                    ticket.release()
+                return cached
             
-            if response.status_code == 200:
-                data = response.json()
-                if 'message' in data and 'content' in data['message']:
-                    return data['message']['content']
+            async def complete():
+                for index, candidate in enumerate(candidates):
+                    if index and ticket:
+                        await self._switch_slot(ticket, candidate)
+                    payload = self._chat_payload(candidate, messages, options)
+                    started = time.time()
+                    try:
+                        data = await self._chat_on_pool(payload)
+                        if 'message' not in data or 'content' not in data['message']:
+                            raise OllamaError("Ollama API error: response has no message")
+                    except Exception as e:
+                        self.router.record_failure(candidate, e)
+                        if index == len(candidates) - 1:
+                            raise
+                        self.router.record_failover()
+                        print(f"Model {candidate} failed ({e!r}), failing over to {candidates[index + 1]}")
+                        continue
+                    # No first token to time here; the eval phase is subtracted instead
+                    elapsed = time.time() - started
+                    self._record_generation(candidate, elapsed - data.get('eval_duration', 0) / 1e9, elapsed, data)
+                    self.last_model = candidate
+                    if index == 0:
+                        self._cache_store(candidate, cache_handle, data['message']['content'])
+                    yield data['message']['content']
+                    return
             
-            raise Exception(f"Ollama API error: {response.status_code}")
+            on_follow = ticket.release if ticket else None
+            return ''.join([chunk async for chunk in self.coalescer.stream(flight_key, complete, on_follow)])
             
         except Exception as e:
             print(f"Ollama sync error: {e}")
             raise e
     
     def add_to_history(self, role: str, content: str, metadata: Optional[Dict] = None):
-        """Add message to conversation history"""
-        import time
+        """
+        Add message to conversation history
+        A reply produced by this backend's last generation carries its
+        timings in metadata and Ollama's eval_count as its token count.
+        """
+        token_count = count_tokens(content)
+        if role == 'assistant' and self.last_timings:
+            metadata = {**(metadata or {}), 'timings': dict(self.last_timings)}
+            token_count = self.last_timings['eval_count'] or token_count
         msg = ChatMessage(
             role=role,
             content=content,
             timestamp=time.time(),
-            metadata=metadata
+            metadata=metadata,
+            token_count=token_count
         )
         self.conversation_history.append(msg)
+        self.persist_history()
     
     def clear_history(self):
         """Clear conversation history"""
         self.conversation_history = []
+        self._persisted_count = 0
+        self._window_start_ts = None
+        self.has_older_history = False
+        if MEMORY_AVAILABLE and self.memory_manager and self.session_id:
+            try:
+                self.writer.discard(self.user_identifier, self.session_id)
+                self.memory_manager.mark_history_cleared(self.session_id)
+            except Exception as e:
+                print(f"Warning: could not mark history cleared for {self.session_id}: {e}")
+    
+    def estimate_memory_bytes(self) -> int:
+        """Rough footprint of the per-session state held by this backend"""
+        size = sys.getsizeof(self) + sys.getsizeof(self.system_context)
+        size += sys.getsizeof(self.conversation_history)
+        for msg in self.conversation_history:
+            size += sys.getsizeof(msg) + sys.getsizeof(msg.content)
+            if msg.metadata:
+                size += sys.getsizeof(msg.metadata)
+        return size
     
     def get_system_stats(self) -> Dict:
         """Get current system statistics"""
@@ -482,15 +1025,35 @@ class LLMBackend:
             'optimization': self.optimization,
             'intelligence_level': self.intelligence_level.value,
             'conversation_length': len(self.conversation_history),
+            'last_prompt_tokens': self.last_prompt_tokens,
+            'system_prompt_segments': dict(self._prompt_stats),
+            'prompt_profile': self.prompt_profile,
+            'system_tokens': self.system_tokens,
+            'last_prefill': dict(self.last_prefill),
+            'prefill': dict(self._prefill_stats),
+            'last_timings': dict(self.last_timings),
+            'runtime_options': dict(self.last_runtime_options),
         }
 
 
 class LLMBackendManager:
-    """Thread-safe registry for LLM backend sessions"""
+    """
+    Thread-safe registry for LLM backend sessions
+    Bounded by an LRU size cap and an idle timeout. History is written to
+    the Message table as it happens, so an evicted session (or one that
+    lands on another worker) is restored from it on return.
+    """
+
+    _instances = weakref.WeakSet()
 
-    def __init__(self):
-        self._backends: Dict[Tuple[str, str], LLMBackend] = {}
+    def __init__(self, max_backends: Optional[int] = None, idle_ttl: Optional[float] = None):
+        self._backends: 'OrderedDict[Tuple[str, str], LLMBackend]' = OrderedDict()
         self._lock = threading.RLock()
+        self.max_backends = max_backends or getattr(settings, 'LLM_MAX_BACKENDS', 256)
+        self.idle_ttl = idle_ttl or getattr(settings, 'LLM_BACKEND_IDLE_TTL', 1800)
+        self._created = 0
+        self._evictions = {'lru': 0, 'idle': 0}
+        LLMBackendManager._instances.add(self)
 
     def get_backend(
         self,
@@ -504,17 +1067,71 @@ class LLMBackendManager:
 
         with self._lock:
             backend = self._backends.get(key)
-            if backend is None:
-                backend = LLMBackend(user_identifier=safe_user, session_id=safe_session)
-                if hasattr(backend, 'initialize_memory'):
-                    try:
-                        backend.initialize_memory(safe_session)
-                    except Exception as exc:  # pragma: no cover - safety net
-                        print(f"Warning: could not initialize memory for {key}: {exc}")
+
+        if backend is None:
+            # Built outside the lock: restoring history can wait on the
+            # history writer's flush, which would hold up every other session
+            backend = LLMBackend(user_identifier=safe_user, session_id=safe_session)
+            if hasattr(backend, 'initialize_memory'):
+                try:
+                    backend.initialize_memory(safe_session)
+                except Exception as exc:  # pragma: no cover - safety net
+                    print(f"Warning: could not initialize memory for {key}: {exc}")
+            created = backend
+        else:
+            created = None
+
+        with self._lock:
+            existing = self._backends.get(key)
+            if existing is not None:
+                # Another request may have created this session meanwhile
+                backend = existing
+                self._backends.move_to_end(key)
+            else:
                 self._backends[key] = backend
+                if backend is created:
+                    self._created += 1
+            backend.last_used = time.time()
+            evicted = self._collect_evictions()
+
+        for old in evicted:
+            self._retire(old)
 
         return backend
 
+    def _collect_evictions(self) -> List[LLMBackend]:
+        """Pop idle and over-capacity backends; caller holds the lock"""
+        evicted = []
+        cutoff = time.time() - self.idle_ttl
+        # The OrderedDict is in access order, so idle backends sit at the front
+        while self._backends:
+            key, backend = next(iter(self._backends.items()))
+            if backend.last_used >= cutoff:
+                break
+            evicted.append(self._backends.pop(key))
+            self._evictions['idle'] += 1
+        while len(self._backends) > self.max_backends:
+            _, backend = self._backends.popitem(last=False)
+            evicted.append(backend)
+            self._evictions['lru'] += 1
+        return evicted
+
+    @staticmethod
+    def _retire(backend: LLMBackend) -> None:
+        """Persist an evicted backend's unsaved history"""
+        try:
+            backend.persist_history()
+        except Exception as exc:  # pragma: no cover - safety net
+            print(f"Warning: could not persist history for {backend.session_id}: {exc}")
+
+    def evict_idle(self) -> int:
+        """Evict idle backends now; returns how many were evicted"""
+        with self._lock:
+            evicted = self._collect_evictions()
+        for old in evicted:
+            self._retire(old)
+        return len(evicted)
+
     def clear_backend(self, user_identifier: str, session_id: Optional[str] = None) -> None:
         """Remove backend from registry and clear its history"""
         safe_user = user_identifier or 'anonymous'
@@ -534,3 +1151,23 @@ class LLMBackendManager:
                 {'user_identifier': user, 'session_id': session}
                 for (user, session) in self._backends.keys()
             ]
+
+    def stats(self) -> Dict:
+        """Registry size, eviction counters and estimated memory footprint"""
+        with self._lock:
+            backends = list(self._backends.values())
+            evictions = dict(self._evictions)
+            created = self._created
+        return {
+            'live_backends': len(backends),
+            'max_backends': self.max_backends,
+            'idle_ttl': self.idle_ttl,
+            'created': created,
+            'evictions': evictions,
+            'estimated_bytes': sum(backend.estimate_memory_bytes() for backend in backends),
+        }
+
+    @classmethod
+    def all_stats(cls) -> List[Dict]:
+        """Stats for every live manager in the process"""
+        return [manager.stats() for manager in list(cls._instances)]
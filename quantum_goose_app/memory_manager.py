@@ -3,17 +3,36 @@ Memory Manager for HAZoom LLM
 Handles storage, retrieval, and management of conversation memory
 """
 import uuid
+import threading
+from collections import Counter
 from typing import List, Dict, Optional, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.utils import timezone
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Q, Count, F
 import json
 
+from .context_window import count_tokens
 from .models import (
     ConversationSession, Message, Memory, 
     KnowledgeBase, UserPreference, MemorySearchIndex
 )
 
+# Per-user counter bumped on every write that changes what build_llm_context returns
+_context_versions: Dict[str, int] = {}
+_context_versions_lock = threading.Lock()
+
+
+def get_context_version(user_identifier: str) -> int:
+    """Current memory/preference version for a user, used to key cached prompts"""
+    return _context_versions.get(user_identifier, 0)
+
+
+def bump_context_version(user_identifier: str) -> None:
+    """Mark a user's memories or preferences as changed"""
+    with _context_versions_lock:
+        _context_versions[user_identifier] = _context_versions.get(user_identifier, 0) + 1
+
 
 class MemoryManager:
     """
@@ -48,6 +67,16 @@ class MemoryManager:
         self.session = session
         return session
     
+    def get_session(self, session_id: str) -> Optional[ConversationSession]:
+        """Existing session, or None without creating one"""
+        session = ConversationSession.objects.filter(
+            session_id=session_id,
+            user_identifier=self.user_identifier
+        ).first()
+        if session is not None:
+            self.session = session
+        return session
+    
     def get_active_sessions(self, limit: int = 10) -> List[ConversationSession]:
         """Get user's active sessions"""
         return ConversationSession.objects.filter(
@@ -71,7 +100,8 @@ class MemoryManager:
         role: str,
         content: str,
         session_id: Optional[str] = None,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        token_count: Optional[int] = None
     ) -> Message:
         """Add a message to conversation history"""
         if session_id:
@@ -85,12 +115,72 @@ class MemoryManager:
             session=session,
             role=role,
             content=content,
+            token_count=count_tokens(content) if token_count is None else token_count,
             metadata=metadata or {}
         )
         
         session.increment_messages()
         return message
     
+    @staticmethod
+    def bulk_add_messages(messages) -> int:
+        """
+        Write many messages in one transaction
+        ``messages`` are objects with user_identifier, session_id, role,
+        content, metadata, token_count and timestamp (epoch seconds it was
+        sent) attributes, in the order they were sent. Missing sessions are
+        created, the messages go in with one bulk INSERT and each session's
+        counter gets one atomic UPDATE.
+        """
+        messages = list(messages)
+        if not messages:
+            return 0
+        owners = {}
+        for item in messages:
+            owners.setdefault(item.session_id, item.user_identifier)
+        
+        with transaction.atomic():
+            sessions = {
+                session.session_id: session
+                for session in ConversationSession.objects.filter(session_id__in=list(owners))
+            }
+            missing = [session_id for session_id in owners if session_id not in sessions]
+            if missing:
+                ConversationSession.objects.bulk_create(
+                    [ConversationSession(session_id=session_id, user_identifier=owners[session_id])
+                     for session_id in missing],
+                    ignore_conflicts=True
+                )
+                sessions.update({
+                    session.session_id: session
+                    for session in ConversationSession.objects.filter(session_id__in=missing)
+                })
+            
+            now = timezone.now()
+            Message.objects.bulk_create([
+                Message(
+                    session=sessions[item.session_id],
+                    role=item.role,
+                    content=item.content,
+                    # The send time, so history cursors match what clients hold
+                    timestamp=(
+                        datetime.fromtimestamp(item.timestamp, tz=dt_timezone.utc)
+                        if item.timestamp is not None else now
+                    ),
+                    token_count=count_tokens(item.content) if item.token_count is None else item.token_count,
+                    metadata=item.metadata or {}
+                )
+                for item in messages
+            ])
+            
+            counts = Counter(item.session_id for item in messages)
+            for session_id, count in counts.items():
+                ConversationSession.objects.filter(pk=sessions[session_id].pk).update(
+                    total_messages=F('total_messages') + count,
+                    last_active=now
+                )
+        return len(messages)
+    
     def get_conversation_history(
         self,
         session_id: str,
@@ -108,6 +198,44 @@ class MemoryManager:
         
         return list(query[:limit])
     
+    def _history_query(self, session_id: str):
+        """Messages of a session after its last clear, filtered on the (session, timestamp) index"""
+        session = self.session if self.session and self.session.session_id == session_id else None
+        if session is None:
+            session = self.get_session(session_id)
+        if session is None:
+            return None
+        query = Message.objects.filter(session=session)
+        cleared_at = (session.metadata or {}).get('history_cleared_at')
+        if cleared_at:
+            query = query.filter(timestamp__gt=cleared_at)
+        return query
+    
+    def get_latest_history(
+        self,
+        session_id: str,
+        limit: int = 20,
+        before: Optional[datetime] = None
+    ) -> List[Message]:
+        """
+        Most recent messages of a session (oldest first), ignoring cleared history
+        Pass the timestamp of the oldest message already loaded as ``before``
+        to page further back.
+        """
+        query = self._history_query(session_id)
+        if query is None:
+            return []
+        if before is not None:
+            query = query.filter(timestamp__lt=before)
+        # Messages written in one batch can share a timestamp; id keeps them in order
+        return list(reversed(query.order_by('-timestamp', '-id')[:limit]))
+    
+    def mark_history_cleared(self, session_id: str):
+        """Hide existing messages from future history restores without deleting them"""
+        session = self.get_or_create_session(session_id)
+        session.metadata = {**(session.metadata or {}), 'history_cleared_at': timezone.now().isoformat()}
+        session.save(update_fields=['metadata'])
+    
     def get_recent_messages(self, limit: int = 10) -> List[Message]:
         """Get recent messages across all sessions"""
         return list(Message.objects.filter(
@@ -160,6 +288,7 @@ class MemoryManager:
                     defaults={'relevance': 1.0}
                 )
         
+        bump_context_version(self.user_identifier)
         return memory
     
     def get_memory(self, key: str) -> Optional[Memory]:
@@ -227,6 +356,7 @@ class MemoryManager:
             user_identifier=self.user_identifier,
             key=key
         ).update(is_active=False)
+        bump_context_version(self.user_identifier)
     
     def update_memory_importance(self, key: str, importance: int):
         """Update memory importance"""
@@ -234,6 +364,7 @@ class MemoryManager:
             user_identifier=self.user_identifier,
             key=key
         ).update(importance=importance, updated_at=timezone.now())
+        bump_context_version(self.user_identifier)
     
     # ========================================================================
     # KNOWLEDGE BASE
@@ -304,6 +435,7 @@ class MemoryManager:
             if hasattr(prefs, key):
                 setattr(prefs, key, value)
         prefs.save()
+        bump_context_version(self.user_identifier)
         return prefs
     
     # ========================================================================
@@ -0,0 +1,377 @@
+"""
+Prometheus metrics
+Counters, histograms and gauges kept per process and exported in the
+Prometheus text format. Under gunicorn every worker writes its values to a
+file in LLM_METRICS_DIR and /metrics sums the files of all workers
+"""
+import atexit
+import bisect
+import fcntl
+import json
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+# Request latency buckets in seconds; streaming responses are timed to their headers
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+ARCHIVE_FILE = 'archive.json'
+LOCK_FILE = 'metrics.lock'
+
+
+class _Metric:
+    """Values of one metric family, keyed by label values"""
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def family(self) -> Dict:
+        """Serialisable metadata and samples"""
+        with self._lock:
+            samples = [[list(key), value] for key, value in self._values.items()]
+        return {'type': self.kind, 'help': self.documentation, 'labels': list(self.labelnames), 'samples': samples}
+
+
+class Counter(_Metric):
+    """Monotonic count"""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    """Bucketed observations; a sample is [bucket counts..., sum, count]"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._values.get(key)
+            if sample is None:
+                sample = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                sample[index] += 1
+            sample[-2] += value
+            sample[-1] += 1
+
+    def family(self) -> Dict:
+        with self._lock:
+            samples = [[list(key), list(value)] for key, value in self._values.items()]
+        return {
+            'type': self.kind, 'help': self.documentation, 'labels': list(self.labelnames),
+            'buckets': list(self.buckets), 'samples': samples,
+        }
+
+
+class Gauge:
+    """Value read from a callback whenever metrics are collected"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def reset(self) -> None:
+        pass
+
+    def family(self) -> Dict:
+        try:
+            value = float(self.read())
+        except Exception as e:
+            print(f"Metrics gauge {self.name} failed: {e}")
+            value = math.nan
+        return {'type': self.kind, 'help': self.documentation, 'labels': [], 'samples': [[[], value]]}
+
+
+class MetricsRegistry:
+    """
+    Process-local metrics, optionally shared between worker processes
+
+    With a ``directory`` every process writes its families to
+    ``worker-<pid>.json`` every ``flush_interval`` seconds and at exit.
+    Collecting merges those files: counters and histograms are summed over
+    all workers, including ones that exited (their files are folded into
+    an archive so totals never go backwards), and gauges over live workers
+    only. Without a directory only this process is reported.
+    """
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._flusher_pid: Optional[int] = None
+        self._wakeup = threading.Event()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.flush)
+        # A registry inherited through fork (gunicorn --preload) starts empty in the child
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    # ========================================================================
+    # REGISTRATION
+    # ========================================================================
+
+    def _register(self, name: str, create):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = create()
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(name, lambda: Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(name, lambda: Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], float]) -> Gauge:
+        return self._register(name, lambda: Gauge(name, documentation, read))
+
+    # ========================================================================
+    # WORKER FILES
+    # ========================================================================
+
+    def snapshot(self) -> Dict:
+        """This process's families"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {'pid': os.getpid(), 'written': time.time(), 'metrics': {m.name: m.family() for m in metrics}}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _write(self, name: str, data: Dict) -> None:
+        """Atomic replace, so readers never see a partial file"""
+        tmp = self._path(f'.{name}.{os.getpid()}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self._path(name))
+
+    def _read(self, name: str) -> Optional[Dict]:
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def flush(self) -> None:
+        """Write this process's families to its worker file"""
+        if not self.directory:
+            return
+        try:
+            self._write(f'worker-{os.getpid()}.json', self.snapshot())
+        except OSError as e:
+            print(f"Metrics flush failed: {e}")
+
+    def start(self) -> None:
+        """Start this process's flusher thread if it is not already running (cheap to repeat)"""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._run, name='metrics-flusher', daemon=True).start()
+
+    def _run(self) -> None:
+        while not self._wakeup.wait(self.flush_interval):
+            self.flush()
+
+    def _after_fork(self) -> None:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            self._flusher_pid = None
+            self._wakeup = threading.Event()
+        for metric in metrics:
+            metric.reset()
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _worker_snapshots(self, own: Dict) -> List[Dict]:
+        """Live workers' snapshots plus the archive; folds in exited workers' files"""
+        snapshots = [own]
+        with open(self._path(LOCK_FILE), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive = self._read(ARCHIVE_FILE) or {'metrics': {}}
+            archived = False
+            for name in os.listdir(self.directory):
+                if not (name.startswith('worker-') and name.endswith('.json')):
+                    continue
+                try:
+                    pid = int(name[len('worker-'):-len('.json')])
+                except ValueError:
+                    continue
+                if pid == own['pid']:
+                    continue
+                data = self._read(name)
+                if data is None:
+                    continue
+                if self._alive(pid):
+                    snapshots.append(data)
+                    continue
+                # Exited worker: keep its counts, drop its gauges
+                archive = merge([archive, data], include_gauges=False)
+                archived = True
+                os.unlink(self._path(name))
+            if archived:
+                self._write(ARCHIVE_FILE, archive)
+        snapshots.append(archive)
+        return snapshots
+
+    # ========================================================================
+    # EXPOSITION
+    # ========================================================================
+
+    def collect(self) -> Dict:
+        """Families merged over every worker"""
+        self.start()
+        own = self.snapshot()
+        if not self.directory:
+            return own['metrics']
+        try:
+            return merge(self._worker_snapshots(own))['metrics']
+        except OSError as e:
+            print(f"Metrics collection from {self.directory} failed: {e}")
+            return own['metrics']
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for name, family in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {_escape_help(family['help'])}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            labelnames = family['labels']
+            for values, value in sorted(family['samples'], key=lambda s: s[0]):
+                labels = list(zip(labelnames, values))
+                if family['type'] != 'histogram':
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(family['buckets'], value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + [('le', _number(bound))])} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + [('le', '+Inf')])} {value[-1]}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value[-2])}")
+                lines.append(f"{name}_count{_labels(labels)} {value[-1]}")
+        return '\n'.join(lines) + '\n'
+
+
+def merge(snapshots: List[Dict], include_gauges: bool = True) -> Dict:
+    """Sum snapshots sample by sample (histograms element-wise)"""
+    merged: Dict[str, Dict] = {}
+    for snapshot in snapshots:
+        for name, family in snapshot.get('metrics', {}).items():
+            if family['type'] == 'gauge' and not include_gauges:
+                continue
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {**family, 'samples': {}}
+            for values, value in family['samples']:
+                key = tuple(values)
+                current = target['samples'].get(key)
+                if current is None:
+                    target['samples'][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target['samples'][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target['samples'][key] = current + value
+    for family in merged.values():
+        family['samples'] = [[list(key), value] for key, value in family['samples'].items()]
+    return {'metrics': merged}
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def _live_backends() -> int:
+    from .llm_backend import LLMBackendManager
+    return sum(stats['live_backends'] for stats in LLMBackendManager.all_stats())
+
+
+def _open_streams() -> int:
+    from .sse import get_stream_stats
+    return get_stream_stats().stats()['open']
+
+
+def _camera_subscribers() -> int:
+    from .camera_service import subscriber_count
+    return subscriber_count()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide metrics registry"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = MetricsRegistry(
+                    directory=getattr(settings, 'LLM_METRICS_DIR', None),
+                    flush_interval=getattr(settings, 'LLM_METRICS_FLUSH_INTERVAL', 5.0),
+                )
+                registry.gauge('llm_live_backends', 'LLM backend sessions held in memory', _live_backends)
+                registry.gauge('llm_sse_open_streams', 'Chat SSE streams currently open', _open_streams)
+                registry.gauge('camera_stream_subscribers', 'Clients watching the camera MJPEG stream',
+                               _camera_subscribers)
+                _registry = registry
+    return _registry
@@ -1,6 +1,12 @@
 """
-Security middleware for Django application
+Security and metrics middleware for Django application
 """
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .metrics import get_metrics
+
 
 class SecurityHeadersMiddleware:
     """
@@ -21,4 +27,51 @@ class SecurityHeadersMiddleware:
         response['Content-Security-Policy'] = "default-src 'self'; script-src 'self' 'unsafe-inline'; style-src 'self' 'unsafe-inline'"
         response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
 
-        return response
\ No newline at end of file
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Middleware recording request latency per URL name, method and status
+    Runs natively under both WSGI and ASGI. Streaming responses are timed
+    to their headers; place it first in MIDDLEWARE to time the whole stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.metrics = get_metrics()
+        self.latency = self.metrics.histogram(
+            'django_http_request_duration_seconds',
+            'Django request latency by URL name, method and status code',
+            ('view', 'method', 'status')
+        )
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, started)
+        return response
+
+    def _record(self, request, response, started: float) -> None:
+        # Started here rather than at import so each forked worker gets its own flusher
+        self.metrics.start()
+        match = getattr(request, 'resolver_match', None)
+        self.latency.observe(
+            time.perf_counter() - started,
+            view=match.view_name if match else '<unresolved>',
+            method=request.method,
+            status=response.status_code
+        )
@@ -0,0 +1,243 @@
+"""
+Cached Ollama model catalog
+Serves /api/tags and /api/show from memory with stale-while-revalidate refreshes
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .ollama_client import OllamaClient, get_ollama_client
+
+
+@dataclass
+class _CatalogEntry:
+    """Cached upstream answer (or failure)"""
+    value: Any
+    error: Optional[BaseException]
+    fetched_at: float
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class ModelCatalog:
+    """
+    TTL cache in front of Ollama's model listing endpoints
+
+    - Fresh entries (younger than ``ttl``) are answered from memory.
+    - Stale entries (younger than ``stale_ttl``) are answered from memory
+      while a single background fetch refreshes them.
+    - Failures are cached for ``error_ttl`` so an offline Ollama is not
+      probed on every request.
+    - Concurrent misses for the same key share one upstream call.
+
+    Coroutines use the ``a``-prefixed accessors, which await a miss instead
+    of blocking the event loop on it.
+    """
+
+    def __init__(
+        self,
+        client: OllamaClient,
+        ttl: float = 30.0,
+        stale_ttl: float = 300.0,
+        error_ttl: float = 5.0
+    ):
+        self.client = client
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.error_ttl = error_ttl
+        self._entries: Dict[Tuple, _CatalogEntry] = {}
+        self._inflight: Dict[Tuple, concurrent.futures.Future] = {}
+        self._lock = threading.RLock()
+        self._version = 0
+        self._stats = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'upstream_calls': 0,
+            'errors': 0,
+        }
+        # Fetches in flight at a fork run on the parent's engine loop and
+        # would never complete in the child
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def version(self) -> int:
+        """Bumped whenever a tag listing changes or is invalidated"""
+        return self._version
+
+    # ========================================================================
+    # PUBLIC API
+    # ========================================================================
+
+    def tags(self, base_url: Optional[str] = None) -> Dict:
+        """Return the /api/tags payload, raising OllamaError if unreachable"""
+        base_url = base_url or self.client.base_url
+        return self._get(
+            ('tags', base_url),
+            lambda: self.client.tags(base_url),
+            timeout=15
+        )
+
+    def list_models(self, base_url: Optional[str] = None) -> List[Dict]:
+        """Return installed models, or an empty list if Ollama is unreachable"""
+        try:
+            return self.tags(base_url).get('models', [])
+        except Exception:
+            return []
+
+    def is_available(self, base_url: Optional[str] = None) -> bool:
+        """Whether the last known /api/tags call succeeded"""
+        try:
+            self.tags(base_url)
+            return True
+        except Exception:
+            return False
+
+    async def atags(self, base_url: Optional[str] = None) -> Dict:
+        """tags() for coroutines"""
+        base_url = base_url or self.client.base_url
+        return await self._aget(
+            ('tags', base_url),
+            lambda: self.client.tags(base_url),
+            timeout=15
+        )
+
+    async def alist_models(self, base_url: Optional[str] = None) -> List[Dict]:
+        """list_models() for coroutines"""
+        try:
+            return (await self.atags(base_url)).get('models', [])
+        except Exception:
+            return []
+
+    async def ais_available(self, base_url: Optional[str] = None) -> bool:
+        """is_available() for coroutines"""
+        try:
+            await self.atags(base_url)
+            return True
+        except Exception:
+            return False
+
+    def show(self, name: str, base_url: Optional[str] = None) -> Dict:
+        """Return the /api/show payload for a model"""
+        base_url = base_url or self.client.base_url
+        return self._get(
+            ('show', base_url, name),
+            lambda: self.client.show(name, base_url),
+            timeout=15
+        )
+
+    def invalidate(self, base_url: Optional[str] = None, name: Optional[str] = None) -> None:
+        """Drop cached tags for a host, plus show results for ``name`` (or all)"""
+        base_url = base_url or self.client.base_url
+        with self._lock:
+            self._entries.pop(('tags', base_url), None)
+            for key in list(self._entries):
+                if key[0] == 'show' and key[1] == base_url and (name is None or key[2] == name):
+                    del self._entries[key]
+            self._version += 1
+
+    def stats(self) -> Dict:
+        """Cache counters"""
+        with self._lock:
+            return {
+                **self._stats,
+                'entries': len(self._entries),
+                'inflight': len(self._inflight),
+                'version': self._version,
+            }
+
+    # ========================================================================
+    # INTERNALS
+    # ========================================================================
+
+    def _after_fork(self) -> None:
+        self._lock = threading.RLock()
+        self._inflight = {}
+
+    def _get(self, key: Tuple, fetch: Callable[[], Coroutine], timeout: float) -> Any:
+        cached, value = self._lookup(key, fetch)
+        if cached:
+            return value
+        return value.result(timeout)
+
+    async def _aget(self, key: Tuple, fetch: Callable[[], Coroutine], timeout: float) -> Any:
+        cached, value = self._lookup(key, fetch)
+        if cached:
+            return value
+        # shield: a timed-out waiter must not cancel the fetch other callers share
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(value)), timeout)
+
+    def _lookup(self, key: Tuple, fetch: Callable[[], Coroutine]) -> Tuple[bool, Any]:
+        """(True, cached value), or (False, future of the upstream fetch); raises a cached error"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.fetched_at
+                if entry.ok and age < self.ttl:
+                    self._stats['hits'] += 1
+                    return True, entry.value
+                if entry.ok and age < self.stale_ttl:
+                    self._stats['stale_hits'] += 1
+                    self._start_fetch(key, fetch)
+                    return True, entry.value
+                if not entry.ok and age < self.error_ttl:
+                    self._stats['hits'] += 1
+                    raise entry.error
+            self._stats['misses'] += 1
+            return False, self._start_fetch(key, fetch)
+
+    def _start_fetch(self, key: Tuple, fetch: Callable[[], Coroutine]) -> concurrent.futures.Future:
+        """Start (or join) the upstream call for ``key``; caller holds the lock"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self._stats['coalesced'] += 1
+            return future
+
+        self._stats['upstream_calls'] += 1
+        future = self.client.submit(fetch())
+        self._inflight[key] = future
+        future.add_done_callback(lambda f: self._complete(key, f))
+        return future
+
+    def _complete(self, key: Tuple, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                self._stats['errors'] += 1
+                self._entries[key] = _CatalogEntry(None, error, time.time())
+            else:
+                previous = self._entries.get(key)
+                self._entries[key] = _CatalogEntry(future.result(), None, time.time())
+                if key[0] == 'tags' and (previous is None or previous.value != future.result()):
+                    self._version += 1
+
+
+_catalog: Optional[ModelCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_model_catalog() -> ModelCatalog:
+    """Return the process-wide model catalog"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ModelCatalog(
+                    get_ollama_client(),
+                    ttl=getattr(settings, 'LLM_MODEL_CATALOG_TTL', 30.0),
+                    stale_ttl=getattr(settings, 'LLM_MODEL_CATALOG_STALE_TTL', 300.0),
+                )
+    return _catalog
@@ -0,0 +1,280 @@
+"""
+Adaptive model routing
+Maps each intelligence level to installed models ranked by measured speed,
+quality tier and health
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .model_catalog import ModelCatalog, get_model_catalog
+
+# Quality tier per model family: 1 small/fast, 2 general purpose, 3 large
+DEFAULT_MODEL_TIERS = {
+    'tinyllama': 1,
+    'phi': 1,
+    'gemma': 1,
+    'llama2': 2,
+    'llama3': 2,
+    'mistral': 2,
+    'mixtral': 3,
+}
+
+# Lowest quality tier each intelligence level accepts
+DEFAULT_LEVEL_MIN_TIER = {
+    'nano': 1,
+    'standard': 2,
+    'super': 2,
+    'quantum': 3,
+}
+
+# Model families (details.family in /api/tags) that only produce embeddings
+EMBEDDING_FAMILIES = {'bert', 'nomic-bert'}
+
+# Response length used to turn tokens/sec into an expected generation time
+REFERENCE_TOKENS = 256
+
+
+class _ModelStats:
+    """Rolling latency and health of one model"""
+
+    def __init__(self):
+        self.ttft: Optional[float] = None
+        self.tokens_per_sec: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.last_error = ''
+
+    def healthy(self, now: float) -> bool:
+        # Once the cool-down passes the model gets one more chance (half-open)
+        return now >= self.open_until
+
+    def score(self) -> Optional[float]:
+        """Expected seconds for a reference response, None until measured"""
+        if self.ttft is None:
+            return None
+        generation = REFERENCE_TOKENS / self.tokens_per_sec if self.tokens_per_sec else 0.0
+        return self.ttft + generation
+
+
+class ModelRouter:
+    """
+    Ranks installed models for an intelligence level
+
+    Candidates are the installed chat models whose quality tier meets the
+    level's minimum (or, if none does, the highest tier installed);
+    embedding models and the names in ``exclude`` are never routed to.
+    Healthy models come before ones whose circuit breaker is open; among
+    those, measured models are tried fastest first by EWMA time to first
+    token plus expected generation time, and models not measured yet after
+    them, so a newly pulled model does not take live traffic ahead of
+    known-good ones. A model is taken out of rotation
+    for ``cooldown`` seconds after ``failure_threshold`` consecutive errors.
+    """
+
+    def __init__(
+        self,
+        catalog: ModelCatalog,
+        preferred: Optional[Dict[str, str]] = None,
+        tiers: Optional[Dict[str, int]] = None,
+        level_min_tier: Optional[Dict[str, int]] = None,
+        alpha: float = 0.3,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        exclude: Optional[List[str]] = None
+    ):
+        self.catalog = catalog
+        self.exclude = set(exclude or ())
+        self.preferred = preferred or {}
+        self.tiers = tiers or DEFAULT_MODEL_TIERS
+        self.level_min_tier = level_min_tier or DEFAULT_LEVEL_MIN_TIER
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._models: Dict[str, _ModelStats] = {}
+        self._lock = threading.Lock()
+        self._stats = {'routes': 0, 'failovers': 0}
+
+    def tier_for(self, model: Dict) -> int:
+        """Quality tier of an installed model, from its name or else its size"""
+        name = model.get('name', '')
+        if name in self.tiers:
+            return self.tiers[name]
+        base_name = name.split(':', 1)[0]
+        if base_name in self.tiers:
+            return self.tiers[base_name]
+        size = model.get('size', 0)
+        if size < 2.5e9:
+            return 1
+        return 2 if size < 1e10 else 3
+
+    def is_chat_model(self, model: Dict) -> bool:
+        """False for embedding models and excluded names, which cannot serve /api/chat"""
+        name = model.get('name', '')
+        if name in self.exclude or name.split(':', 1)[0] in self.exclude:
+            return False
+        details = model.get('details') or {}
+        families = {details.get('family')} | set(details.get('families') or ())
+        return not families & EMBEDDING_FAMILIES
+
+    def _is_preferred(self, level: str, name: str) -> bool:
+        preferred = self.preferred.get(level)
+        return bool(preferred) and (name == preferred or name.split(':', 1)[0] == preferred)
+
+    def candidates(self, level: str, pinned: Optional[str] = None, base_url: Optional[str] = None) -> List[str]:
+        """Ordered model names to try for ``level``; a pinned model goes first"""
+        return self._order(level, self.catalog.list_models(base_url), pinned)
+
+    async def acandidates(self, level: str, pinned: Optional[str] = None, base_url: Optional[str] = None) -> List[str]:
+        """candidates() for coroutines; a catalog miss is awaited, not blocked on"""
+        return self._order(level, await self.catalog.alist_models(base_url), pinned)
+
+    def _order(self, level: str, installed: List[Dict], pinned: Optional[str]) -> List[str]:
+        installed = [model for model in installed if self.is_chat_model(model)]
+        if not installed:
+            fallback = pinned or self.preferred.get(level)
+            return [fallback] if fallback else []
+
+        min_tier = self.level_min_tier.get(level, 1)
+        tiered = [(model['name'], self.tier_for(model), model.get('size', 0)) for model in installed]
+        eligible = [item for item in tiered if item[1] >= min_tier]
+        if not eligible:
+            top = max(tier for _, tier, _ in tiered)
+            eligible = [item for item in tiered if item[1] == top]
+
+        now = time.time()
+        with self._lock:
+            self._stats['routes'] += 1
+
+            def rank(item):
+                name, tier, size = item
+                stats = self._models.get(name)
+                healthy = stats.healthy(now) if stats else True
+                score = stats.score() if stats else None
+                return (
+                    not healthy,
+                    score is None,
+                    score or 0.0,
+                    not self._is_preferred(level, name),
+                    tier,
+                    size,
+                )
+
+            ordered = [name for name, _, _ in sorted(eligible, key=rank)]
+
+        if pinned:
+            ordered = [pinned] + [name for name in ordered if name != pinned]
+        return ordered
+
+    def route(self, level: str, pinned: Optional[str] = None, base_url: Optional[str] = None) -> Optional[str]:
+        """Best model for ``level``"""
+        candidates = self.candidates(level, pinned, base_url)
+        return candidates[0] if candidates else None
+
+    # ========================================================================
+    # FEEDBACK
+    # ========================================================================
+
+    def _model(self, name: str) -> _ModelStats:
+        stats = self._models.get(name)
+        if stats is None:
+            stats = self._models[name] = _ModelStats()
+        return stats
+
+    def _ewma(self, current: Optional[float], sample: float) -> float:
+        return sample if current is None else current + self.alpha * (sample - current)
+
+    def record_success(self, model: str, ttft: float, tokens_per_sec: Optional[float] = None) -> None:
+        """Fold a completed generation into the model's rolling stats"""
+        with self._lock:
+            stats = self._model(model)
+            stats.successes += 1
+            stats.consecutive_failures = 0
+            stats.open_until = 0.0
+            stats.ttft = self._ewma(stats.ttft, ttft)
+            if tokens_per_sec:
+                stats.tokens_per_sec = self._ewma(stats.tokens_per_sec, tokens_per_sec)
+
+    def record_failure(self, model: str, error: BaseException) -> None:
+        """Count an error or timeout; opens the breaker after repeated failures"""
+        with self._lock:
+            stats = self._model(model)
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            stats.last_error = str(error)
+            if stats.consecutive_failures >= self.failure_threshold:
+                stats.open_until = time.time() + self.cooldown
+
+    def record_failover(self) -> None:
+        with self._lock:
+            self._stats['failovers'] += 1
+
+    # ========================================================================
+    # INTROSPECTION
+    # ========================================================================
+
+    def stats(self) -> Dict:
+        """Per-model rolling stats and health"""
+        now = time.time()
+        with self._lock:
+            return {
+                **self._stats,
+                'models': {
+                    name: {
+                        'healthy': stats.healthy(now),
+                        'ttft_ms': round(stats.ttft * 1000, 1) if stats.ttft is not None else None,
+                        'tokens_per_sec': round(stats.tokens_per_sec, 1) if stats.tokens_per_sec else None,
+                        'score_s': round(stats.score(), 3) if stats.score() is not None else None,
+                        'successes': stats.successes,
+                        'failures': stats.failures,
+                        'consecutive_failures': stats.consecutive_failures,
+                        'retry_in_s': round(max(stats.open_until - now, 0.0), 1),
+                        'last_error': stats.last_error,
+                    }
+                    for name, stats in self._models.items()
+                },
+            }
+
+    def routing_table(self, base_url: Optional[str] = None) -> Dict[str, Dict]:
+        """Current candidate order per intelligence level"""
+        installed = {model['name']: model for model in self.catalog.list_models(base_url)}
+        return {
+            level: {
+                'min_tier': min_tier,
+                'candidates': [
+                    {'model': name, 'tier': self.tier_for(installed[name]) if name in installed else None}
+                    for name in self.candidates(level, base_url=base_url)
+                ],
+            }
+            for level, min_tier in self.level_min_tier.items()
+        }
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """Return the process-wide model router"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                from .llm_backend import LEVEL_MODELS
+                _router = ModelRouter(
+                    get_model_catalog(),
+                    preferred={level.value: model for level, model in LEVEL_MODELS.items()},
+                    tiers=getattr(settings, 'LLM_MODEL_TIERS', DEFAULT_MODEL_TIERS),
+                    level_min_tier=getattr(settings, 'LLM_LEVEL_MIN_TIER', DEFAULT_LEVEL_MIN_TIER),
+                    failure_threshold=getattr(settings, 'LLM_ROUTER_FAILURE_THRESHOLD', 3),
+                    cooldown=getattr(settings, 'LLM_ROUTER_COOLDOWN', 30.0),
+                    exclude=[
+                        getattr(settings, 'LLM_SEMANTIC_CACHE_EMBEDDING_MODEL', 'nomic-embed-text'),
+                        *getattr(settings, 'LLM_ROUTER_EXCLUDE_MODELS', ()),
+                    ],
+                )
+    return _router
@@ -0,0 +1,255 @@
+"""
+Model warm-up and keep-alive
+Preloads the models behind each intelligence level so the first chat after
+idle does not pay for a cold model load
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from django.conf import settings
+
+from .model_catalog import ModelCatalog, get_model_catalog
+from .model_router import ModelRouter, get_model_router
+from .ollama_client import OllamaClient, get_ollama_client
+from .ollama_pool import OllamaHostPool, get_ollama_pool
+from .runtime_options import RuntimeOptionsPlanner, get_runtime_options
+
+# A generation whose load_duration exceeds this (seconds) found its model unloaded
+COLD_LOAD_THRESHOLD = 0.5
+
+
+class _TTFTStats:
+    """Count and mean of time-to-first-token samples"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.load_total = 0.0
+
+    def add(self, ttft: float, load: float) -> None:
+        self.count += 1
+        self.total += ttft
+        self.load_total += load
+
+    def as_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'avg_ttft_ms': round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            'avg_load_ms': round(self.load_total / self.count * 1000, 1) if self.count else 0.0,
+        }
+
+
+class ModelWarmup:
+    """
+    Keeps the intelligence-level models resident in Ollama
+
+    Every model in ``models`` that is installed is loaded on every healthy
+    pool host once when the warm-up thread starts, then re-loaded every
+    ``interval`` seconds while inside business hours. Without ``models``
+    the ``router``'s first choice for each level is warmed, picked again
+    on every run. Outside business hours the models are left to expire
+    after ``keep_alive``. Generations report their time to first token so
+    cold and warm starts can be compared. With a ``runtime``
+    planner the load uses the runner options chats will send, so the first
+    chat does not reload the model.
+    """
+
+    def __init__(
+        self,
+        client: OllamaClient,
+        catalog: ModelCatalog,
+        models: Optional[Sequence[str]] = None,
+        keep_alive: Any = '30m',
+        interval: float = 600.0,
+        business_hours: Sequence[int] = (8, 20),
+        business_days: Sequence[int] = (0, 1, 2, 3, 4),
+        enabled: bool = True,
+        pool: Optional[OllamaHostPool] = None,
+        runtime: Optional[RuntimeOptionsPlanner] = None,
+        router: Optional[ModelRouter] = None
+    ):
+        self.client = client
+        self.catalog = catalog
+        self.pool = pool
+        self.runtime = runtime
+        self.router = router
+        self.models = list(dict.fromkeys(models or ()))
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self.business_hours = tuple(business_hours)
+        self.business_days = tuple(business_days)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._warmed: Dict[str, Dict] = {}
+        self._ttft: Dict[str, Dict[str, _TTFTStats]] = {}
+        self._stats = {'runs': 0, 'loads': 0, 'errors': 0, 'skipped': 0}
+        # A forked worker has no warm-up thread; the first start() there begins one
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def in_business_hours(self, now: Optional[datetime] = None) -> bool:
+        """Whether scheduled re-warming should run at ``now``"""
+        now = now or datetime.now()
+        start, end = self.business_hours
+        return now.weekday() in self.business_days and start <= now.hour < end
+
+    # ========================================================================
+    # WARMING
+    # ========================================================================
+
+    def targets(self) -> List[str]:
+        """Models to keep resident: the configured ones, else what each level routes to"""
+        if self.models or self.router is None:
+            return list(self.models)
+        routed = (self.router.route(level) for level in self.router.level_min_tier)
+        return list(dict.fromkeys(model for model in routed if model))
+
+    def _installed(self, targets: List[str]) -> List[str]:
+        """Target models Ollama actually has, matched on their base name"""
+        names = set()
+        for item in self.catalog.list_models():
+            name = item.get('name', '')
+            names.add(name)
+            names.add(name.split(':', 1)[0])
+        return [model for model in targets if model in names]
+
+    async def warm(self, model: str, base_url: Optional[str] = None) -> Dict:
+        """Load one model on one host and record how long it took"""
+        label = f"{model}@{base_url}" if base_url else model
+        started = time.time()
+        try:
+            options = self.runtime.options_for(model) if self.runtime else None
+            data = await self.client.load(model, self.keep_alive, base_url, options)
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+                self._warmed[label] = {'ok': False, 'error': str(e), 'at': started}
+            print(f"Model warm-up failed for {label}: {e}")
+            return self._warmed[label]
+
+        result = {
+            'ok': True,
+            'at': started,
+            'duration_ms': round((time.time() - started) * 1000, 1),
+            'load_ms': round(data.get('load_duration', 0) / 1e6, 1),
+        }
+        with self._lock:
+            self._stats['loads'] += 1
+            self._warmed[label] = result
+        return result
+
+    def warm_all(self) -> Dict[str, Dict]:
+        """Load every installed level model; blocks until they are resident"""
+        with self._lock:
+            self._stats['runs'] += 1
+        results = {}
+        targets = self.targets()
+        installed = self._installed(targets)
+        with self._lock:
+            self._stats['skipped'] += len(targets) - len(installed)
+        hosts = self.pool.healthy_urls() if self.pool else [None]
+        futures = {
+            (model, host): self.client.submit(self.warm(model, host))
+            for model in installed
+            for host in hosts
+        }
+        for (model, host), future in futures.items():
+            results[f"{model}@{host}" if host else model] = future.result()
+        return results
+
+    def start(self) -> None:
+        """Warm now and keep re-warming in a daemon thread (cheap to repeat)"""
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wakeup.clear()
+            self._thread = threading.Thread(target=self._run, name='model-warmup', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop scheduled re-warming"""
+        with self._lock:
+            self._pid = None
+        self._wakeup.set()
+
+    def _after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _run(self) -> None:
+        """Warm-up loop: always once at start, then only in business hours"""
+        first = True
+        while True:
+            if first or self.in_business_hours():
+                try:
+                    self.warm_all()
+                except Exception as e:  # pragma: no cover - keep the schedule alive
+                    print(f"Model warm-up run failed: {e}")
+            first = False
+            if self._wakeup.wait(self.interval):
+                return
+
+    # ========================================================================
+    # TTFT TRACKING
+    # ========================================================================
+
+    def record(self, model: str, ttft: float, load_duration: float) -> None:
+        """Record a generation's time to first token and Ollama load time (seconds)"""
+        kind = 'cold' if load_duration > COLD_LOAD_THRESHOLD else 'warm'
+        with self._lock:
+            per_model = self._ttft.setdefault(model, {'cold': _TTFTStats(), 'warm': _TTFTStats()})
+            per_model[kind].add(ttft, load_duration)
+
+    def stats(self) -> Dict:
+        """Warm-up runs, last load per model and cold vs warm TTFT"""
+        targets = self.targets()
+        with self._lock:
+            return {
+                **self._stats,
+                'enabled': self.enabled,
+                'models': targets,
+                'keep_alive': self.keep_alive,
+                'interval': self.interval,
+                'in_business_hours': self.in_business_hours(),
+                'last_warmed': {model: dict(result) for model, result in self._warmed.items()},
+                'ttft': {
+                    model: {kind: samples.as_dict() for kind, samples in per_model.items()}
+                    for model, per_model in self._ttft.items()
+                },
+            }
+
+
+_warmup: Optional[ModelWarmup] = None
+_warmup_lock = threading.Lock()
+
+
+def get_model_warmup() -> ModelWarmup:
+    """Return the process-wide model warm-up manager"""
+    global _warmup
+    if _warmup is None:
+        with _warmup_lock:
+            if _warmup is None:
+                _warmup = ModelWarmup(
+                    get_ollama_client(),
+                    get_model_catalog(),
+                    models=getattr(settings, 'LLM_WARMUP_MODELS', None),
+                    keep_alive=getattr(settings, 'LLM_OLLAMA_KEEP_ALIVE', '30m'),
+                    interval=getattr(settings, 'LLM_WARMUP_INTERVAL', 600.0),
+                    business_hours=getattr(settings, 'LLM_WARMUP_BUSINESS_HOURS', (8, 20)),
+                    business_days=getattr(settings, 'LLM_WARMUP_BUSINESS_DAYS', (0, 1, 2, 3, 4)),
+                    enabled=getattr(settings, 'LLM_WARMUP_ENABLED', True),
+                    pool=get_ollama_pool(),
+                    runtime=get_runtime_options(),
+                    router=get_model_router(),
+                )
+    return _warmup
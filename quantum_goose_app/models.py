@@ -37,11 +37,14 @@ class ConversationSession(models.Model):
     def __str__(self):
         return f"Session {self.session_id} - {self.user_identifier}"
     
-    def increment_messages(self):
-        """Increment message count"""
-        self.total_messages += 1
+    def increment_messages(self, count: int = 1):
+        """Increment message count atomically in the database"""
         self.last_active = timezone.now()
-        self.save(update_fields=['total_messages', 'last_active'])
+        ConversationSession.objects.filter(pk=self.pk).update(
+            total_messages=models.F('total_messages') + count,
+            last_active=self.last_active
+        )
+        self.total_messages += count
 
 
 class Message(models.Model):
@@ -60,7 +63,8 @@ class Message(models.Model):
         ]
     )
     content = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # When the message was sent; write-behind rows are inserted later
+    timestamp = models.DateTimeField(default=timezone.now)
     token_count = models.IntegerField(default=0)
     intelligence_level = models.CharField(max_length=20, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
@@ -0,0 +1,286 @@
+"""
+Async Ollama HTTP client
+One pooled keep-alive connection engine shared by every backend in the process
+"""
+import asyncio
+import concurrent.futures
+import json
+import os
+import threading
+from contextlib import aclosing
+from typing import Any, AsyncGenerator, Callable, Coroutine, Dict, List, Optional
+
+import httpx
+from django.conf import settings
+
+DEFAULT_OLLAMA_BASE_URL = "http://localhost:11434"
+
+
+class OllamaError(RuntimeError):
+    """Raised when Ollama cannot be reached or answers with an error."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class OllamaClient:
+    """
+    Async HTTP engine for the Ollama API
+
+    All requests run on a dedicated event loop thread that owns a single
+    ``httpx.AsyncClient`` with a bounded keep-alive pool, so every caller in
+    the process shares the same connections no matter which event loop (or
+    plain thread) it calls from. Streams are pumped on the engine loop and
+    handed to the caller's loop frame by frame, which lets concurrent
+    generations interleave instead of serializing.
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_OLLAMA_BASE_URL,
+        max_connections: int = 32,
+        max_keepalive_connections: int = 16,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+        # A forked child (gunicorn --preload) inherits the loop but not the
+        # thread running it; it starts its own engine loop on first use
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    # ========================================================================
+    # ENGINE LOOP
+    # ========================================================================
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the engine loop thread on first use"""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    ready = threading.Event()
+                    thread = threading.Thread(
+                        target=self._run_loop,
+                        args=(loop, ready),
+                        name='ollama-client',
+                        daemon=True
+                    )
+                    thread.start()
+                    ready.wait()
+                    self._loop = loop
+        return self._loop
+
+    def _after_fork(self) -> None:
+        # The parent's connections and loop belong to the parent
+        self._loop = None
+        self._http = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop, ready: threading.Event) -> None:
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    def _client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client; only ever touched from the engine loop"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return self._http
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """Schedule a coroutine on the engine loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run_sync(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the engine loop and block for its result"""
+        return self.submit(coro).result(timeout)
+
+    async def _call(self, coro: Coroutine) -> Any:
+        """Await a coroutine on the engine loop from any event loop"""
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def close(self) -> None:
+        """Close pooled connections"""
+        if self._loop is not None and self._http is not None:
+            self.run_sync(self._http.aclose(), timeout=5)
+            self._http = None
+
+    # ========================================================================
+    # RAW REQUESTS (engine loop only)
+    # ========================================================================
+
+    def _url(self, path: str, base_url: Optional[str]) -> str:
+        return f"{(base_url or self.base_url).rstrip('/')}{path}"
+
+    async def _request_json(
+        self,
+        method: str,
+        path: str,
+        base_url: Optional[str] = None,
+        payload: Optional[Dict] = None,
+        timeout: Optional[float] = None
+    ) -> Dict:
+        url = self._url(path, base_url)
+        try:
+            response = await self._client().request(
+                method,
+                url,
+                json=payload,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+            )
+        except httpx.HTTPError as e:
+            raise OllamaError(f"Ollama request to {url} failed: {e!r}") from e
+
+        if response.status_code != 200:
+            raise OllamaError(f"Ollama API error: {response.status_code}", response.status_code)
+        if not response.content:
+            return {}
+        return response.json()
+
+    async def _stream_frames(self, path: str, payload: Dict, base_url: Optional[str]) -> AsyncGenerator[Dict, None]:
+        url = self._url(path, base_url)
+        try:
+            async with self._client().stream('POST', url, json=payload) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise OllamaError(f"Ollama API error: {response.status_code}", response.status_code)
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+        except httpx.HTTPError as e:
+            raise OllamaError(f"Ollama stream from {url} failed: {e!r}") from e
+
+    async def _pump(self, frames: AsyncGenerator[Dict, None], deliver: Callable) -> None:
+        """Forward frames from the engine loop to a caller on another loop"""
+        try:
+            async with aclosing(frames):
+                async for frame in frames:
+                    deliver(('frame', frame))
+        except Exception as e:
+            deliver(('error', e))
+        else:
+            deliver(('done', None))
+
+    # ========================================================================
+    # OLLAMA API
+    # ========================================================================
+
+    async def tags(self, base_url: Optional[str] = None, timeout: float = 10) -> Dict:
+        """GET /api/tags"""
+        return await self._call(self._request_json('GET', '/api/tags', base_url, timeout=timeout))
+
+    async def show(self, name: str, base_url: Optional[str] = None) -> Dict:
+        """POST /api/show"""
+        return await self._call(self._request_json('POST', '/api/show', base_url, {'name': name}, timeout=10))
+
+    async def pull(self, name: str, base_url: Optional[str] = None) -> Dict:
+        """POST /api/pull, waiting for the download to finish"""
+        return await self._call(
+            self._request_json('POST', '/api/pull', base_url, {'name': name, 'stream': False}, timeout=300)
+        )
+
+    async def delete(self, name: str, base_url: Optional[str] = None) -> Dict:
+        """DELETE /api/delete"""
+        return await self._call(self._request_json('DELETE', '/api/delete', base_url, {'name': name}, timeout=30))
+
+    async def embeddings(self, model: str, prompt: str, base_url: Optional[str] = None) -> List[float]:
+        """POST /api/embeddings and return the vector"""
+        data = await self._call(
+            self._request_json('POST', '/api/embeddings', base_url, {'model': model, 'prompt': prompt}, timeout=30)
+        )
+        return data.get('embedding', [])
+
+    async def load(
+        self,
+        model: str,
+        keep_alive: Any = None,
+        base_url: Optional[str] = None,
+        options: Optional[Dict] = None
+    ) -> Dict:
+        """POST /api/generate with no prompt, which only loads the model into memory"""
+        payload = {'model': model, 'stream': False}
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+        if options:
+            payload['options'] = options
+        return await self._call(self._request_json('POST', '/api/generate', base_url, payload, timeout=300))
+
+    async def chat(self, payload: Dict, base_url: Optional[str] = None) -> Dict:
+        """POST /api/chat without streaming"""
+        payload = {**payload, 'stream': False}
+        return await self._call(self._request_json('POST', '/api/chat', base_url, payload))
+
+    async def stream_chat(self, payload: Dict, base_url: Optional[str] = None) -> AsyncGenerator[Dict, None]:
+        """POST /api/chat and yield each NDJSON frame as it arrives"""
+        payload = {**payload, 'stream': True}
+        frames = self._stream_frames('/api/chat', payload, base_url)
+
+        loop = self._ensure_loop()
+        caller_loop = asyncio.get_running_loop()
+        if caller_loop is loop:
+            # Closing the frames generator closes the upstream response
+            async with aclosing(frames):
+                async for frame in frames:
+                    yield frame
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def deliver(item):
+            try:
+                caller_loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                pass  # caller loop already closed
+
+        pump = asyncio.run_coroutine_threadsafe(self._pump(frames, deliver), loop)
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == 'frame':
+                    yield value
+                elif kind == 'error':
+                    raise value
+                else:
+                    return
+        finally:
+            # Cancelling the pump closes the upstream response
+            pump.cancel()
+
+
+_client: Optional[OllamaClient] = None
+_client_lock = threading.Lock()
+
+
+def get_ollama_client() -> OllamaClient:
+    """Return the process-wide Ollama client"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OllamaClient(
+                    base_url=getattr(settings, 'LLM_OLLAMA_BASE_URL', DEFAULT_OLLAMA_BASE_URL),
+                    max_connections=getattr(settings, 'LLM_OLLAMA_MAX_CONNECTIONS', 32),
+                    max_keepalive_connections=getattr(settings, 'LLM_OLLAMA_MAX_KEEPALIVE', 16),
+                    connect_timeout=getattr(settings, 'LLM_OLLAMA_CONNECT_TIMEOUT', 5.0),
+                    read_timeout=getattr(settings, 'LLM_OLLAMA_READ_TIMEOUT', 60.0),
+                )
+    return _client
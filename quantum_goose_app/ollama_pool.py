@@ -0,0 +1,257 @@
+"""
+Multi-host Ollama pool
+Spreads generations over several Ollama nodes by in-flight load, keeps each
+session on one node for KV-cache reuse, and ejects nodes that stop answering
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from .ollama_client import OllamaClient, get_ollama_client
+
+
+class _Host:
+    """Load and health of one Ollama node"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = True
+        self.inflight = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.probe_ms: Optional[float] = None
+        self.last_probe = 0.0
+        self.last_error = ''
+
+
+class Lease:
+    """A generation's claim on a host; release it when the request ends"""
+
+    def __init__(self, pool: 'OllamaHostPool', url: str):
+        self.pool = pool
+        self.url = url
+        self._released = False
+
+    def release(self, error: Optional[BaseException] = None) -> None:
+        """Return the host, reporting whether the request failed (idempotent)"""
+        if self._released:
+            return
+        self._released = True
+        self.pool._release(self.url, error)
+
+
+class OllamaHostPool:
+    """
+    Least-loaded routing over a set of Ollama base URLs
+
+    Each new session goes to the healthy host with the fewest in-flight
+    requests (probe latency breaks ties) and then stays there while it is
+    healthy, so Ollama can reuse the session's cached prompt. A session is
+    moved when its host is more than ``sticky_slack`` requests busier than
+    the least-loaded one. A host is ejected after ``eject_after`` consecutive
+    failed requests or probes and comes back on its next successful probe.
+    """
+
+    def __init__(
+        self,
+        client: OllamaClient,
+        hosts: Iterable[str],
+        probe_interval: float = 10.0,
+        probe_timeout: float = 3.0,
+        eject_after: int = 3,
+        sticky_ttl: float = 1800.0,
+        sticky_slack: int = 4,
+        max_sticky: int = 10000
+    ):
+        self.client = client
+        self._hosts: Dict[str, _Host] = OrderedDict(
+            (url.rstrip('/'), _Host(url.rstrip('/'))) for url in hosts
+        )
+        if not self._hosts:
+            self._hosts[client.base_url] = _Host(client.base_url)
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.eject_after = eject_after
+        self.sticky_ttl = sticky_ttl
+        self.sticky_slack = sticky_slack
+        self.max_sticky = max_sticky
+        self._sticky: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._prober: Optional[threading.Thread] = None
+        self._stats = {'leases': 0, 'sticky_hits': 0, 'rebalanced': 0, 'ejections': 0}
+
+    @property
+    def urls(self) -> List[str]:
+        return list(self._hosts)
+
+    def healthy_urls(self) -> List[str]:
+        with self._lock:
+            return [url for url, host in self._hosts.items() if host.healthy]
+
+    def primary_url(self) -> str:
+        """First healthy host, used for catalog and model management calls"""
+        healthy = self.healthy_urls()
+        return healthy[0] if healthy else next(iter(self._hosts))
+
+    # ========================================================================
+    # LEASING
+    # ========================================================================
+
+    def _least_loaded(self, exclude: Iterable[str] = ()) -> _Host:
+        exclude = set(exclude)
+        hosts = [host for url, host in self._hosts.items() if url not in exclude] or list(self._hosts.values())
+        healthy = [host for host in hosts if host.healthy]
+        # With every host ejected, keep trying the one that failed least recently
+        pool = healthy or hosts
+        return min(pool, key=lambda h: (h.inflight, h.probe_ms if h.probe_ms is not None else float('inf')))
+
+    def lease(self, session_key: Optional[str] = None, exclude: Iterable[str] = ()) -> Lease:
+        """Pick a host for one request and count it as in flight"""
+        self.start()
+        now = time.time()
+        with self._lock:
+            best = self._least_loaded(exclude)
+            host = best
+            if session_key:
+                pinned = self._sticky.get(session_key)
+                if pinned and now - pinned[1] < self.sticky_ttl:
+                    current = self._hosts.get(pinned[0])
+                    if (current is not None and current.healthy and current.url not in exclude
+                            and current.inflight - best.inflight <= self.sticky_slack):
+                        host = current
+                        self._stats['sticky_hits'] += 1
+                    else:
+                        self._stats['rebalanced'] += 1
+                self._sticky[session_key] = (host.url, now)
+                self._sticky.move_to_end(session_key)
+                while len(self._sticky) > self.max_sticky:
+                    self._sticky.popitem(last=False)
+            host.inflight += 1
+            host.requests += 1
+            self._stats['leases'] += 1
+            return Lease(self, host.url)
+
+    def _release(self, url: str, error: Optional[BaseException]) -> None:
+        with self._lock:
+            host = self._hosts.get(url)
+            if host is None:
+                return
+            host.inflight = max(host.inflight - 1, 0)
+            if error is None:
+                host.consecutive_failures = 0
+            else:
+                host.errors += 1
+                self._record_failure(host, error)
+
+    def _record_failure(self, host: _Host, error: BaseException) -> None:
+        """Count a failure; caller holds the lock"""
+        host.consecutive_failures += 1
+        host.last_error = str(error)
+        if host.healthy and host.consecutive_failures >= self.eject_after:
+            host.healthy = False
+            self._stats['ejections'] += 1
+            print(f"Ollama host {host.url} ejected after {host.consecutive_failures} failures: {error}")
+
+    # ========================================================================
+    # HEALTH PROBES
+    # ========================================================================
+
+    async def _probe(self, host: _Host) -> None:
+        started = time.perf_counter()
+        try:
+            await self.client.tags(host.url, timeout=self.probe_timeout)
+        except Exception as e:
+            with self._lock:
+                host.last_probe = time.time()
+                self._record_failure(host, e)
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            host.last_probe = time.time()
+            host.probe_ms = elapsed if host.probe_ms is None else host.probe_ms * 0.7 + elapsed * 0.3
+            host.consecutive_failures = 0
+            if not host.healthy:
+                print(f"Ollama host {host.url} is back")
+            host.healthy = True
+
+    async def _probe_all(self) -> None:
+        await asyncio.gather(*(self._probe(host) for host in self._hosts.values()))
+
+    def probe_all(self) -> None:
+        """Probe every host once, blocking until done"""
+        self.client.run_sync(self._probe_all())
+
+    def start(self) -> None:
+        """Start the background prober if it is not already running"""
+        if self._prober is not None and self._prober.is_alive():
+            return
+        with self._lock:
+            if self._prober is not None and self._prober.is_alive():
+                return
+            self._wakeup.clear()
+            self._prober = threading.Thread(target=self._run, name='ollama-host-prober', daemon=True)
+            self._prober.start()
+
+    def stop(self) -> None:
+        """Stop the background prober"""
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        """Prober loop"""
+        while True:
+            try:
+                self.probe_all()
+            except Exception as e:  # pragma: no cover - keep probing
+                print(f"Ollama host probe failed: {e}")
+            if self._wakeup.wait(self.probe_interval):
+                return
+
+    def stats(self) -> Dict:
+        """Per-host load and health"""
+        with self._lock:
+            return {
+                **self._stats,
+                'sticky_sessions': len(self._sticky),
+                'hosts': [
+                    {
+                        'url': host.url,
+                        'healthy': host.healthy,
+                        'inflight': host.inflight,
+                        'requests': host.requests,
+                        'errors': host.errors,
+                        'consecutive_failures': host.consecutive_failures,
+                        'probe_ms': round(host.probe_ms, 1) if host.probe_ms is not None else None,
+                        'last_probe': host.last_probe,
+                        'last_error': host.last_error,
+                    }
+                    for host in self._hosts.values()
+                ],
+            }
+
+
+_pool: Optional[OllamaHostPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_ollama_pool() -> OllamaHostPool:
+    """Return the process-wide Ollama host pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                client = get_ollama_client()
+                _pool = OllamaHostPool(
+                    client,
+                    hosts=getattr(settings, 'LLM_OLLAMA_HOSTS', None) or [client.base_url],
+                    probe_interval=getattr(settings, 'LLM_OLLAMA_PROBE_INTERVAL', 10.0),
+                    eject_after=getattr(settings, 'LLM_OLLAMA_EJECT_AFTER', 3),
+                    sticky_ttl=getattr(settings, 'LLM_OLLAMA_STICKY_TTL', 1800.0),
+                    sticky_slack=getattr(settings, 'LLM_OLLAMA_STICKY_SLACK', 4),
+                )
+    return _pool
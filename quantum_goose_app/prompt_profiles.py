@@ -0,0 +1,134 @@
+"""
+System prompt profiles per intelligence level
+Picks how much of the system prompt each level sends, from a one-line NANO
+prompt to the full hardware, model and memory context, and measures what
+each profile costs in prompt tokens
+"""
+import threading
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+# Sections a profile may list, in the order they are assembled. intro and
+# capabilities are the profile's own text; the others are the backend's
+# cached segments.
+SECTIONS = ('intro', 'hardware', 'model', 'settings', 'capabilities', 'memory')
+
+FULL_INTRO = "You are HAZoom, a super-intelligent AI assistant running on:\n"
+FULL_CAPABILITIES = """
+ You have super intelligence capabilities and can help with any task. You are aware of the system
+ you're running on and can optimize your responses accordingly. You aim for peace and optimization.
+
+ MEMORY CAPABILITIES:
+ You have access to persistent memory! You can remember:
+ - User preferences and settings
+ - Important facts and context from previous conversations
+ - Knowledge base of technical information
+ - Conversation history across sessions
+
+ When users mention something important, you can store it for future reference.
+ """
+
+DEFAULT_PROFILES = {
+    'minimal': {
+        'intro': "You are HAZoom, a helpful AI assistant. Answer briefly and directly.",
+        'capabilities': "",
+        'sections': ('intro',),
+    },
+    'compact': {
+        'intro': "You are HAZoom, a helpful AI assistant.",
+        'capabilities': "\nYou remember the user's preferences and important facts from earlier conversations.",
+        'sections': ('intro', 'capabilities', 'memory'),
+    },
+    'full': {
+        'intro': FULL_INTRO,
+        'capabilities': FULL_CAPABILITIES,
+        'sections': SECTIONS,
+    },
+}
+
+DEFAULT_LEVEL_PROFILES = {
+    'nano': 'minimal',
+    'standard': 'compact',
+    'super': 'full',
+    'quantum': 'full',
+}
+
+
+class PromptProfiles:
+    """
+    Named system prompt profiles and the profile each level uses
+
+    ``profiles`` entries are merged key by key over the built-in profiles of
+    the same name, so a setting can change one profile's intro without
+    repeating its sections; a new name starts from 'full'. A level with no
+    profile, or one naming an unknown profile, uses 'full'. Generations are
+    recorded per profile to compare the system prompt's size with what
+    Ollama actually evaluated.
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, Dict]] = None, levels: Optional[Dict[str, str]] = None):
+        self.profiles: Dict[str, Dict] = {name: dict(profile) for name, profile in DEFAULT_PROFILES.items()}
+        for name, profile in (profiles or {}).items():
+            merged = {**self.profiles.get(name, DEFAULT_PROFILES['full']), **profile}
+            unknown = set(merged['sections']) - set(SECTIONS)
+            if unknown:
+                raise ValueError(f"Prompt profile {name!r} has unknown sections: {', '.join(sorted(unknown))}")
+            merged['sections'] = tuple(section for section in SECTIONS if section in merged['sections'])
+            self.profiles[name] = merged
+        self.levels = {**DEFAULT_LEVEL_PROFILES, **(levels or {})}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+
+    def for_level(self, level: str) -> Tuple[str, Dict]:
+        """(name, profile) used by ``level``"""
+        name = self.levels.get(level, 'full')
+        if name not in self.profiles:
+            name = 'full'
+        return name, self.profiles[name]
+
+    def record(self, name: str, system_tokens: int, final: Dict) -> None:
+        """Count one generation sent with profile ``name``"""
+        with self._lock:
+            stats = self._stats.setdefault(name, {
+                'generations': 0, 'system_tokens': 0, 'prompt_eval_count': 0, 'prompt_eval_ms': 0.0,
+            })
+            stats['generations'] += 1
+            stats['system_tokens'] += system_tokens
+            stats['prompt_eval_count'] += final.get('prompt_eval_count', 0)
+            stats['prompt_eval_ms'] += final.get('prompt_eval_duration', 0) / 1e6
+
+    def stats(self) -> Dict:
+        """Per profile: levels using it, sections, and measured averages"""
+        with self._lock:
+            recorded = {name: dict(stats) for name, stats in self._stats.items()}
+        result = {}
+        for name, profile in self.profiles.items():
+            stats = recorded.get(name, {})
+            count = stats.get('generations', 0)
+            result[name] = {
+                'levels': sorted(level for level in self.levels if self.for_level(level)[0] == name),
+                'sections': list(profile['sections']),
+                'generations': count,
+                'avg_system_tokens': round(stats['system_tokens'] / count, 1) if count else None,
+                'avg_prompt_eval_count': round(stats['prompt_eval_count'] / count, 1) if count else None,
+                'avg_prompt_eval_ms': round(stats['prompt_eval_ms'] / count, 1) if count else None,
+            }
+        return result
+
+
+_profiles: Optional[PromptProfiles] = None
+_profiles_lock = threading.Lock()
+
+
+def get_prompt_profiles() -> PromptProfiles:
+    """Return the process-wide prompt profiles"""
+    global _profiles
+    if _profiles is None:
+        with _profiles_lock:
+            if _profiles is None:
+                _profiles = PromptProfiles(
+                    profiles=getattr(settings, 'LLM_PROMPT_PROFILES', {}),
+                    levels=getattr(settings, 'LLM_LEVEL_PROMPT_PROFILES', {}),
+                )
+    return _profiles
@@ -0,0 +1,124 @@
+"""
+Exact-match response cache for chat generations
+Keys on model, normalized messages and sampling options
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+
+def _normalize_content(content: str) -> str:
+    """Collapse whitespace so trivially different prompts share an entry"""
+    return ' '.join(content.split())
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of complete responses with per-entry TTL
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = 600.0, enabled: bool = False):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries: 'OrderedDict[str, Tuple[str, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'expired': 0}
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict], options: Dict) -> str:
+        """Stable hash of model, normalized messages and options"""
+        payload = {
+            'model': model,
+            'messages': [
+                [m.get('role', ''), _normalize_content(m.get('content', ''))]
+                for m in messages
+            ],
+            'options': options,
+        }
+        blob = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+    def should_cache(self, options: Dict, requested: Optional[bool] = None) -> bool:
+        """
+        Whether a request may use the cache
+        An explicit per-request flag wins; otherwise deterministic sampling
+        (temperature 0) is always cacheable and the rest follows the setting.
+        """
+        if requested is not None:
+            return bool(requested)
+        if options.get('temperature') == 0:
+            return True
+        return self.enabled
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Store a response"""
+        if not value:
+            return
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            self._stats['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and occupancy"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'enabled': self.enabled,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0,
+            }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    max_entries=getattr(settings, 'LLM_RESPONSE_CACHE_MAX_ENTRIES', 512),
+                    ttl=getattr(settings, 'LLM_RESPONSE_CACHE_TTL', 600.0),
+                    enabled=getattr(settings, 'LLM_RESPONSE_CACHE_ENABLED', False),
+                )
+    return _cache
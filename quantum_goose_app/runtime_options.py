@@ -0,0 +1,154 @@
+"""
+Hardware-aware Ollama runtime options
+Turns the cached hardware snapshot's recommendations into num_thread,
+num_batch and num_gpu, and sizes num_ctx to the prompt plus its output budget
+"""
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+from .context_window import context_tokens_for_model
+from .system_info import get_system_snapshot
+
+# num_batch (prompt tokens evaluated per step) per unit of recommended batch
+# size: 1 -> 128, 2 -> 256, 4 -> 512 (Ollama's default), 8 -> 1024
+NUM_BATCH_PER_UNIT = 128
+
+
+class RuntimeOptionsPlanner:
+    """
+    Plans the Ollama runner options for each request
+
+    num_thread follows the recommended thread count, capped at the physical
+    cores on CPU inference where hyperthreads slow token generation down;
+    CPU-only hosts also send num_gpu=0. num_ctx is the prompt plus
+    num_predict rounded up to a power-of-two multiple of ``min_ctx`` and
+    capped at the model's context length.
+
+    Ollama reloads a model whenever its runner options change, so num_ctx
+    only grows per model and drops back to a smaller size once the larger
+    one has not been needed for ``shrink_after`` seconds. ``level_overrides``
+    maps an intelligence level to options that replace the computed ones;
+    a None value leaves that option to Ollama's default.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        min_ctx: int = 2048,
+        shrink_after: float = 600.0,
+        level_overrides: Optional[Dict[str, Dict]] = None
+    ):
+        self.enabled = enabled
+        self.min_ctx = min_ctx
+        self.shrink_after = shrink_after
+        self.level_overrides = level_overrides or {}
+        self._ctx: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._stats = {'planned': 0, 'ctx_grown': 0, 'ctx_shrunk': 0}
+
+    @staticmethod
+    def hardware_options(snapshot=None) -> Dict:
+        """num_thread, num_batch and num_gpu for the host in ``snapshot``"""
+        snapshot = snapshot or get_system_snapshot()
+        optimization = snapshot.optimization
+        threads = optimization.get('thread_count') or 0
+        options = {}
+        if optimization.get('inference_backend', 'cpu') == 'cpu':
+            physical = snapshot.info['cpu'].get('cores_physical') or 0
+            if physical:
+                threads = min(threads, physical)
+            # Skip GPU discovery and offload on CPU-only hosts
+            options['num_gpu'] = 0
+        # A single recommended thread means "unknown"; let Ollama pick
+        if threads > 1:
+            options['num_thread'] = threads
+        options['num_batch'] = max(optimization.get('batch_size') or 1, 1) * NUM_BATCH_PER_UNIT
+        return options
+
+    def num_ctx(self, model: str, prompt_tokens: Optional[int] = None, num_predict: int = 0) -> int:
+        """
+        Context size for a request on ``model``
+        Without ``prompt_tokens`` (a model preload) the size in use is kept.
+        """
+        limit = context_tokens_for_model(model)
+        # Ollama resolves an untagged name to :latest; warm-up uses the bare name
+        if ':' not in model:
+            model = f'{model}:latest'
+        now = time.time()
+        with self._lock:
+            current, needed_at = self._ctx.get(model, (0, 0.0))
+            if prompt_tokens is None:
+                return current or min(self.min_ctx, limit)
+            needed = prompt_tokens + num_predict
+            size = self.min_ctx
+            while size < needed:
+                size *= 2
+            size = min(size, limit)
+            if size >= current:
+                if current and size > current:
+                    self._stats['ctx_grown'] += 1
+                self._ctx[model] = (size, now)
+            elif now - needed_at >= self.shrink_after:
+                self._stats['ctx_shrunk'] += 1
+                self._ctx[model] = (size, now)
+            else:
+                size = current
+            return size
+
+    def options_for(
+        self,
+        model: str,
+        level: Optional[str] = None,
+        prompt_tokens: Optional[int] = None,
+        num_predict: int = 0
+    ) -> Dict:
+        """Runtime options to merge into an Ollama request's options"""
+        if not self.enabled:
+            return {}
+        options = self.hardware_options()
+        options['num_ctx'] = self.num_ctx(model, prompt_tokens, num_predict)
+        for key, value in self.level_overrides.get(level, {}).items():
+            if value is None:
+                options.pop(key, None)
+            else:
+                options[key] = value
+        with self._lock:
+            self._stats['planned'] += 1
+        return options
+
+    def stats(self) -> Dict:
+        """Current hardware options and num_ctx per model"""
+        with self._lock:
+            ctx = {model: size for model, (size, _) in self._ctx.items()}
+            stats = dict(self._stats)
+        return {
+            **stats,
+            'enabled': self.enabled,
+            'hardware': self.hardware_options() if self.enabled else {},
+            'num_ctx': ctx,
+            'min_ctx': self.min_ctx,
+            'shrink_after': self.shrink_after,
+            'level_overrides': self.level_overrides,
+        }
+
+
+_planner: Optional[RuntimeOptionsPlanner] = None
+_planner_lock = threading.Lock()
+
+
+def get_runtime_options() -> RuntimeOptionsPlanner:
+    """Return the process-wide runtime options planner"""
+    global _planner
+    if _planner is None:
+        with _planner_lock:
+            if _planner is None:
+                _planner = RuntimeOptionsPlanner(
+                    enabled=getattr(settings, 'LLM_RUNTIME_OPTIONS_ENABLED', True),
+                    min_ctx=getattr(settings, 'LLM_NUM_CTX_MIN', 2048),
+                    shrink_after=getattr(settings, 'LLM_NUM_CTX_SHRINK_AFTER', 600.0),
+                    level_overrides=getattr(settings, 'LLM_LEVEL_RUNTIME_OPTIONS', {}),
+                )
+    return _planner
@@ -0,0 +1,284 @@
+"""
+Admission control and priority scheduling in front of Ollama
+Bounds concurrent generations per model and orders waiters by intelligence level
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.http import JsonResponse
+
+# Lower value is served first: quick NANO answers jump ahead of heavy QUANTUM ones
+LEVEL_PRIORITY = {
+    'nano': 0,
+    'standard': 1,
+    'super': 2,
+    'quantum': 3,
+}
+
+
+class SchedulerRejected(Exception):
+    """Raised when a generation cannot be admitted."""
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFullError(SchedulerRejected):
+    """Raised when the model's wait queue is already at its depth limit."""
+    status_code = 429
+
+
+class QueueTimeoutError(SchedulerRejected):
+    """Raised when a queued generation waited longer than allowed."""
+    status_code = 503
+
+
+def rejection_response(error: SchedulerRejected) -> JsonResponse:
+    """HTTP response for a rejected generation, with Retry-After"""
+    response = JsonResponse({
+        'error': str(error),
+        'retry_after': error.retry_after,
+    }, status=error.status_code)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+class Ticket:
+    """A granted generation slot; release it when the generation ends"""
+
+    def __init__(self, scheduler: 'GenerationScheduler', model: str, queue_wait: float):
+        self.scheduler = scheduler
+        self.model = model
+        self.queue_wait = queue_wait
+        self.acquired_at = time.time()
+        self._released = False
+        self._lock = threading.Lock()
+
+    @property
+    def queue_wait_ms(self) -> float:
+        return round(self.queue_wait * 1000, 1)
+
+    def release(self) -> None:
+        """Give the slot back (idempotent)"""
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self.scheduler._release(self.model, time.time() - self.acquired_at)
+
+    async def switch(self, model: str, level: str = 'super') -> None:
+        """
+        Move this slot to ``model`` when a generation fails over to it
+        The failing model's slot is given back first, then a slot on
+        ``model`` is awaited like any new request; SchedulerRejected is
+        raised if none can be had. A released ticket is left as it is.
+        """
+        if model == self.model:
+            return
+        with self._lock:
+            if self._released:
+                return
+        self.release()
+        other = await self.scheduler.acquire(model, level)
+        # Take over the new slot; ``other`` must not free it when collected
+        other._released = True
+        with self._lock:
+            self.model = model
+            self.queue_wait += other.queue_wait
+            self.acquired_at = other.acquired_at
+            self._released = False
+
+    def __del__(self):
+        # Safety net for streams that were never iterated
+        if not self._released:
+            self.release()
+
+
+class _Waiter:
+    """Queued request; ordered by priority, then arrival"""
+    __slots__ = ('priority', 'seq', 'loop', 'future', 'granted', 'enqueued_at')
+
+    def __init__(self, priority: int, seq: int, loop: asyncio.AbstractEventLoop, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.loop = loop
+        self.future = future
+        self.granted = False
+        self.enqueued_at = time.time()
+
+    def __lt__(self, other: '_Waiter') -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _ModelQueue:
+    """Concurrency state for one model"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters: List[_Waiter] = []
+        self.avg_hold = 10.0  # seconds, EWMA of slot hold time
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+
+
+def _grant(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class GenerationScheduler:
+    """
+    Per-model concurrency limiter with a priority wait queue
+
+    Requests beyond a model's concurrency limit wait in a queue ordered by
+    intelligence level. A full queue is rejected immediately (429) and a
+    request that waits longer than ``max_queue_wait`` is rejected (503),
+    both with a Retry-After estimate based on recent slot hold times.
+    Safe to use from any event loop or thread.
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[Dict[str, int]] = None,
+        max_queue_depth: int = 32,
+        max_queue_wait: float = 30.0
+    ):
+        self.concurrency = concurrency or {'default': 2}
+        self.max_queue_depth = max_queue_depth
+        self.max_queue_wait = max_queue_wait
+        self._queues: Dict[str, _ModelQueue] = {}
+        # Reentrant: a Ticket finalizer may release while this thread holds it
+        self._lock = threading.RLock()
+        self._seq = itertools.count()
+
+    def _limit_for(self, model: str) -> int:
+        if model in self.concurrency:
+            return self.concurrency[model]
+        return self.concurrency.get(model.split(':', 1)[0], self.concurrency.get('default', 2))
+
+    def _queue(self, model: str) -> _ModelQueue:
+        queue = self._queues.get(model)
+        if queue is None:
+            queue = self._queues[model] = _ModelQueue(self._limit_for(model))
+        return queue
+
+    @staticmethod
+    def _retry_after(queue: _ModelQueue) -> int:
+        return max(1, math.ceil(queue.avg_hold * (len(queue.waiters) + 1) / max(queue.limit, 1)))
+
+    async def acquire(self, model: str, level: str = 'super') -> Ticket:
+        """Wait for a generation slot on ``model``"""
+        priority = LEVEL_PRIORITY.get(level, len(LEVEL_PRIORITY))
+        started = time.time()
+        loop = asyncio.get_running_loop()
+
+        with self._lock:
+            queue = self._queue(model)
+            if queue.active < queue.limit and not queue.waiters:
+                queue.active += 1
+                queue.admitted += 1
+                return Ticket(self, model, 0.0)
+            if len(queue.waiters) >= self.max_queue_depth:
+                queue.rejected += 1
+                raise QueueFullError(
+                    f"Too many queued requests for {model}, try again later",
+                    self._retry_after(queue)
+                )
+            waiter = _Waiter(priority, next(self._seq), loop, loop.create_future())
+            heapq.heappush(queue.waiters, waiter)
+            queue.queued += 1
+
+        try:
+            await asyncio.wait_for(waiter.future, self.max_queue_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if not waiter.granted:
+                    queue.waiters.remove(waiter)
+                    heapq.heapify(queue.waiters)
+                    if isinstance(e, asyncio.TimeoutError):
+                        queue.timed_out += 1
+                        raise QueueTimeoutError(
+                            f"Timed out waiting for a free {model} slot",
+                            self._retry_after(queue)
+                        ) from None
+                    raise
+            # Granted just as we gave up: keep the slot unless we were cancelled
+            if isinstance(e, asyncio.CancelledError):
+                self._release(model, 0.0)
+                raise
+
+        waited = time.time() - started
+        with self._lock:
+            queue.total_wait += waited
+        return Ticket(self, model, waited)
+
+    def _release(self, model: str, held: float) -> None:
+        """Free a slot and hand it to the highest-priority waiter"""
+        with self._lock:
+            queue = self._queue(model)
+            queue.active -= 1
+            if held:
+                queue.avg_hold = queue.avg_hold * 0.8 + held * 0.2
+            while queue.waiters and queue.active < queue.limit:
+                waiter = heapq.heappop(queue.waiters)
+                waiter.granted = True
+                queue.active += 1
+                queue.admitted += 1
+                try:
+                    waiter.loop.call_soon_threadsafe(_grant, waiter.future)
+                except RuntimeError:
+                    # Waiter's loop is gone; reclaim the slot
+                    queue.active -= 1
+                    queue.admitted -= 1
+
+    def stats(self) -> Dict:
+        """Per-model concurrency and queue counters"""
+        with self._lock:
+            return {
+                'max_queue_depth': self.max_queue_depth,
+                'max_queue_wait': self.max_queue_wait,
+                'models': {
+                    model: {
+                        'limit': queue.limit,
+                        'active': queue.active,
+                        'queued_now': len(queue.waiters),
+                        'admitted': queue.admitted,
+                        'queued': queue.queued,
+                        'rejected': queue.rejected,
+                        'timed_out': queue.timed_out,
+                        'avg_queue_wait_ms': round(queue.total_wait / queue.queued * 1000, 1) if queue.queued else 0.0,
+                        'avg_hold_s': round(queue.avg_hold, 2),
+                    }
+                    for model, queue in self._queues.items()
+                },
+            }
+
+
+_scheduler: Optional[GenerationScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> GenerationScheduler:
+    """Return the process-wide generation scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = GenerationScheduler(
+                    concurrency=getattr(settings, 'LLM_SCHEDULER_CONCURRENCY', {'default': 2}),
+                    max_queue_depth=getattr(settings, 'LLM_SCHEDULER_MAX_QUEUE_DEPTH', 32),
+                    max_queue_wait=getattr(settings, 'LLM_SCHEDULER_MAX_QUEUE_WAIT', 30.0),
+                )
+    return _scheduler
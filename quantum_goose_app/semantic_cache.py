@@ -0,0 +1,352 @@
+"""
+Semantic response cache
+Answers paraphrased questions from earlier responses using Ollama embeddings
+and an in-process cosine-similarity index
+"""
+import atexit
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .ollama_client import OllamaClient, get_ollama_client
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+@dataclass
+class _SemanticEntry:
+    """A cached prompt/response pair"""
+    prompt: str
+    response: str
+    created_at: float
+    last_hit: float
+    hits: int = 0
+
+
+def context_scope(user_identifier: str, system_prompt: str) -> str:
+    """
+    Partition scope for answers given under one user's system prompt
+    The system prompt carries the user's memories, so an answer that used
+    them must not be served to anyone else.
+    """
+    return hashlib.sha256(f"{user_identifier}\0{system_prompt}".encode('utf-8')).hexdigest()[:32]
+
+
+class _Partition:
+    """
+    Vector index for one (model, intelligence level, context scope)
+    Vectors are stored L2-normalized so a dot product is the cosine similarity
+    """
+
+    def __init__(self):
+        self.entries: List[_SemanticEntry] = []
+        self.vectors: List[List[float]] = []
+        self._matrix = None
+
+    def add(self, entry: _SemanticEntry, vector: List[float]) -> None:
+        self.entries.append(entry)
+        self.vectors.append(vector)
+        self._matrix = None
+
+    def remove(self, index: int) -> None:
+        del self.entries[index]
+        del self.vectors[index]
+        self._matrix = None
+
+    def nearest(self, query: List[float]) -> Tuple[int, float]:
+        """Index and similarity of the closest stored vector"""
+        if not self.vectors:
+            return -1, -1.0
+        if NUMPY_AVAILABLE:
+            if self._matrix is None:
+                self._matrix = np.asarray(self.vectors, dtype=np.float32)
+            scores = self._matrix @ np.asarray(query, dtype=np.float32)
+            index = int(scores.argmax())
+            return index, float(scores[index])
+        best_index, best_score = -1, -1.0
+        for index, vector in enumerate(self.vectors):
+            score = sum(a * b for a, b in zip(vector, query))
+            if score > best_score:
+                best_index, best_score = index, score
+        return best_index, best_score
+
+
+def _normalize(vector: List[float]) -> Optional[List[float]]:
+    norm = math.sqrt(sum(v * v for v in vector))
+    if not norm:
+        return None
+    return [v / norm for v in vector]
+
+
+class SemanticCache:
+    """
+    Second-level cache that matches prompts by meaning instead of bytes
+
+    Only standalone questions (no earlier assistant turns) are looked up or
+    stored, since a follow-up question depends on context the embedding of
+    its text does not capture. Entries are partitioned by the user and
+    system prompt they were answered under (see ``context_scope``).
+
+    With a ``path`` an enabled cache is loaded from disk at start, saved in
+    a background thread every ``save_every`` stores and saved at exit.
+    """
+
+    def __init__(
+        self,
+        client: OllamaClient,
+        embedding_model: str = 'nomic-embed-text',
+        threshold: float = 0.92,
+        max_entries: int = 1000,
+        ttl: float = 86400.0,
+        path: Optional[str] = None,
+        enabled: bool = False,
+        save_every: int = 20
+    ):
+        self.client = client
+        self.embedding_model = embedding_model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = str(path) if path else None
+        self.enabled = enabled
+        self.save_every = save_every
+        self._partitions: Dict[Tuple[str, str, str], _Partition] = {}
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self._saving = False
+        self._stats = {
+            'lookups': 0,
+            'hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'errors': 0,
+            'embed_ms_total': 0.0,
+            'search_ms_total': 0.0,
+        }
+        if self.path and self.enabled:
+            self.load()
+            atexit.register(self.save)
+
+    # ========================================================================
+    # LOOKUP / STORE
+    # ========================================================================
+
+    async def lookup(
+        self,
+        model: str,
+        level: str,
+        scope: str,
+        prompt: str
+    ) -> Tuple[Optional[str], Optional[List[float]]]:
+        """
+        Return (response, None) on a hit, or (None, embedding) on a miss
+        The embedding is handed back so the caller can store the answer
+        without embedding the prompt twice.
+        """
+        started = time.perf_counter()
+        try:
+            raw = await self.client.embeddings(self.embedding_model, prompt)
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            print(f"Semantic cache embedding failed: {e}")
+            return None, None
+        embedded = time.perf_counter()
+        vector = _normalize(raw)
+        if vector is None:
+            return None, None
+
+        now = time.time()
+        with self._lock:
+            self._stats['lookups'] += 1
+            self._stats['embed_ms_total'] += (embedded - started) * 1000
+            partition = self._partitions.get((model, level, scope))
+            response = None
+            if partition is not None:
+                index, score = partition.nearest(vector)
+                if index >= 0 and score >= self.threshold:
+                    entry = partition.entries[index]
+                    if now - entry.created_at < self.ttl:
+                        entry.hits += 1
+                        entry.last_hit = now
+                        response = entry.response
+                    else:
+                        partition.remove(index)
+                        self._stats['evictions'] += 1
+            self._stats['search_ms_total'] += (time.perf_counter() - embedded) * 1000
+            if response is not None:
+                self._stats['hits'] += 1
+                return response, None
+            self._stats['misses'] += 1
+        return None, vector
+
+    def store(
+        self,
+        model: str,
+        level: str,
+        scope: str,
+        prompt: str,
+        response: str,
+        vector: Optional[List[float]]
+    ) -> None:
+        """Add an answer to the index"""
+        if not response or not vector:
+            return
+        now = time.time()
+        with self._lock:
+            partition = self._partitions.setdefault((model, level, scope), _Partition())
+            partition.add(_SemanticEntry(prompt, response, now, now), vector)
+            self._stats['stores'] += 1
+            while len(partition.entries) > self.max_entries:
+                # Evict the least recently useful entry
+                stalest = min(range(len(partition.entries)), key=lambda i: partition.entries[i].last_hit)
+                partition.remove(stalest)
+                self._stats['evictions'] += 1
+            self._unsaved += 1
+            should_save = self.path and self._unsaved >= self.save_every and not self._saving
+            if should_save:
+                self._saving = True
+        if should_save:
+            # Called on the event loop; serializing the index must not block it
+            threading.Thread(target=self._save_in_background, name='semantic-cache-save', daemon=True).start()
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._partitions.clear()
+            self._unsaved += 1
+
+    def stats(self) -> Dict:
+        """Hit rate, latency and occupancy"""
+        with self._lock:
+            stats = dict(self._stats)
+            entries = sum(len(p.entries) for p in self._partitions.values())
+        lookups = stats['lookups']
+        return {
+            'enabled': self.enabled,
+            'embedding_model': self.embedding_model,
+            'threshold': self.threshold,
+            'index_backend': 'numpy' if NUMPY_AVAILABLE else 'python',
+            'partitions': len(self._partitions),
+            'entries': entries,
+            'lookups': lookups,
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'stores': stats['stores'],
+            'evictions': stats['evictions'],
+            'errors': stats['errors'],
+            'hit_rate': round(stats['hits'] / lookups, 4) if lookups else 0.0,
+            'avg_embed_ms': round(stats['embed_ms_total'] / lookups, 2) if lookups else 0.0,
+            'avg_search_ms': round(stats['search_ms_total'] / lookups, 3) if lookups else 0.0,
+        }
+
+    # ========================================================================
+    # PERSISTENCE
+    # ========================================================================
+
+    def _save_in_background(self) -> None:
+        try:
+            self.save()
+        finally:
+            with self._lock:
+                self._saving = False
+
+    def save(self) -> None:
+        """Write the index to disk atomically"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                'embedding_model': self.embedding_model,
+                'partitions': [
+                    {
+                        'model': model,
+                        'level': level,
+                        'scope': scope,
+                        'entries': [
+                            {
+                                'prompt': entry.prompt,
+                                'response': entry.response,
+                                'created_at': entry.created_at,
+                                'last_hit': entry.last_hit,
+                                'hits': entry.hits,
+                                'vector': vector,
+                            }
+                            for entry, vector in zip(partition.entries, partition.vectors)
+                        ],
+                    }
+                    for (model, level, scope), partition in self._partitions.items()
+                ],
+            }
+            self._unsaved = 0
+        # Per process: several workers may save the same file at once
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as handle:
+                json.dump(data, handle)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Semantic cache save failed: {e}")
+
+    def load(self) -> None:
+        """Warm the index from disk, skipping expired entries"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as handle:
+                data = json.load(handle)
+        except (OSError, ValueError) as e:
+            print(f"Semantic cache load failed: {e}")
+            return
+        if data.get('embedding_model') != self.embedding_model:
+            return  # vectors from another model are not comparable
+
+        now = time.time()
+        with self._lock:
+            for part in data.get('partitions', []):
+                if 'scope' not in part:
+                    continue  # saved before answers were scoped to their user
+                partition = self._partitions.setdefault((part['model'], part['level'], part['scope']), _Partition())
+                for item in part.get('entries', [])[-self.max_entries:]:
+                    if now - item['created_at'] >= self.ttl:
+                        continue
+                    partition.add(
+                        _SemanticEntry(item['prompt'], item['response'], item['created_at'],
+                                       item['last_hit'], item.get('hits', 0)),
+                        item['vector']
+                    )
+
+
+_cache: Optional[SemanticCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Return the process-wide semantic cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache(
+                    get_ollama_client(),
+                    embedding_model=getattr(settings, 'LLM_SEMANTIC_CACHE_EMBEDDING_MODEL', 'nomic-embed-text'),
+                    threshold=getattr(settings, 'LLM_SEMANTIC_CACHE_THRESHOLD', 0.92),
+                    max_entries=getattr(settings, 'LLM_SEMANTIC_CACHE_MAX_ENTRIES', 1000),
+                    ttl=getattr(settings, 'LLM_SEMANTIC_CACHE_TTL', 86400.0),
+                    path=getattr(settings, 'LLM_SEMANTIC_CACHE_PATH', None),
+                    enabled=getattr(settings, 'LLM_SEMANTIC_CACHE_ENABLED', False),
+                )
+    return _cache
@@ -3,20 +3,21 @@ Simplified API for AI Chat Service
 Clean, straightforward endpoints for client-friendly AI chat
 """
 import json
-import asyncio
-from django.http import JsonResponse, StreamingHttpResponse
+from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from asgiref.sync import async_to_sync
+from asgiref.sync import sync_to_async
 
 from .llm_backend import LLMBackend, LLMBackendManager
+from .scheduler import SchedulerRejected, rejection_response
+from .sse import chat_event_stream, event_stream_response
 
 # Simple backend manager for chat sessions
 chat_manager = LLMBackendManager()
 
 @csrf_exempt
 @require_http_methods(["POST"])
-def chat_message(request):
+async def chat_message(request):
     """
     Simple chat message endpoint
     Handles both streaming and non-streaming responses
@@ -25,71 +26,73 @@ def chat_message(request):
         data = json.loads(request.body)
         
         # Get backend for this session
-        backend = chat_manager.get_backend()
+        backend = await sync_to_async(chat_manager.get_backend)()
         
         user_message = data.get('message', '')
         stream = data.get('stream', True)
+        options = data.get('options') if isinstance(data.get('options'), dict) else None
+        use_cache = data.get('cache')
+        include_full_response = data.get('full_response')
         
         if not user_message:
             return JsonResponse({'error': 'Message is required'}, status=400)
         
+        # Serve a cache hit at once; a miss waits for a free generation slot,
+        # or is rejected fast when overloaded
+        cached = await backend.cached_response(user_message, options, use_cache, stream=stream)
+        ticket = None
+        if cached is None:
+            try:
+                ticket = await backend.acquire_slot()
+            except SchedulerRejected as e:
+                return rejection_response(e)
+        
         # Add user message to history
         backend.add_to_history('user', user_message)
         
         if stream:
-            return StreamingHttpResponse(
-                streaming_response_generator(backend, user_message),
-                content_type='text/event-stream'
+            return event_stream_response(
+                request,
+                streaming_response_generator(backend, user_message, options, use_cache, ticket, include_full_response)
             )
         
         # Non-streaming response
-        response_text = async_to_sync(backend.generate_response)(user_message)
+        if cached is not None:
+            response_text = cached
+        else:
+            try:
+                response_text = await backend.generate_response(
+                    user_message, options=options, use_cache=use_cache, ticket=ticket
+                )
+            finally:
+                ticket.release()
         backend.add_to_history('assistant', response_text)
         
         return JsonResponse({
             'response': response_text,
-            'model': backend.ollama_model,
+            'model': backend.last_model or backend.ollama_model,
+            'prompt_tokens': backend.last_prompt_tokens,
+            **backend.last_prefill,
+            'queue_wait_ms': ticket.queue_wait_ms if ticket else 0.0,
+            'timings': backend.last_timings,
             'status': 'success'
         })
         
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except SchedulerRejected as e:
+        # A failover model's queue had no slot for this request
+        return rejection_response(e)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
-def streaming_response_generator(backend, user_message):
+def streaming_response_generator(backend, user_message, options=None, use_cache=None, ticket=None,
+                                 include_full_response=None):
     """Generate streaming response for real-time chat"""
-    try:
-        # Send start event
-        yield f"event: start\ndata: {json.dumps({'status': 'started'})}\n\n"
-        
-        response_parts = []
-        
-        # Run async generator
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            async_gen = backend.generate_response_streaming(user_message)
-            while True:
-                try:
-                    chunk = loop.run_until_complete(async_gen.__anext__())
-                    response_parts.append(chunk)
-                    yield f"event: token\ndata: {json.dumps({'token': chunk})}\n\n"
-                except StopAsyncIteration:
-                    break
-        finally:
-            loop.close()
-        
-        # Complete response
-        full_response = ''.join(response_parts)
-        backend.add_to_history('assistant', full_response)
-        
-        yield f"event: end\ndata: {json.dumps({'status': 'completed', 'full_response': full_response})}\n\n"
-        
-    except Exception as e:
-        yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+    return chat_event_stream(
+        backend, user_message, options, use_cache, ticket, include_full_response=include_full_response
+    )
 
 
 @csrf_exempt
@@ -0,0 +1,288 @@
+"""
+Server-Sent Events and NDJSON helpers for the chat streaming views
+"""
+import asyncio
+import json
+import threading
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, Iterator, Optional, Union
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from .llm_backend import STREAM_OPTIONS
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """Format a single SSE frame"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class SSEWriter:
+    """Formats SSE frames and counts what was sent"""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    def event(self, event: str, data: Dict) -> str:
+        frame = sse_event(event, data)
+        self.frames += 1
+        self.bytes += len(frame.encode('utf-8'))
+        return frame
+
+    def comment(self, text: str) -> str:
+        """SSE comment line; clients ignore it, but writing it exposes a dead connection"""
+        frame = f": {text}\n\n"
+        self.bytes += len(frame.encode('utf-8'))
+        return frame
+
+    def stats(self) -> Dict:
+        return {'frames': self.frames, 'bytes': self.bytes}
+
+
+class StreamStats:
+    """Process-wide outcome counters for chat streams"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            'started': 0,
+            'completed': 0,
+            'cancelled': 0,
+            'errors': 0,
+            'cancelled_tokens_sent': 0,
+            'tokens_saved': 0,
+        }
+        self._open = 0
+
+    def record(self, outcome: str, tokens: int = 0, num_predict: int = 0) -> None:
+        """Count a stream outcome; a cancelled stream also counts the tokens it did not generate"""
+        with self._lock:
+            self._stats[outcome] += 1
+            if outcome == 'started':
+                self._open += 1
+            if outcome == 'cancelled':
+                self._stats['cancelled_tokens_sent'] += tokens
+                # Upper bound: the generation could have run to num_predict
+                self._stats['tokens_saved'] += max(num_predict - tokens, 0)
+
+    def closed(self) -> None:
+        """A started stream has ended, however it ended"""
+        with self._lock:
+            self._open = max(self._open - 1, 0)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'open': self._open}
+
+
+_stream_stats = StreamStats()
+
+
+def get_stream_stats() -> StreamStats:
+    """Return the process-wide stream counters"""
+    return _stream_stats
+
+
+async def batch_tokens(
+    tokens: AsyncIterator[str],
+    max_delay_ms: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+    heartbeat_s: Optional[float] = None
+) -> AsyncIterator[str]:
+    """
+    Group a token stream into larger chunks
+    A chunk is emitted once it holds ``max_bytes`` or its first token has
+    waited ``max_delay_ms``, whichever comes first, so a stalled model
+    never holds back text it already produced. A delay of 0 disables
+    batching. After ``heartbeat_s`` without output an empty chunk is
+    yielded so the caller can probe the connection.
+    """
+    if max_delay_ms is None:
+        max_delay_ms = getattr(settings, 'LLM_SSE_FLUSH_MS', 25)
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'LLM_SSE_FLUSH_BYTES', 512)
+    if max_delay_ms <= 0 and not heartbeat_s:
+        async for token in tokens:
+            yield token
+        return
+
+    iterator = tokens.__aiter__()
+    pending = []
+    pending_bytes = 0
+    deadline = 0.0
+    next_token = None
+    try:
+        while True:
+            if next_token is None:
+                next_token = asyncio.ensure_future(iterator.__anext__())
+            timeout = max(deadline - time.monotonic(), 0) if pending else heartbeat_s or None
+            done, _ = await asyncio.wait({next_token}, timeout=timeout)
+            if not done:
+                # Delay expired while waiting on the model: flush what we have
+                yield ''.join(pending)
+                pending, pending_bytes = [], 0
+                continue
+            try:
+                token = next_token.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                next_token = None
+            if not pending:
+                deadline = time.monotonic() + max_delay_ms / 1000
+            pending.append(token)
+            pending_bytes += len(token.encode('utf-8'))
+            if pending_bytes >= max_bytes or time.monotonic() >= deadline or max_delay_ms <= 0:
+                yield ''.join(pending)
+                pending, pending_bytes = [], 0
+        if pending:
+            yield ''.join(pending)
+    finally:
+        if next_token is not None:
+            # Let the cancellation reach the source before anyone closes it
+            next_token.cancel()
+            await asyncio.wait({next_token})
+
+
+def _drive_sync(async_gen: AsyncIterator[str]) -> Iterator[str]:
+    """Drive an async generator from a WSGI worker thread on a private loop"""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(async_gen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(async_gen.aclose())
+        loop.close()
+
+
+def _streaming_response(request, async_gen: AsyncIterator[str], content_type: str) -> StreamingHttpResponse:
+    """
+    Wrap an async generator in an unbuffered streaming response
+    Under ASGI the generator is served natively on the server's event loop;
+    under WSGI (e.g. runserver) it is driven per request so output still flushes.
+    """
+    stream: Union[AsyncIterator[str], Iterator[str]] = async_gen
+    if not isinstance(request, ASGIRequest):
+        stream = _drive_sync(async_gen)
+
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def event_stream_response(request, async_gen: AsyncIterator[str]) -> StreamingHttpResponse:
+    """Stream an async SSE generator"""
+    return _streaming_response(request, async_gen, 'text/event-stream')
+
+
+def ndjson_line(data: Dict) -> str:
+    """Format a single newline-delimited JSON record"""
+    return json.dumps(data, separators=(',', ':')) + '\n'
+
+
+def ndjson_response(request, async_gen: AsyncIterator[str]) -> StreamingHttpResponse:
+    """Stream an async generator of NDJSON lines"""
+    return _streaming_response(request, async_gen, 'application/x-ndjson')
+
+
+async def chat_event_stream(
+    backend,
+    user_message: str,
+    options: Optional[Dict] = None,
+    use_cache: Optional[bool] = None,
+    ticket=None,
+    session_id: Optional[str] = None,
+    include_full_response: Optional[bool] = None
+) -> AsyncIterator[str]:
+    """
+    SSE stream of one chat generation: start, batched token frames, end
+    ``session_id`` is sent once in the start and end frames only. The end
+    frame repeats the full response unless ``include_full_response`` (or
+    LLM_SSE_INCLUDE_FULL_RESPONSE) is false, and reports how many tokens,
+    frames and bytes the stream took.
+
+    If the client disconnects (the server cancels the stream or closes
+    it), the upstream Ollama request is closed at once and the partial
+    response is kept in history flagged ``cancelled``. While the model is
+    silent a comment is sent every LLM_SSE_HEARTBEAT_S seconds, so a
+    client that is gone is noticed even before the first token.
+    """
+    if include_full_response is None:
+        include_full_response = getattr(settings, 'LLM_SSE_INCLUDE_FULL_RESPONSE', True)
+    ids = {'session_id': session_id} if session_id else {}
+    writer = SSEWriter()
+    stats = get_stream_stats()
+    # Raw tokens as generated, before batching: a token still waiting in
+    # a batch when the client leaves is part of the partial response
+    generated = []
+    completed = False
+
+    async def recorded(tokens):
+        async with aclosing(tokens):
+            async for token in tokens:
+                generated.append(token)
+                yield token
+
+    stats.record('started')
+    try:
+        yield writer.event('start', {
+            'status': 'started',
+            **ids,
+            'queue_wait_ms': ticket.queue_wait_ms if ticket else 0.0
+        })
+
+        generation = backend.generate_response_streaming(
+            user_message, options=options, use_cache=use_cache, ticket=ticket
+        )
+        heartbeat_s = getattr(settings, 'LLM_SSE_HEARTBEAT_S', 15)
+        async with aclosing(batch_tokens(recorded(generation), heartbeat_s=heartbeat_s)) as chunks:
+            async for chunk in chunks:
+                if not chunk:
+                    yield writer.comment('waiting')
+                    continue
+                yield writer.event('token', {'token': chunk})
+
+        full_response = ''.join(generated)
+        backend.add_to_history('assistant', full_response, metadata=dict(ids) or None)
+        completed = True
+        stats.record('completed')
+
+        end = {
+            'status': 'completed',
+            'model': backend.last_model,
+            'prompt_tokens': backend.last_prompt_tokens,
+            **backend.last_prefill,
+            'timings': backend.last_timings,
+            **ids,
+        }
+        if include_full_response:
+            end['full_response'] = full_response
+        # Counts cover every frame before this one
+        end['stream'] = {'tokens': len(generated), **writer.stats()}
+        yield writer.event('end', end)
+
+    except (asyncio.CancelledError, GeneratorExit):
+        if completed:
+            raise
+        # Client went away; everything upstream has been closed by now
+        partial = ''.join(generated)
+        if partial:
+            backend.add_to_history('assistant', partial, metadata={**ids, 'cancelled': True})
+        num_predict = (options or {}).get('num_predict') or STREAM_OPTIONS['num_predict']
+        stats.record('cancelled', len(generated), num_predict)
+        raise
+    except Exception as e:
+        stats.record('errors')
+        yield writer.event('error', {'error': str(e), **ids})
+    finally:
+        stats.closed()
+        if ticket:
+            ticket.release()
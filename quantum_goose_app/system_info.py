@@ -5,16 +5,24 @@ Collects CPU, GPU, RAM, and hardware specs for AI acceleration optimization
 import platform
 import subprocess
 import json
+import threading
+import time
 import psutil
+from dataclasses import dataclass, field
 from typing import Dict, Optional
 
+from django.conf import settings
+
 
 class SystemInfoScraper:
     """Scrapes comprehensive system information for AI optimization"""
     
     @staticmethod
-    def get_cpu_info() -> Dict:
-        """Get detailed CPU information"""
+    def get_cpu_info(sample_interval: Optional[float] = 1) -> Dict:
+        """
+        Get detailed CPU information
+        A sample_interval of None returns the usage since the previous call without blocking
+        """
         cpu_info = {
             'processor': platform.processor(),
             'architecture': platform.machine(),
@@ -22,8 +30,8 @@ class SystemInfoScraper:
             'cores_logical': psutil.cpu_count(logical=True),
             'cpu_freq_current': psutil.cpu_freq().current if psutil.cpu_freq() else 0,
             'cpu_freq_max': psutil.cpu_freq().max if psutil.cpu_freq() else 0,
-            'cpu_percent': psutil.cpu_percent(interval=1),
-            'cpu_per_core': psutil.cpu_percent(interval=1, percpu=True),
+            'cpu_percent': psutil.cpu_percent(interval=sample_interval),
+            'cpu_per_core': psutil.cpu_percent(interval=sample_interval, percpu=True),
         }
         return cpu_info
     
@@ -182,11 +190,11 @@ class SystemInfoScraper:
         return acceleration
     
     @classmethod
-    def get_full_system_info(cls) -> Dict:
+    def get_full_system_info(cls, cpu_sample_interval: Optional[float] = 1) -> Dict:
         """Get complete system information"""
         return {
             'platform': cls.get_platform_info(),
-            'cpu': cls.get_cpu_info(),
+            'cpu': cls.get_cpu_info(cpu_sample_interval),
             'gpu': cls.get_gpu_info(),
             'memory': cls.get_memory_info(),
             'disk': cls.get_disk_info(),
@@ -195,9 +203,10 @@ class SystemInfoScraper:
         }
     
     @classmethod
-    def get_optimization_recommendations(cls) -> Dict:
+    def get_optimization_recommendations(cls, info: Optional[Dict] = None) -> Dict:
         """Get AI optimization recommendations based on system specs"""
-        info = cls.get_full_system_info()
+        if info is None:
+            info = cls.get_full_system_info()
         recommendations = {
             'inference_backend': 'cpu',
             'batch_size': 1,
@@ -246,11 +255,120 @@ class SystemInfoScraper:
         return recommendations
 
 
+@dataclass(frozen=True)
+class SystemSnapshot:
+    """
+    Immutable point-in-time view of the host hardware
+    Snapshots are replaced wholesale on refresh and must never be mutated in place
+    """
+    info: Dict
+    optimization: Dict
+    captured_at: float = field(default_factory=time.time)
+
+    @property
+    def age(self) -> float:
+        """Seconds since this snapshot was captured"""
+        return time.time() - self.captured_at
+
+
+class SystemSnapshotService:
+    """
+    Process-wide, TTL-refreshed cache of the system scrape
+    Readers get the current snapshot without blocking; a daemon thread
+    re-scrapes the hardware every ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._snapshot: Optional[SystemSnapshot] = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    def get(self, force_refresh: bool = False) -> SystemSnapshot:
+        """Return the current snapshot, capturing one if none exists yet"""
+        if force_refresh:
+            return self.refresh()
+
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None:
+                    # Cold start: skip the blocking CPU sampling, the refresher fills it in
+                    snapshot = self._capture(cpu_sample_interval=None)
+                    self._snapshot = snapshot
+            self.start()
+        return snapshot
+
+    def refresh(self) -> SystemSnapshot:
+        """Re-scrape the system synchronously and publish the new snapshot"""
+        snapshot = self._capture()
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def start(self) -> None:
+        """Start the background refresher if it is not already running"""
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._wakeup.clear()
+            self._refresher = threading.Thread(
+                target=self._run,
+                name='system-snapshot-refresher',
+                daemon=True
+            )
+            self._refresher.start()
+
+    def stop(self) -> None:
+        """Stop the background refresher"""
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        """Refresher loop"""
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:  # pragma: no cover - keep serving the last snapshot
+                print(f"System snapshot refresh failed: {e}")
+            if self._wakeup.wait(self.ttl):
+                return
+
+    @staticmethod
+    def _capture(cpu_sample_interval: Optional[float] = 1) -> SystemSnapshot:
+        """Scrape the system once"""
+        info = SystemInfoScraper.get_full_system_info(cpu_sample_interval)
+        optimization = SystemInfoScraper.get_optimization_recommendations(info)
+        return SystemSnapshot(info=info, optimization=optimization)
+
+
+_snapshot_service: Optional[SystemSnapshotService] = None
+_snapshot_service_lock = threading.Lock()
+
+
+def get_snapshot_service() -> SystemSnapshotService:
+    """Return the process-wide snapshot service"""
+    global _snapshot_service
+    if _snapshot_service is None:
+        with _snapshot_service_lock:
+            if _snapshot_service is None:
+                _snapshot_service = SystemSnapshotService(
+                    ttl=getattr(settings, 'LLM_SYSTEM_SNAPSHOT_TTL', 60.0)
+                )
+    return _snapshot_service
+
+
+def get_system_snapshot(force_refresh: bool = False) -> SystemSnapshot:
+    """Return the shared system snapshot"""
+    return get_snapshot_service().get(force_refresh=force_refresh)
+
+
 def get_system_info_json() -> str:
     """Get system info as JSON string"""
-    return json.dumps(SystemInfoScraper.get_full_system_info(), indent=2)
+    return json.dumps(get_system_snapshot().info, indent=2)
 
 
 def get_optimization_json() -> str:
     """Get optimization recommendations as JSON string"""
-    return json.dumps(SystemInfoScraper.get_optimization_recommendations(), indent=2)
+    return json.dumps(get_system_snapshot().optimization, indent=2)
@@ -0,0 +1,107 @@
+"""
+Per-generation latency telemetry
+Keeps the timings of recent generations per model and intelligence level
+and reports their percentiles, to tell queueing, model load, prompt
+evaluation and decoding apart
+"""
+import math
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+# Timings summarised per (model, level); all milliseconds except tokens_per_sec
+TIMING_FIELDS = ('ttft_ms', 'total_ms', 'tokens_per_sec', 'prompt_eval_ms', 'load_ms', 'queue_wait_ms')
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list"""
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class GenerationTelemetry:
+    """
+    Rolling window of generation timings
+
+    The last ``window`` generations of every (model, level) pair are kept,
+    so percentiles follow current behaviour rather than the whole uptime.
+    Generation and token counts are kept for the whole uptime.
+    """
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._samples: Dict[tuple, deque] = {}
+        self._totals: Dict[tuple, Dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, timings: Dict) -> None:
+        """Add one generation's timings (as built by LLMBackend)"""
+        key = (timings.get('model') or 'unknown', timings.get('level') or 'unknown')
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+                self._totals[key] = {'generations': 0, 'eval_count': 0}
+            samples.append(timings)
+            self._totals[key]['generations'] += 1
+            self._totals[key]['eval_count'] += timings.get('eval_count') or 0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+    @staticmethod
+    def _summarise(samples) -> Dict:
+        summary = {}
+        for name in TIMING_FIELDS:
+            values = sorted(sample[name] for sample in samples if sample.get(name) is not None)
+            if not values:
+                summary[name] = None
+                continue
+            summary[name] = {
+                **{f'p{pct}': round(percentile(values, pct), 1) for pct in PERCENTILES},
+                'mean': round(sum(values) / len(values), 1),
+                'max': round(values[-1], 1),
+            }
+        return summary
+
+    def stats(self, model: Optional[str] = None, level: Optional[str] = None) -> Dict:
+        """Percentiles per model and level, optionally filtered to one of each"""
+        with self._lock:
+            selected = [
+                (key, list(samples), dict(self._totals[key]))
+                for key, samples in self._samples.items()
+                if (model is None or key[0] == model) and (level is None or key[1] == level)
+            ]
+        return {
+            'window': self.window,
+            'series': [
+                {
+                    'model': key[0],
+                    'level': key[1],
+                    **totals,
+                    'samples': len(samples),
+                    **self._summarise(samples),
+                }
+                for key, samples, totals in sorted(selected, key=lambda item: item[0])
+            ],
+        }
+
+
+_telemetry: Optional[GenerationTelemetry] = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry() -> GenerationTelemetry:
+    """Return the process-wide generation telemetry"""
+    global _telemetry
+    if _telemetry is None:
+        with _telemetry_lock:
+            if _telemetry is None:
+                _telemetry = GenerationTelemetry(window=getattr(settings, 'LLM_TELEMETRY_WINDOW', 500))
+    return _telemetry
@@ -30,12 +30,24 @@ urlpatterns = [
     
     # Legacy LLM HAZoom API Endpoints (kept for compatibility)
     path('api/llm/chat/', api_views.chat_message, name='llm_chat'),
+    path('api/llm/chat/batch/', api_views.chat_batch, name='llm_chat_batch'),
     path('api/llm/system-info/', api_views.system_info, name='llm_system_info'),
     path('api/llm/acceleration/', api_views.acceleration_info, name='llm_acceleration'),
     path('api/llm/intelligence/', api_views.set_intelligence_level, name='llm_intelligence'),
     path('api/llm/clear/', api_views.clear_history, name='llm_clear'),
+    path('api/llm/history/', api_views.conversation_history, name='llm_history'),
+    path('api/llm/history/writer/', api_views.history_writer_stats, name='llm_history_writer'),
     path('api/llm/stats/', api_views.chat_stats, name='llm_stats'),
     path('api/llm/health/', api_views.health_check_llm, name='llm_health'),
+    path('api/llm/backends/', api_views.backend_stats, name='llm_backends'),
+    path('api/llm/cache/', api_views.response_cache_stats, name='llm_cache'),
+    path('api/llm/scheduler/', api_views.scheduler_stats, name='llm_scheduler'),
+    path('api/llm/warmup/', api_views.warmup_stats, name='llm_warmup'),
+    path('api/llm/routing/', api_views.routing_stats, name='llm_routing'),
+    path('api/llm/hosts/', api_views.host_pool_stats, name='llm_hosts'),
+    path('api/llm/streams/', api_views.stream_stats, name='llm_streams'),
+    path('api/llm/telemetry/', api_views.generation_telemetry, name='llm_telemetry'),
+    path('api/llm/prompt-profiles/', api_views.prompt_profiles, name='llm_prompt_profiles'),
     
     # Legacy Model Management API Endpoints
     path('api/models/legacy/', api_views.list_models, name='models_list'),
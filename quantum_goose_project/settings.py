@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'quantum_goose_app.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'quantum_goose_app.middleware.SecurityHeadersMiddleware',
@@ -73,6 +75,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'quantum_goose_project.wsgi.application'
+ASGI_APPLICATION = 'quantum_goose_project.asgi.application'
 
 
 # Database
@@ -184,3 +187,180 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
 ]
+
+# HAZoom LLM backend
+# Seconds between background re-scrapes of the shared system snapshot
+LLM_SYSTEM_SNAPSHOT_TTL = 60
+
+# Ollama connection pool shared by every backend in a worker
+LLM_OLLAMA_BASE_URL = 'http://localhost:11434'
+LLM_OLLAMA_MAX_CONNECTIONS = 32
+LLM_OLLAMA_MAX_KEEPALIVE = 16
+LLM_OLLAMA_CONNECT_TIMEOUT = 5.0
+LLM_OLLAMA_READ_TIMEOUT = 60.0
+
+# Model catalog cache: answers are fresh for TTL seconds, then served stale
+# while a background fetch refreshes them, up to STALE_TTL seconds
+LLM_MODEL_CATALOG_TTL = 30
+LLM_MODEL_CATALOG_STALE_TTL = 300
+
+# Session backend registry: LRU size cap and idle eviction (seconds)
+LLM_MAX_BACKENDS = 256
+LLM_BACKEND_IDLE_TTL = 1800
+
+# Exact-match response cache. Requests opt in with "cache": true (or out with
+# "cache": false); temperature 0 requests are cached unless they opt out.
+LLM_RESPONSE_CACHE_ENABLED = False
+LLM_RESPONSE_CACHE_MAX_ENTRIES = 512
+LLM_RESPONSE_CACHE_TTL = 600
+
+# Semantic response cache: answers paraphrased standalone questions from
+# earlier responses when their embeddings are at least THRESHOLD similar.
+# Answers are only reused for the same user and system prompt. Set PATH to
+# a writable file outside the source tree to keep the index across restarts.
+LLM_SEMANTIC_CACHE_ENABLED = False
+LLM_SEMANTIC_CACHE_EMBEDDING_MODEL = 'nomic-embed-text'
+LLM_SEMANTIC_CACHE_THRESHOLD = 0.92
+LLM_SEMANTIC_CACHE_MAX_ENTRIES = 1000
+LLM_SEMANTIC_CACHE_TTL = 86400
+LLM_SEMANTIC_CACHE_PATH = None
+
+# Context length (tokens) per model, matched on the name before ':'
+LLM_MODEL_CONTEXT_TOKENS = {
+    'default': 4096,
+    'phi': 2048,
+    'llama2': 4096,
+}
+
+# Share one Ollama generation between identical requests that overlap in time
+LLM_COALESCE_GENERATIONS = True
+
+# Generation scheduler: concurrent generations per model (matched on the name
+# before ':'), waiting requests per model before answering 429, and seconds a
+# request may wait for a slot before answering 503
+LLM_SCHEDULER_CONCURRENCY = {
+    'default': 2,
+    'phi': 4,
+}
+LLM_SCHEDULER_MAX_QUEUE_DEPTH = 32
+LLM_SCHEDULER_MAX_QUEUE_WAIT = 30.0
+
+# Model warm-up: keep_alive sent with every Ollama request, plus a preload of
+# the model each intelligence level routes to (or LLM_WARMUP_MODELS, if set)
+# when a worker serves its first request and every INTERVAL seconds during
+# business hours (local time, Monday=0)
+LLM_OLLAMA_KEEP_ALIVE = '30m'
+LLM_WARMUP_ENABLED = True
+LLM_WARMUP_INTERVAL = 600
+LLM_WARMUP_BUSINESS_HOURS = (8, 20)
+LLM_WARMUP_BUSINESS_DAYS = (0, 1, 2, 3, 4)
+
+# Model routing: quality tier per model (matched on the name before ':',
+# unlisted models are tiered by size), the lowest tier each intelligence
+# level accepts, and failover when a model errors or is slow to start.
+# Embedding models (and the semantic cache's) are never routed to; list
+# other installed models chats must not use in EXCLUDE_MODELS.
+LLM_MODEL_TIERS = {
+    'tinyllama': 1,
+    'phi': 1,
+    'gemma': 1,
+    'llama2': 2,
+    'llama3': 2,
+    'mistral': 2,
+    'mixtral': 3,
+}
+LLM_LEVEL_MIN_TIER = {
+    'nano': 1,
+    'standard': 2,
+    'super': 2,
+    'quantum': 3,
+}
+LLM_ROUTER_FIRST_TOKEN_TIMEOUT = 60.0
+LLM_ROUTER_FAILURE_THRESHOLD = 3
+LLM_ROUTER_COOLDOWN = 30.0
+LLM_ROUTER_EXCLUDE_MODELS = []
+
+# Ollama host pool: generations go to the least-loaded healthy host and a
+# session sticks to its host (for KV-cache reuse) unless that host is more
+# than STICKY_SLACK requests busier. Hosts are probed every PROBE_INTERVAL
+# seconds and ejected after EJECT_AFTER consecutive failures.
+LLM_OLLAMA_HOSTS = [LLM_OLLAMA_BASE_URL]
+LLM_OLLAMA_PROBE_INTERVAL = 10
+LLM_OLLAMA_EJECT_AFTER = 3
+LLM_OLLAMA_STICKY_TTL = 1800
+LLM_OLLAMA_STICKY_SLACK = 4
+
+# SSE framing: tokens are batched into one frame until FLUSH_BYTES have
+# accumulated or the oldest waited FLUSH_MS (0 sends every token as-is).
+# Requests can drop the end frame's full_response copy with
+# "full_response": false.
+LLM_SSE_FLUSH_MS = 25
+LLM_SSE_FLUSH_BYTES = 512
+LLM_SSE_INCLUDE_FULL_RESPONSE = True
+
+# While the model produces nothing (e.g. a long prefill) an SSE comment is
+# sent every HEARTBEAT_S seconds so a disconnected client is detected and
+# its upstream generation cancelled.
+LLM_SSE_HEARTBEAT_S = 15
+
+# System prompt segments are cached per session and rebuilt only on a model,
+# hardware snapshot, level, memory or preference change. Memory writes made by
+# another worker process are picked up after PROMPT_MEMORY_TTL seconds.
+LLM_PROMPT_MEMORY_TTL = 300
+
+# Sticky context window: once history overflows the prompt budget the window
+# start jumps forward far enough to free this fraction of the budget, so the
+# following turns keep a byte-identical prefix for Ollama's KV cache.
+LLM_CONTEXT_WINDOW_HYSTERESIS = 0.25
+
+# Batch chat endpoint (api/llm/chat/batch/): prompts per request and the
+# most of them run at once; requests may ask for a lower parallelism.
+LLM_BATCH_MAX_ITEMS = 100
+LLM_BATCH_PARALLELISM = 4
+
+# Chat history is written to the Message table write-behind: a background
+# thread flushes queued turns every FLUSH_INTERVAL seconds (or once
+# BATCH_SIZE are waiting). A backend created for an existing session loads
+# only the newest RESTORE_LIMIT messages; older pages are read on demand.
+LLM_HISTORY_FLUSH_INTERVAL = 0.5
+LLM_HISTORY_BATCH_SIZE = 100
+LLM_HISTORY_RESTORE_LIMIT = 20
+
+# Generation telemetry (api/llm/telemetry/): percentiles are computed over
+# the last WINDOW generations of each model and intelligence level.
+LLM_TELEMETRY_WINDOW = 500
+
+# Prometheus metrics at /metrics. With several worker processes (gunicorn)
+# set LLM_METRICS_DIR to a directory private to this service and emptied
+# on restart; each worker writes its values there every FLUSH_INTERVAL
+# seconds and the scrape sums them. Unset, only the serving process counts.
+LLM_METRICS_DIR = os.environ.get('LLM_METRICS_DIR')
+LLM_METRICS_FLUSH_INTERVAL = 5.0
+LLM_METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Ollama runtime options derived from the hardware snapshot: num_thread,
+# num_batch and num_gpu follow the recommendations, and num_ctx covers the
+# prompt plus num_predict rounded up to a power-of-two multiple of
+# NUM_CTX_MIN. A smaller num_ctx is only used once the larger one has gone
+# unneeded for NUM_CTX_SHRINK_AFTER seconds, since every change reloads the
+# model. Per-level overrides replace computed options (None drops one), e.g.
+# {'nano': {'num_ctx': 2048}, 'quantum': {'num_thread': None}}.
+LLM_RUNTIME_OPTIONS_ENABLED = True
+LLM_NUM_CTX_MIN = 2048
+LLM_NUM_CTX_SHRINK_AFTER = 600
+LLM_LEVEL_RUNTIME_OPTIONS = {}
+
+# System prompt profiles (api/llm/prompt-profiles/). Each intelligence level
+# sends one profile: 'minimal' (a one-line instruction), 'compact' (plus
+# memory) or 'full' (hardware, model, optimization settings, capabilities
+# and memory). LLM_PROMPT_PROFILES changes profiles or adds new ones: keys
+# given replace the built-in profile's, and sections come from intro,
+# hardware, model, settings, capabilities and memory, e.g.
+# {'compact': {'sections': ['intro', 'capabilities']}}.
+LLM_PROMPT_PROFILES = {}
+LLM_LEVEL_PROMPT_PROFILES = {
+    'nano': 'minimal',
+    'standard': 'compact',
+    'super': 'full',
+    'quantum': 'full',
+}
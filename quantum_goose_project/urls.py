@@ -7,6 +7,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import render
 
+from quantum_goose_app import api_views
+
 # Welcome view
 def welcome_view(request):
     """Welcome page view"""
@@ -21,6 +23,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', welcome_view, name='welcome'),
     path('quantum-goose-app/', include('quantum_goose_app.urls')),
+    path('metrics', api_views.metrics, name='metrics'),
 ]
 
 # Serve media files in development